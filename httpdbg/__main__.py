@@ -5,15 +5,20 @@ import time
 from typing import Union
 
 from httpdbg import __version__
+from httpdbg.argsrepr import ArgsRepr
 from httpdbg.args import read_args
 from httpdbg.export import export_html
 from httpdbg.hooks.all import httprecord
+from httpdbg.ingestion import IngestionQueue
 from httpdbg.log import set_env_for_logging
 from httpdbg.server import httpdbg_srv
 from httpdbg.mode_console import run_console
 from httpdbg.mode_module import run_module
 from httpdbg.mode_script import run_script
 from httpdbg.records import HTTPRecords
+from httpdbg.retention import RetentionPolicy
+from httpdbg.sampling import SamplingPolicy
+from httpdbg.store import RecordStore
 
 
 def print_msg(msg):
@@ -37,7 +42,31 @@ def pyhttpdbg(
         test_mode: bool,
     ):
         records.server = record_server
-        with httprecord(records, initiators, server=records.server):
+        with httprecord(
+            records,
+            initiators,
+            server=records.server,
+            max_body_size=params.max_body_size,
+            sampling=SamplingPolicy(
+                every=params.sample_every,
+                rate=params.sample_rate,
+                first=params.sample_first,
+            ),
+            args_repr=ArgsRepr(
+                max_length=params.max_arg_length,
+                max_items=params.max_arg_items,
+            ),
+            ingestion=IngestionQueue(
+                size=params.ingestion_queue_size,
+                policy=params.ingestion_policy,
+            ),
+            retention=RetentionPolicy(
+                max_records=params.max_records,
+                max_bytes=params.max_records_size,
+                max_age=params.max_age,
+            ),
+            store=RecordStore(params.store),
+        ):
             if params.module:
                 run_module(subparams)
             elif params.script:
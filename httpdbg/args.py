@@ -40,6 +40,92 @@ def read_args(args: list[str]) -> tuple[argparse.Namespace, list[str]]:
         help="record only HTTP client requests",
     )
 
+    parser.add_argument(
+        "--max-body-size",
+        type=int,
+        default=0,
+        help="the maximum number of bytes recorded for each request or response body (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--sample-every",
+        type=int,
+        default=0,
+        help="record only 1 request in N",
+    )
+
+    parser.add_argument(
+        "--sample-rate",
+        type=float,
+        default=0,
+        help="record at most N requests per second for each network location",
+    )
+
+    parser.add_argument(
+        "--sample-first",
+        type=int,
+        default=0,
+        help="record only the first N requests for each initiator",
+    )
+
+    parser.add_argument(
+        "--max-arg-length",
+        type=int,
+        default=256,
+        help="the maximum number of characters (or bytes) rendered for each argument of the initiators (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--max-arg-items",
+        type=int,
+        default=16,
+        help="the maximum number of items rendered for each list or dict argument of the initiators (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--store",
+        type=str,
+        default="",
+        metavar="PATH",
+        help="save the requests in a SQLite database (kept even if removed from the memory by the retention policy)",
+    )
+
+    parser.add_argument(
+        "--max-records",
+        type=int,
+        default=0,
+        help="keep only the N most recent requests (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--max-records-size",
+        type=int,
+        default=0,
+        help="the maximum number of bytes (headers and bodies) kept for all the requests, the oldest requests are removed first (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=0,
+        help="remove the requests older than N seconds (0 for no limit)",
+    )
+
+    parser.add_argument(
+        "--ingestion-queue-size",
+        type=int,
+        default=0,
+        help="parse the data of the HTTP/1 requests in a background thread, using a queue of N events (0 to parse them in the application threads)",
+    )
+
+    parser.add_argument(
+        "--ingestion-policy",
+        type=str,
+        choices=["drop", "wait"],
+        default="drop",
+        help="when the ingestion queue is full, drop the data (and count them) or wait",
+    )
+
     server_or_export = parser.add_mutually_exclusive_group()
 
     server_or_export.add_argument(
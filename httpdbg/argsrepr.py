@@ -0,0 +1,115 @@
+from array import array
+from collections import deque
+import itertools
+import reprlib
+import sys
+from typing import Any
+from typing import Iterator
+from typing import Union
+
+_CONTAINERS = (list, tuple, set, frozenset, dict, deque, array)
+
+# a huge int is slow to format (about 4000 digits, see sys.set_int_max_str_digits)
+_MAX_INT_BITS = 13_000
+_LOG10_2 = 0.30103
+
+
+class ArgsRepr(reprlib.Repr):
+    """Render the arguments of the hooked calls with a limited size.
+
+    Only the beginning of a value is rendered:
+      - max_length: the number of characters (str, other objects) or bytes (bytes),
+      - max_items: the number of items (list, tuple, set, dict).
+
+    0 means no limit.
+    """
+
+    def __init__(self, max_length: int = 256, max_items: int = 16) -> None:
+        super().__init__()
+        self.max_length: int = max_length
+        self.max_items: int = max_items
+
+        length = max_length if max_length else sys.maxsize
+        items = max_items if max_items else sys.maxsize
+
+        self.maxstring = self.maxother = self.maxlong = length
+        self.maxlist = self.maxtuple = self.maxset = self.maxfrozenset = items
+        self.maxdict = self.maxdeque = self.maxarray = items
+        self.maxlevel = 3
+
+    def repr_bytes(self, x: bytes, level: int) -> str:
+        if len(x) <= self.maxstring:
+            return repr(x)
+        return repr(x[: self.maxstring]) + "..."
+
+    repr_bytearray = repr_bytes
+
+    def repr_int(self, x: int, level: int) -> str:
+        if x.bit_length() > _MAX_INT_BITS:
+            return f"<int of about {int(x.bit_length() * _LOG10_2) + 1} digits>"
+        return super().repr_int(x, level)
+
+    def repr_dict(self, x: dict, level: int) -> str:
+        if not x:
+            return "{}"
+        pieces = (
+            f"{self.repr1(key, level - 1)}: {self.repr1(value, level - 1)}"
+            for key, value in x.items()
+        )
+        return self._join(pieces, len(x), level, "{", "}", self.maxdict)
+
+    def repr_set(self, x: set, level: int) -> str:
+        if not x:
+            return "set()"
+        pieces = (self.repr1(item, level - 1) for item in x)
+        return self._join(pieces, len(x), level, "{", "}", self.maxset)
+
+    def repr_frozenset(self, x: frozenset, level: int) -> str:
+        if not x:
+            return "frozenset()"
+        pieces = (self.repr1(item, level - 1) for item in x)
+        return self._join(pieces, len(x), level, "frozenset({", "})", self.maxfrozenset)
+
+    def _join(
+        self,
+        pieces: Iterator[str],
+        length: int,
+        level: int,
+        left: str,
+        right: str,
+        maximum: int,
+    ) -> str:
+        # the items are rendered in their order: reprlib sorts all of them first
+        if level <= 0:
+            return f"{left}...{right}"
+        text = ", ".join(itertools.islice(pieces, maximum))
+        if length > maximum:
+            text += ", ..."
+        return left + text + right
+
+    def render(self, value: Any) -> tuple[str, Union[int, None]]:
+        """The text of the value, and its original length if it has been truncated."""
+        try:
+            if isinstance(value, str):
+                if len(value) > self.maxstring:
+                    return f'"{value[: self.maxstring]}..."', len(value)
+                return f'"{value}"', None
+            elif isinstance(value, (bytes, bytearray)):
+                truncated = len(value) > self.maxstring
+                return self.repr(value), len(value) if truncated else None
+            elif isinstance(value, _CONTAINERS):
+                truncated = len(value) > self.maxlist
+                return self.repr(value), len(value) if truncated else None
+            elif isinstance(value, int) and value.bit_length() > _MAX_INT_BITS:
+                return self.repr_int(value, self.maxlevel), None
+            else:
+                # the size of the text is not known before the formatting
+                text = str(value)
+                if len(text) > self.maxother:
+                    return text[: self.maxother] + "...", len(text)
+                return text, None
+        except Exception:
+            return "-?-", None  # in case __repr__ or __str__ is broken
+
+    def to_args(self) -> dict:
+        return {"max_length": self.max_length, "max_items": self.max_items}
@@ -6,7 +6,8 @@ import xml.etree.ElementTree as ET
 
 import httpdbg
 from httpdbg import HTTPRecords
-from httpdbg.webapp.api import RequestListPayload, RequestPayload
+from httpdbg.webapp.api import RequestListPayload
+from httpdbg.webapp.api import request_details
 
 
 def generate_html(records: HTTPRecords, for_export: bool = True) -> str:
@@ -72,7 +73,7 @@ def generate_html(records: HTTPRecords, for_export: bool = True) -> str:
         )
         map_requests: dict[str, object] = dict()
         for record in records:
-            map_requests[record.id] = json.loads(json.dumps(record, cls=RequestPayload))
+            map_requests[record.id] = request_details(records, record)
         static_requests: str = json.dumps(map_requests, ensure_ascii=False)
 
         def safe_for_script_tag(s: str) -> str:
@@ -3,6 +3,7 @@ from typing import Generator
 from typing import Union
 
 from httpdbg.hooks.aiohttp import hook_aiohttp
+from httpdbg.hooks.executor import hook_executor
 from httpdbg.hooks.external import watcher_external
 from httpdbg.hooks.fastapi import hook_fastapi
 from httpdbg.hooks.flask import hook_flask
@@ -18,7 +19,12 @@ from httpdbg.hooks.unittest import hook_unittest
 from httpdbg.hooks.urllib3 import hook_urllib3
 from httpdbg.hooks.uvicorn import hook_uvicorn
 
+from httpdbg.argsrepr import ArgsRepr
+from httpdbg.ingestion import IngestionQueue
 from httpdbg.records import HTTPRecords
+from httpdbg.retention import RetentionPolicy
+from httpdbg.sampling import SamplingPolicy
+from httpdbg.store import RecordStore
 
 
 @contextmanager
@@ -29,9 +35,38 @@ def httprecord(
     server: bool = False,
     ignore: tuple[tuple[str, int], ...] = (),
     multiprocess: bool = True,
+    max_body_size: Union[int, None] = None,
+    sampling: Union[SamplingPolicy, None] = None,
+    args_repr: Union[ArgsRepr, None] = None,
+    ingestion: Union[IngestionQueue, None] = None,
+    retention: Union[RetentionPolicy, None] = None,
+    store: Union[RecordStore, None] = None,
 ) -> Generator[HTTPRecords, None, None]:
     if records is None:
-        records = HTTPRecords(client=client, server=server, ignore=ignore)
+        records = HTTPRecords(
+            client=client,
+            server=server,
+            ignore=ignore,
+            max_body_size=max_body_size or 0,
+            sampling=sampling,
+            args_repr=args_repr,
+            ingestion=ingestion,
+            retention=retention,
+            store=store,
+        )
+    else:
+        if max_body_size is not None:
+            records.max_body_size = max_body_size
+        if sampling is not None:
+            records.sampling = sampling
+        if args_repr is not None:
+            records.args_repr = args_repr
+        if ingestion is not None:
+            records.ingestion = ingestion
+        if retention is not None:
+            records.retention = retention
+        if store is not None:
+            records.store = store
 
     with hook_flask(records):
         with hook_socket(records):
@@ -46,15 +81,21 @@ def httprecord(
                                             with hook_aiohttp(records):
                                                 with hook_pytest(records):
                                                     with hook_unittest(records):
-                                                        with hook_generic(
-                                                            records, initiators
-                                                        ):
-                                                            if multiprocess:
-                                                                with watcher_external(
-                                                                    records,
-                                                                    initiators,
-                                                                    server,
-                                                                ):
+                                                        with hook_executor(records):
+                                                            with hook_generic(
+                                                                records, initiators
+                                                            ):
+                                                                if multiprocess:
+                                                                    with watcher_external(
+                                                                        records,
+                                                                        initiators,
+                                                                        server,
+                                                                        records.max_body_size,
+                                                                        records.sampling,
+                                                                        records.args_repr,
+                                                                        records.ingestion,
+                                                                        records.retention,
+                                                                    ):
+                                                                        yield records
+                                                                else:
                                                                     yield records
-                                                            else:
-                                                                yield records
@@ -0,0 +1,36 @@
+from collections.abc import Callable
+from contextlib import contextmanager
+import concurrent.futures
+import contextvars
+from typing import Generator
+
+from httpdbg.hooks.utils import decorate
+from httpdbg.hooks.utils import undecorate
+from httpdbg.records import HTTPRecords
+
+
+# hook: concurrent.futures.ThreadPoolExecutor.submit
+# what: Submit a callable to be executed in a thread of the pool.
+# action: If called within an initiator, a group or a tag, execute the callable in a copy of the current context
+def set_hook_for_executor_submit(records: HTTPRecords, method: Callable):
+    def hook(self, fn, /, *args, **kwargs):
+        if records.in_context:
+            return method(self, contextvars.copy_context().run, fn, *args, **kwargs)
+        return method(self, fn, *args, **kwargs)
+
+    return hook
+
+
+@contextmanager
+def hook_executor(records: HTTPRecords) -> Generator[None, None, None]:
+    concurrent.futures.ThreadPoolExecutor.submit = decorate(  # type: ignore[method-assign]
+        records,
+        concurrent.futures.ThreadPoolExecutor.submit,
+        set_hook_for_executor_submit,
+    )
+
+    yield
+
+    concurrent.futures.ThreadPoolExecutor.submit = undecorate(  # type: ignore[method-assign]
+        concurrent.futures.ThreadPoolExecutor.submit
+    )
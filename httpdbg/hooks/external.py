@@ -8,9 +8,13 @@ import time
 import threading
 from typing import Union
 
+from httpdbg.argsrepr import ArgsRepr
 from httpdbg.env import HTTPDBG_MULTIPROCESS_DIR
+from httpdbg.ingestion import IngestionQueue
 from httpdbg.log import logger
 from httpdbg.records import HTTPRecords
+from httpdbg.retention import RetentionPolicy
+from httpdbg.sampling import SamplingPolicy
 
 
 @contextmanager
@@ -18,6 +22,11 @@ def watcher_external(
     records: HTTPRecords,
     initiators: Union[list[str], None] = None,
     server: bool = False,
+    max_body_size: int = 0,
+    sampling: Union[SamplingPolicy, None] = None,
+    args_repr: Union[ArgsRepr, None] = None,
+    ingestion: Union[IngestionQueue, None] = None,
+    retention: Union[RetentionPolicy, None] = None,
 ) -> Generator[HTTPRecords, None, None]:
     if HTTPDBG_MULTIPROCESS_DIR not in os.environ:
         with tempfile.TemporaryDirectory(prefix="httpdbg_") as httpdbg_multiprocess_dir:
@@ -46,6 +55,40 @@ def watcher_external(
                 "HTTPDBG_RECORD_SERVER = False", f"HTTPDBG_RECORD_SERVER = {server}", 1
             )
 
+            template_content = template_content.replace(
+                "HTTPDBG_MAX_BODY_SIZE = 0",
+                f"HTTPDBG_MAX_BODY_SIZE = {max_body_size}",
+                1,
+            )
+
+            if sampling:
+                template_content = template_content.replace(
+                    "HTTPDBG_SAMPLING = {}  # type: ignore",
+                    f"HTTPDBG_SAMPLING = {sampling.to_args()}",
+                    1,
+                )
+
+            if args_repr:
+                template_content = template_content.replace(
+                    "HTTPDBG_ARGS_REPR = {}  # type: ignore",
+                    f"HTTPDBG_ARGS_REPR = {args_repr.to_args()}",
+                    1,
+                )
+
+            if ingestion:
+                template_content = template_content.replace(
+                    "HTTPDBG_INGESTION = {}  # type: ignore",
+                    f"HTTPDBG_INGESTION = {ingestion.to_args()}",
+                    1,
+                )
+
+            if retention:
+                template_content = template_content.replace(
+                    "HTTPDBG_RETENTION = {}  # type: ignore",
+                    f"HTTPDBG_RETENTION = {retention.to_args()}",
+                    1,
+                )
+
             with open(sitecustomize, "w") as f:
                 f.write(template_content)
 
@@ -81,9 +124,7 @@ class WatcherSubprocessDirThread(threading.Thread):
         for dump in glob.glob(os.path.join(self.directory, "*.httpdbgrecords")):
             with open(dump, "rb") as dumpfile:
                 newrecords: HTTPRecords = pickle.load(dumpfile)
-                self.records.requests.update(newrecords.requests)
-                self.records.initiators.update(newrecords.initiators)
-                self.records.groups.update(newrecords.groups)
+                self.records.merge(newrecords)
 
     def run(self):
         while self._running:
@@ -92,7 +92,7 @@ def set_hook_fastapi_app(records: HTTPRecords, method: Callable):
                         record.tbegin = sock.record.tbegin - datetime.timedelta(
                             milliseconds=1
                         )
-                        sock.record.group_id = group.id
+                        records.set_group(sock.record, group.id)
 
             ret = await method(*args, **kwargs)
 
@@ -1,6 +1,8 @@
 from collections.abc import Callable
+from collections.abc import Hashable
 from contextlib import contextmanager
 import random
+import weakref
 from typing import Generator
 from typing import Union
 
@@ -9,8 +11,12 @@ from httpdbg.hooks.utils import decorate
 from httpdbg.hooks.utils import getcallargs
 from httpdbg.hooks.utils import undecorate
 from httpdbg.initiator import httpdbg_initiator
+from httpdbg.log import log_debug
+from httpdbg.log import log_info
 from httpdbg.log import logger
 from httpdbg.records import HTTPRecords
+from httpdbg.sampling import SamplingPolicy
+from httpdbg.utils import get_new_uuid
 
 
 class TracerHTTP2:
@@ -18,9 +24,90 @@ class TracerHTTP2:
     def __init__(
         self,
         ignore: tuple[tuple[str, int], ...] = (),
+        max_body_size: int = 0,
+        sampling: Union[SamplingPolicy, None] = None,
     ):
-        self.sockets: dict[str, HTTP2Record] = dict()
+        # the key is (id of the H2Connection object, stream id), the entry is removed
+        # when the response is complete or when the connection object is garbage collected
+        self.sockets: dict[tuple[int, int], Union[HTTP2Record, None]] = (
+            dict()
+        )  # if None, the stream has been sampled out
+        # id of the H2Connection object -> (connection id, number of requests)
+        self.connections: dict[int, tuple[str, int]] = dict()
         self.ignore: tuple[tuple[str, int], ...] = ignore
+        self.max_body_size: int = max_body_size
+        self.sampling: SamplingPolicy = sampling if sampling else SamplingPolicy()
+
+    def watch(self, connection) -> None:
+        """Forget the streams of a connection when the connection object is deleted."""
+        if id(connection) not in self.connections:
+            self.connections[id(connection)] = (get_new_uuid(), 0)
+            finalizer = weakref.finalize(connection, self.forget, id(connection))
+            finalizer.atexit = False
+
+    def forget(self, socket_id: int) -> None:
+        self.connections.pop(socket_id, None)
+        for key in [key for key in self.sockets if key[0] == socket_id]:
+            del self.sockets[key]
+
+    def next_request(self, socket_id: int) -> tuple[str, int]:
+        """Count a new request on the connection, return the connection id and its sequence."""
+        connection_id, sequence = self.connections.get(socket_id, (get_new_uuid(), 0))
+        self.connections[socket_id] = (connection_id, sequence + 1)
+        return connection_id, sequence + 1
+
+    def link_record(self, socket_id: int, stream_id: int, record: HTTP2Record) -> None:
+        record.connection_id, record.connection_sequence = self.next_request(socket_id)
+        self.sockets[(socket_id, stream_id)] = record
+
+    def end_stream(self, socket_id: int, stream_id: int, received: bool) -> None:
+        """A stream has been ended by one of the peers.
+
+        The entry is removed once the response is complete. For a stream sampled out,
+        we don't know which peer is the client but nothing more is recorded once
+        a stream ended locally.
+        """
+        key = (socket_id, stream_id)
+        if key not in self.sockets:
+            return
+        record = self.sockets[key]
+        if (record is None and not received) or (
+            record is not None and record.is_client == received
+        ):
+            if log_debug():
+                logger().debug(f"H2 stream {socket_id}-{stream_id} ended")
+            del self.sockets[key]
+            if record is not None:
+                record.end()
+
+    def reset_stream(self, socket_id: int, stream_id: int) -> None:
+        record = self.sockets.pop((socket_id, stream_id), None)
+        if record is not None:
+            record.end()
+
+    def sample(
+        self,
+        socket_id: int,
+        stream_id: int,
+        headers: list[tuple[bytes, bytes]],
+        call_site: Hashable,
+        sampled: bool,
+    ) -> bool:
+        """Decide if a new request must be recorded (sampling)."""
+        if not sampled:
+            return True
+        authority = ""
+        for name, value in headers:
+            if name == b":authority":
+                authority = value.decode(errors="replace")
+                break
+        if self.sampling.keep(authority, call_site):
+            return True
+        if log_info():
+            logger().info(f"H2 stream {socket_id}-{stream_id} sampled out")
+        self.next_request(socket_id)
+        self.sockets[(socket_id, stream_id)] = None
+        return False
 
     def send_headers(
         self,
@@ -29,23 +116,38 @@ class TracerHTTP2:
         socket_id: int,
         stream_id: int,
         headers: list[tuple[bytes, bytes]],
-    ) -> HTTP2Record:
+        call_site: Hashable = (),
+        sampled: bool = True,
+    ) -> Union[HTTP2Record, None]:
 
-        if f"{socket_id}-{stream_id}" in self.sockets:
-            record = self.sockets[f"{socket_id}-{stream_id}"]
-            if record.is_client:
+        if (socket_id, stream_id) in self.sockets:
+            record = self.sockets[(socket_id, stream_id)]
+            if record is None:
+                pass  # sampled out
+            elif record.is_client:
                 # this is a new request: we "close" the previous one
-                self.sockets.pop(f"{socket_id}-{stream_id}")
+                self.sockets.pop((socket_id, stream_id))
+                if not self.sample(socket_id, stream_id, headers, call_site, sampled):
+                    return None
 
-                record = HTTP2Record(initiator_id, group_id)
+                record = HTTP2Record(
+                    initiator_id, group_id, max_body_size=self.max_body_size
+                )
                 record.request.headers = headers
-                self.sockets[f"{socket_id}-{stream_id}"] = record
+                self.link_record(socket_id, stream_id, record)
             else:
                 record.response.headers = headers
         else:
-            record = HTTP2Record(initiator_id, group_id)
+            if not self.sample(socket_id, stream_id, headers, call_site, sampled):
+                return None
+            record = HTTP2Record(
+                initiator_id, group_id, max_body_size=self.max_body_size
+            )
             record.request.headers = headers
-            self.sockets[f"{socket_id}-{stream_id}"] = record
+            self.link_record(socket_id, stream_id, record)
+
+        if record:
+            record.mark_sent()
 
         return record
 
@@ -55,7 +157,7 @@ class TracerHTTP2:
         stream_id: int,
         data: bytes,
     ):
-        record = self.sockets.get(f"{socket_id}-{stream_id}")
+        record = self.sockets.get((socket_id, stream_id))
         if record:
             record.send_data(data)
 
@@ -67,19 +169,30 @@ class TracerHTTP2:
         stream_id: int,
         headers: list[tuple[bytes, bytes]],
         is_client: bool = True,
+        call_site: Hashable = (),
+        sampled: bool = True,
     ) -> Union[HTTP2Record, None]:
         record = None
         if not is_client:
-            if f"{socket_id}-{stream_id}" in self.sockets:
+            if (socket_id, stream_id) in self.sockets:
                 # this is a new request received by the server: we "close" the previous one
-                self.sockets.pop(f"{socket_id}-{stream_id}")
-            record = HTTP2Record(initiator_id, group_id, is_client=False)
+                self.sockets.pop((socket_id, stream_id))
+            if not self.sample(socket_id, stream_id, headers, call_site, sampled):
+                return None
+            record = HTTP2Record(
+                initiator_id,
+                group_id,
+                is_client=False,
+                max_body_size=self.max_body_size,
+            )
             record.request.headers = headers
-            self.sockets[f"{socket_id}-{stream_id}"] = record
+            self.link_record(socket_id, stream_id, record)
         else:
-            if f"{socket_id}-{stream_id}" in self.sockets:
-                record = self.sockets[f"{socket_id}-{stream_id}"]
+            record = self.sockets.get((socket_id, stream_id))
+            if record:
                 record.response.headers = headers
+        if record:
+            record.mark_received()
         return record
 
     def receive_data(
@@ -88,7 +201,7 @@ class TracerHTTP2:
         stream_id: int,
         data: bytes,
     ):
-        record = self.sockets.get(f"{socket_id}-{stream_id}")
+        record = self.sockets.get((socket_id, stream_id))
         if record:
             record.receive_data(data)
 
@@ -103,14 +216,24 @@ def set_hook_for_h2_send_headers(records: HTTPRecords, method: Callable):
         with httpdbg_initiator(records, method, *args, **kwargs) as initiator_and_group:
             initiator, group, _ = initiator_and_group
             if all(x is not None for x in (self, stream_id, headers)):
-                logger().debug(
-                    f"H2 send_headers - self={id(self)} steam_id={stream_id} headers={headers}"
-                )
+                if log_debug():
+                    logger().debug(
+                        f"H2 send_headers - self={id(self)} steam_id={stream_id} headers={headers}"
+                    )
+                records._tracerhttp2.watch(self)
                 record = records._tracerhttp2.send_headers(
-                    initiator.id, group.id, id(self), stream_id, headers
+                    initiator.id,
+                    group.id,
+                    id(self),
+                    stream_id,
+                    headers,
+                    call_site=initiator.key,
+                    sampled=records.client,
                 )
-                if record.is_client and records.client:
-                    records.requests[record.id] = record
+                if record and record.is_client and records.client:
+                    records.add_request(record)
+                if callargs.get("end_stream"):
+                    records._tracerhttp2.end_stream(id(self), stream_id, received=False)
             ret = method(*args, **kwargs)
         return ret
 
@@ -126,10 +249,13 @@ def set_hook_for_h2_send_data(records: HTTPRecords, method: Callable):
 
         with httpdbg_initiator(records, method, *args, **kwargs):
             if all(x is not None for x in (self, stream_id, data)):
-                logger().debug(
-                    f"H2 send_data - self={id(self)} steam_id={stream_id} data={data[:20]!r}"
-                )
+                if log_debug():
+                    logger().debug(
+                        f"H2 send_data - self={id(self)} steam_id={stream_id} data={data[:20]!r}"
+                    )
                 records._tracerhttp2.send_data(id(self), stream_id, data)
+                if callargs.get("end_stream"):
+                    records._tracerhttp2.end_stream(id(self), stream_id, received=False)
             ret = method(*args, **kwargs)
         return ret
 
@@ -144,49 +270,97 @@ def set_hook_for_h2_receive_data(records: HTTPRecords, method: Callable):
         with httpdbg_initiator(records, method, *args, **kwargs) as initiator_and_group:
             initiator, group, _ = initiator_and_group
             ret = method(*args, **kwargs)
+            records._tracerhttp2.watch(self)
+
+            for event in ret:
+                import h2.events
+
+                if isinstance(event, h2.events.RequestReceived):
+                    stream_id = event.stream_id
+                    headers = event.headers
+                    if all(x is not None for x in (self, stream_id, headers)):
+                        if log_debug():
+                            logger().debug(
+                                f"H2 receive_data headers RequestReceived {random.random()} - self={id(self)} steam_id={stream_id} headers={headers}"
+                            )
+                        record = records._tracerhttp2.receive_headers(
+                            initiator.id,
+                            group.id,
+                            id(self),
+                            stream_id,
+                            headers,
+                            is_client=False,
+                            call_site=initiator.key,
+                            sampled=records.server,
+                        )
+                        if record and (record.is_client is False) and records.server:
+                            records.add_request(record)
+
+                elif isinstance(event, h2.events.ResponseReceived):
+                    stream_id = event.stream_id
+                    headers = event.headers
+                    if all(x is not None for x in (self, stream_id, headers)):
+                        if log_debug():
+                            logger().debug(
+                                f"H2 receive_data headers ResponseReceived {random.random()} - self={id(self)} steam_id={stream_id} headers={headers}"
+                            )
+                        records._tracerhttp2.receive_headers(
+                            initiator.id, group.id, id(self), stream_id, headers
+                        )
+
+                elif isinstance(event, h2.events.DataReceived):
+                    stream_id = event.stream_id
+                    data = event.data
+                    if all(x is not None for x in (self, stream_id, data)):
+                        if log_debug():
+                            logger().debug(
+                                f"H2 receive_data data - self={id(self)} steam_id={stream_id} data={data[:20]!r}"
+                            )
+                        records._tracerhttp2.receive_data(id(self), stream_id, data)
+
+                elif isinstance(event, h2.events.StreamEnded):
+                    records._tracerhttp2.end_stream(
+                        id(self), event.stream_id, received=True
+                    )
 
-        for event in ret:
-            import h2.events
+                elif isinstance(event, h2.events.StreamReset):
+                    records._tracerhttp2.reset_stream(id(self), event.stream_id)
 
-            if isinstance(event, h2.events.RequestReceived):
-                stream_id = event.stream_id
-                headers = event.headers
-                if all(x is not None for x in (self, stream_id, headers)):
-                    logger().debug(
-                        f"H2 receive_data headers RequestReceived {random.random()} - self={id(self)} steam_id={stream_id} headers={headers}"
-                    )
-                    record = records._tracerhttp2.receive_headers(
-                        initiator.id,
-                        group.id,
-                        id(self),
-                        stream_id,
-                        headers,
-                        is_client=False,
-                    )
-                    if record and (record.is_client is False) and records.server:
-                        records.requests[record.id] = record
+        return ret
 
-            elif isinstance(event, h2.events.ResponseReceived):
-                stream_id = event.stream_id
-                headers = event.headers
-                if all(x is not None for x in (self, stream_id, headers)):
-                    logger().debug(
-                        f"H2 receive_data headers ResponseReceived {random.random()} - self={id(self)} steam_id={stream_id} headers={headers}"
-                    )
-                    records._tracerhttp2.receive_headers(
-                        initiator.id, group.id, id(self), stream_id, headers
-                    )
+    return hook
 
-            elif isinstance(event, h2.events.DataReceived):
-                stream_id = event.stream_id
-                data = event.data
-                if all(x is not None for x in (self, stream_id, data)):
-                    logger().debug(
-                        f"H2 receive_data data - self={id(self)} steam_id={stream_id} data={data[:20]!r}"
-                    )
-                    records._tracerhttp2.receive_data(id(self), stream_id, data)
 
-        return ret
+def set_hook_for_h2_end_stream(records: HTTPRecords, method: Callable):
+    def hook(*args, **kwargs):
+        callargs = getcallargs(method, *args, **kwargs)
+        self = callargs.get("self")
+        stream_id = callargs.get("stream_id")
+
+        if all(x is not None for x in (self, stream_id)):
+            if log_debug():
+                logger().debug(f"H2 end_stream - self={id(self)} steam_id={stream_id}")
+            records._tracerhttp2.end_stream(id(self), stream_id, received=False)
+
+        return method(*args, **kwargs)
+
+    return hook
+
+
+def set_hook_for_h2_reset_stream(records: HTTPRecords, method: Callable):
+    def hook(*args, **kwargs):
+        callargs = getcallargs(method, *args, **kwargs)
+        self = callargs.get("self")
+        stream_id = callargs.get("stream_id")
+
+        if all(x is not None for x in (self, stream_id)):
+            if log_debug():
+                logger().debug(
+                    f"H2 reset_stream - self={id(self)} steam_id={stream_id}"
+                )
+            records._tracerhttp2.reset_stream(id(self), stream_id)
+
+        return method(*args, **kwargs)
 
     return hook
 
@@ -200,6 +374,8 @@ def hook_h2(records: HTTPRecords) -> Generator[None, None, None]:
         h2.connection.H2Connection.send_headers = decorate(records, h2.connection.H2Connection.send_headers, set_hook_for_h2_send_headers)  # type: ignore[arg-type]
         h2.connection.H2Connection.send_data = decorate(records, h2.connection.H2Connection.send_data, set_hook_for_h2_send_data)  # type: ignore[arg-type]
         h2.connection.H2Connection.receive_data = decorate(records, h2.connection.H2Connection.receive_data, set_hook_for_h2_receive_data)  # type: ignore[arg-type]
+        h2.connection.H2Connection.end_stream = decorate(records, h2.connection.H2Connection.end_stream, set_hook_for_h2_end_stream)  # type: ignore[arg-type]
+        h2.connection.H2Connection.reset_stream = decorate(records, h2.connection.H2Connection.reset_stream, set_hook_for_h2_reset_stream)  # type: ignore[arg-type]
 
         hooks = True
     except ImportError:
@@ -211,3 +387,5 @@ def hook_h2(records: HTTPRecords) -> Generator[None, None, None]:
         h2.connection.H2Connection.send_headers = undecorate(h2.connection.H2Connection.send_headers)  # type: ignore[arg-type]
         h2.connection.H2Connection.send_data = undecorate(h2.connection.H2Connection.send_data)  # type: ignore[arg-type]
         h2.connection.H2Connection.receive_data = undecorate(h2.connection.H2Connection.receive_data)  # type: ignore[arg-type]
+        h2.connection.H2Connection.end_stream = undecorate(h2.connection.H2Connection.end_stream)  # type: ignore[arg-type]
+        h2.connection.H2Connection.reset_stream = undecorate(h2.connection.H2Connection.reset_stream)  # type: ignore[arg-type]
@@ -0,0 +1,59 @@
+from typing import Union
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from httpdbg.hooks.record import HTTPRecord
+    from httpdbg.records import HTTPRecords
+
+
+class LoopbackGroups:
+    """Group a request sent by the process to its own server with the server side.
+
+    The context of the client (its current group) is not shared with the thread or
+    the task of the server. The two sides of the connection are linked by their
+    address: the local address of the client is the peer address of the server.
+    """
+
+    def __init__(self) -> None:
+        # the request being sent on each client connection, by local address
+        self._clients: dict[tuple[str, int], tuple[int, "HTTPRecord"]] = {}
+        self._addresses: dict[int, tuple[str, int]] = {}
+
+    def track(self, obj, record: "HTTPRecord") -> None:
+        """A request is sent on a client connection."""
+        address = self._addresses.get(id(obj))
+        if address is None:
+            try:
+                address = tuple(obj.getsockname()[:2])  # type: ignore[assignment]
+            except (AttributeError, OSError, TypeError):
+                return
+            self._addresses[id(obj)] = address  # type: ignore[assignment]
+        self._clients[address] = (id(obj), record)  # type: ignore[index]
+
+    def untrack(self, key: int) -> None:
+        """The client connection (the id of the socket object) is closed."""
+        address = self._addresses.pop(key, None)
+        if address is not None and self._clients.get(address, (None,))[0] == key:
+            del self._clients[address]
+
+    def group(self, obj) -> Union[str, None]:
+        """The group of the request sent by this process to the peer of a server connection."""
+        if not self._clients:
+            return None
+        try:
+            if hasattr(obj, "getpeername"):
+                peer = obj.getpeername()
+            else:  # uvicorn protocol
+                peer = obj.transport.get_extra_info("peername")
+        except (AttributeError, OSError):
+            return None
+        if not peer:
+            return None
+        client = self._clients.get(tuple(peer[:2]))  # type: ignore[arg-type]
+        return client[1].group_id if client else None
+
+    def join(self, records: "HTTPRecords", obj) -> None:
+        """A request received from this process joins the group of the request sent."""
+        group_id = self.group(obj)
+        if group_id and group_id in records.groups:
+            records.current_group = group_id
@@ -1,27 +1,150 @@
 from abc import ABC, abstractmethod
 import datetime
+import sys
+import time
 from typing import Union
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
+if TYPE_CHECKING:
+    from httpdbg.initiator import Call
+
+from httpdbg.hooks.stats import attribute_overhead
 from httpdbg.utils import get_new_uuid
+from httpdbg.utils import HTTPDBGBuffer
 from httpdbg.utils import HTTPDBGCookie
 from httpdbg.utils import HTTPDBGHeader
 from httpdbg.utils import list_cookies_headers_request_simple_cookies
 from httpdbg.utils import list_cookies_headers_response_simple_cookies
 
 
-class HTTPRecordReqResp(ABC):
+class HTTPRecordTiming:
+    """The timestamps (time.perf_counter_ns) of the phases of an HTTP exchange.
+
+    A timestamp equal to 0 means the phase has not been observed (for example,
+    no connection nor TLS handshake if the connection is reused).
+    """
+
+    __slots__ = (
+        "connect_start",
+        "connect_end",
+        "tls_start",
+        "tls_end",
+        "request_start",
+        "request_end",
+        "response_start",
+        "response_end",
+    )
 
     def __init__(self) -> None:
-        self.last_update: datetime.datetime = datetime.datetime.now(
-            datetime.timezone.utc
-        )
+        self.connect_start: int = 0
+        self.connect_end: int = 0
+        self.tls_start: int = 0
+        self.tls_end: int = 0
+        self.request_start: int = 0  # first byte of the request
+        self.request_end: int = 0  # last byte of the request
+        self.response_start: int = 0  # first byte of the response
+        self.response_end: int = 0  # last byte of the response
+
+    def request_data(self, now: int = 0) -> None:
+        now = now or time.perf_counter_ns()
+        if not self.request_start:
+            self.request_start = now
+        self.request_end = now
+
+    def response_data(self, now: int = 0) -> None:
+        now = now or time.perf_counter_ns()
+        if not self.response_start:
+            self.response_start = now
+        self.response_end = now
+
+    @staticmethod
+    def _ms(start: int, end: int) -> Union[float, None]:
+        if start and end:
+            return round((end - start) / 1_000_000, 3)
+        return None
+
+    @property
+    def duration(self) -> Union[float, None]:
+        """From the connection (or the first byte sent) to the last byte received, in ms."""
+        start = self.connect_start or self.tls_start or self.request_start
+        return self._ms(start, self.response_end or self.request_end)
+
+    def to_json(self) -> dict:
+        return {
+            "connect": self._ms(self.connect_start, self.connect_end),
+            "tls": self._ms(self.tls_start, self.tls_end),
+            "send": self._ms(self.request_start, self.request_end),
+            "wait": self._ms(self.request_end, self.response_start),
+            "ttfb": self._ms(self.request_start, self.response_start),
+            "receive": self._ms(self.response_start, self.response_end),
+            "total": self.duration,
+        }
+
+
+class HTTPRecordReqResp(ABC):
+    # many records may be kept in memory: the records and their requests and
+    # responses have no __dict__
+    __slots__ = (
+        "_last_update",
+        "_version",
+        "max_body_size",
+        "_body",
+        "body_length",
+        "truncated",
+        "_header_index",
+        "_cookies",
+    )
+
+    def __init__(self, max_body_size: int = 0) -> None:
+        self._last_update: float = time.time()  # a datetime is built only if read
+        self._version: int = 0  # incremented by each update
+        self.max_body_size: int = max_body_size  # 0 means no limit
+        self._body: HTTPDBGBuffer = HTTPDBGBuffer()
+        self.body_length: int = 0  # all the bytes received, even those not retained
+        self.truncated: bool = False
+        # built from the headers when first used, reset when the headers change
+        self._header_index: Union[dict[str, str], None] = None
+        self._cookies: Union[list[HTTPDBGCookie], None] = None
+
+    @property
+    def last_update(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self._last_update, datetime.timezone.utc)
+
+    def touch(self) -> None:
+        self._last_update = time.time()
+        self._version += 1
+
+    @property
+    def size(self) -> int:
+        """The number of bytes retained (approximately)."""
+        return len(self._body)
+
+    @property
+    def has_content(self) -> bool:
+        """A body has been recorded (without materializing it, see content)."""
+        return bool(self._body)
+
+    def _append_body(self, data: bytes) -> None:
+        self.body_length += len(data)
+        if self.max_body_size and (len(self._body) + len(data) > self.max_body_size):
+            data = data[: max(0, self.max_body_size - len(self._body))]
+            self.truncated = True
+        self._body.append(data)
+
+    def headers_changed(self) -> None:
+        self._header_index = None
+        self._cookies = None
 
     def get_header(self, name: str, default: str = "") -> str:
-        for header in self.headers:
-            if header.name.lower() == name.lower():
-                return header.value
-        return default
+        if self._header_index is None:
+            # the first value of each header, by lowercase name (the names are
+            # interned, they are shared by all the records)
+            index: dict[str, str] = {}
+            for header in self.headers:
+                index.setdefault(sys.intern(header.name.lower()), header.value)
+            self._header_index = index
+        return self._header_index.get(name.lower(), default)
 
     @property
     @abstractmethod
@@ -40,10 +163,13 @@ class HTTPRecordReqResp(ABC):
 
 
 class HTTPRecordRequest(HTTPRecordReqResp, ABC):
+    __slots__ = ()
 
     @property
     def cookies(self) -> list[HTTPDBGCookie]:
-        return list_cookies_headers_request_simple_cookies(self.headers)
+        if self._cookies is None:
+            self._cookies = list_cookies_headers_request_simple_cookies(self.headers)
+        return self._cookies
 
     @property
     @abstractmethod
@@ -62,10 +188,13 @@ class HTTPRecordRequest(HTTPRecordReqResp, ABC):
 
 
 class HTTPRecordResponse(HTTPRecordReqResp, ABC):
+    __slots__ = ()
 
     @property
     def cookies(self) -> list[HTTPDBGCookie]:
-        return list_cookies_headers_response_simple_cookies(self.headers)
+        if self._cookies is None:
+            self._cookies = list_cookies_headers_response_simple_cookies(self.headers)
+        return self._cookies
 
     @property
     @abstractmethod
@@ -84,6 +213,29 @@ class HTTPRecordResponse(HTTPRecordReqResp, ABC):
 
 
 class HTTPRecord(ABC):
+    __slots__ = (
+        "id",
+        "address",
+        "_url",
+        "initiator_id",
+        "call",
+        "exception",
+        "ssl",
+        "tbegin",
+        "tag",
+        "group_id",
+        "is_client",
+        "http100",
+        "timing",
+        "connection_id",
+        "connection_sequence",
+        "overhead_ns",
+        "incomplete",
+        "seq",
+        "request",
+        "response",
+    )
+
     request: HTTPRecordRequest
     response: HTTPRecordResponse
 
@@ -100,6 +252,8 @@ class HTTPRecord(ABC):
         self.address: tuple[str, int] = ("", 0)
         self._url: Union[str, None] = None
         self.initiator_id: str = initiator_id
+        # the arguments of the call (the initiator is shared by the calls of a call site)
+        self.call: Union["Call", None] = None
         self.exception: Union[Exception, None] = None
         self.ssl: Union[bool, None] = None
         self.tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
@@ -109,6 +263,13 @@ class HTTPRecord(ABC):
         if tbegin:
             self.tbegin = tbegin
         self.http100: bool = False
+        self.timing: HTTPRecordTiming = HTTPRecordTiming()
+        self.connection_id: str = ""
+        self.connection_sequence: int = 0  # 1 for the first request on the connection
+        self.overhead_ns: int = 0  # time spent by httpdbg in the hooks for this request
+        # some data have not been recorded (the ingestion queue was full)
+        self.incomplete: bool = False
+        self.seq: int = 0  # set when the record is added to the records
 
     @property
     @abstractmethod
@@ -151,24 +312,70 @@ class HTTPRecord(ABC):
 
     @property
     def in_progress(self) -> bool:
+        if self.incomplete:
+            return False  # nothing more is recorded
         try:
             length = int(self.response.get_header("Content-Length", "0"))
             if length:
-                return len(self.response.content) < length
+                return self.response.body_length < length
         except Exception:
             pass
         return False
 
+    @property
+    def size(self) -> int:
+        return self.request.size + self.response.size
+
+    @property
+    def new_connection(self) -> bool:
+        """The request paid for the setup of the connection (TCP/TLS)."""
+        return self.connection_sequence == 1
+
+    @property
+    def updated(self) -> float:
+        """The timestamp of the last update of the request or the response."""
+        return max(self.request._last_update, self.response._last_update)
+
     @property
     def last_update(self) -> datetime.datetime:
-        return max(self.request.last_update, self.response.last_update)
+        return datetime.datetime.fromtimestamp(self.updated, datetime.timezone.utc)
+
+    @property
+    def version(self) -> int:
+        """Incremented by each update of the record (unlike updated, never equal)."""
+        return self.request._version + self.response._version
+
+    def touch(self) -> None:
+        """The record itself (not its request or its response) has been updated."""
+        self.response.touch()
+
+    @property
+    def complete(self) -> bool:
+        """The response (or an exception) has been fully recorded."""
+        if self.exception is not None or self.incomplete:
+            return True
+        return bool(self.response.status_code) and not self.in_progress
+
+    def mark_sent(self, timestamp: int = 0) -> None:
+        attribute_overhead(self)
+        if self.is_client:
+            self.timing.request_data(timestamp)
+        else:
+            self.timing.response_data(timestamp)
+
+    def mark_received(self, timestamp: int = 0) -> None:
+        attribute_overhead(self)
+        if self.is_client:
+            self.timing.response_data(timestamp)
+        else:
+            self.timing.request_data(timestamp)
 
     @abstractmethod
-    def receive_data(self, data: bytes):
+    def receive_data(self, data: bytes, timestamp: int = 0):
         pass
 
     @abstractmethod
-    def send_data(self, data: bytes):
+    def send_data(self, data: bytes, timestamp: int = 0):
         pass
 
     @property
@@ -1,63 +1,216 @@
 import datetime
+from typing import Union
 
 from httpdbg.preview import generate_preview
 from httpdbg.hooks.record import HTTPRecord
 from httpdbg.hooks.record import HTTPRecordReqResp
 from httpdbg.hooks.record import HTTPRecordRequest
 from httpdbg.hooks.record import HTTPRecordResponse
-from httpdbg.utils import chunked_to_bytes
+from httpdbg.utils import HTTPDBGBuffer
 from httpdbg.utils import HTTPDBGHeader
 
+# an interim response, the final response is received later on the connection
+HTTP100_CONTINUE = {
+    b"http/1.1 100 continue\r\n\r\n",
+    b"http/1.0 100 continue\r\n\r\n",
+}
+
 
 class HTTP1RecordReqResp(HTTPRecordReqResp):
-    def __init__(self) -> None:
-        super().__init__()
-        self._rawdata: bytes = bytes()
+    """The HTTP/1 message is parsed incrementally, each time new data is appended.
+
+    The raw data are kept only until the end of the headers, the body is stored
+    decoded (without the chunked encoding) and limited to max_body_size.
+    """
+
+    # how the end of the body is detected
+    FRAMING_NONE = "none"  # no body
+    FRAMING_LENGTH = "length"  # Content-Length
+    FRAMING_CHUNKED = "chunked"  # Transfer-Encoding: chunked
+    FRAMING_CLOSE = "close"  # the body ends when the connection is closed
+
+    # state of the chunked body parser
+    CHUNK_SIZE = 0
+    CHUNK_DATA = 1
+    CHUNK_DATA_END = 2
+    CHUNK_TRAILER = 3
+
+    # a chunk size line or a trailer line longer than that is considered as malformed
+    MAX_CHUNK_LINE = 4096
+
+    __slots__ = (
+        "_rawdata",
+        "_rawheaders",
+        "_headers",
+        "_headers_received",
+        "_raw_body_length",
+        "_framing",
+        "_content_length",
+        "_chunk_state",
+        "_chunk_line",
+        "_chunk_remaining",
+        "complete",
+        "tend",
+    )
+
+    def __init__(self, max_body_size: int = 0) -> None:
+        super().__init__(max_body_size)
+        self._reset(bytes())
+
+    def _reset(self, value: bytes) -> None:
+        self._rawdata: HTTPDBGBuffer = HTTPDBGBuffer()
         self._rawheaders: bytes = bytes()
         self._headers: list[HTTPDBGHeader] = []
+        self.headers_changed()
+        self._headers_received: bool = False
+        self._raw_body_length: int = 0
+        self._framing: str = ""
+        self._content_length: int = 0
+        self._chunk_state: int = HTTP1RecordReqResp.CHUNK_SIZE
+        self._chunk_line: bytes = bytes()
+        self._chunk_remaining: int = 0
+        self._body.clear()
+        self.body_length = 0
+        self.truncated = False
+        self.complete: bool = False
+        self.tend: Union[datetime.datetime, None] = None
+        self._feed(value)
+
+    def _feed(self, data: bytes) -> None:
+        if not data:
+            return
+
+        if not self._headers_received:
+            searched = len(self._rawdata)
+            self._rawdata.append(data)
+            # we search the end of the headers only in the new data
+            sep = self._rawdata.find(b"\r\n\r\n", max(0, searched - 3))
+            if sep == -1:
+                return
+            data = self._rawdata[sep + 4 :]
+            self._rawdata = HTTPDBGBuffer(self._rawdata[: sep + 4])
+            self._rawheaders = self._rawdata[:sep]
+            self._headers_received = True
+            self._parse_headers()
+        else:
+            data = bytes(data)
+
+        self._raw_body_length += len(data)
+
+        if self.complete or not data:
+            return
+
+        if self._framing == HTTP1RecordReqResp.FRAMING_LENGTH:
+            self._append_body(data[: self._content_length - self.body_length])
+            if self.body_length >= self._content_length:
+                self._set_complete()
+        elif self._framing == HTTP1RecordReqResp.FRAMING_CHUNKED:
+            self._parse_chunks(data)
+        else:
+            self._append_body(data)
+
+    def _parse_headers(self) -> None:
+        for header in self._rawheaders[self._rawheaders.find(b"\r\n") :].split(b"\r\n"):
+            sh = header.split(b":")
+            name = sh[0]
+            value = b":".join(sh[1:])
+            if name:
+                self._headers.append(
+                    HTTPDBGHeader(name.decode().strip(), value.decode().strip())
+                )
+        self.headers_changed()
+
+        content_length = self.get_header("Content-Length")
+        if not self._has_body():
+            self._framing = HTTP1RecordReqResp.FRAMING_NONE
+        elif "chunked" in self.get_header("Transfer-Encoding", "").lower():
+            self._framing = HTTP1RecordReqResp.FRAMING_CHUNKED
+        elif content_length:
+            self._framing = HTTP1RecordReqResp.FRAMING_LENGTH
+            try:
+                self._content_length = int(content_length)
+            except ValueError:
+                self._framing = HTTP1RecordReqResp.FRAMING_CLOSE
+        else:
+            self._framing = self._framing_without_length()
+
+        if (self._framing == HTTP1RecordReqResp.FRAMING_NONE) or (
+            self._framing == HTTP1RecordReqResp.FRAMING_LENGTH
+            and self._content_length == 0
+        ):
+            self._set_complete()
+
+    def _read_chunk_line(self, data: bytes, pos: int) -> tuple[Union[bytes, None], int]:
+        eol = data.find(b"\n", pos)
+        if eol == -1:
+            self._chunk_line += data[pos:]
+            if len(self._chunk_line) > HTTP1RecordReqResp.MAX_CHUNK_LINE:
+                raise ValueError("chunk line too long")
+            return None, len(data)
+        line = (self._chunk_line + data[pos:eol]).rstrip(b"\r")
+        self._chunk_line = bytes()
+        return line, eol + 1
+
+    def _parse_chunks(self, data: bytes) -> None:
+        pos = 0
+        try:
+            while (pos < len(data)) and not self.complete:
+                if self._chunk_state == HTTP1RecordReqResp.CHUNK_SIZE:
+                    line, pos = self._read_chunk_line(data, pos)
+                    if line is not None:
+                        self._chunk_remaining = int(line.split(b";")[0], 16)
+                        self._chunk_state = (
+                            HTTP1RecordReqResp.CHUNK_DATA
+                            if self._chunk_remaining
+                            else HTTP1RecordReqResp.CHUNK_TRAILER
+                        )
+                elif self._chunk_state == HTTP1RecordReqResp.CHUNK_DATA:
+                    size = min(len(data) - pos, self._chunk_remaining)
+                    self._append_body(data[pos : pos + size])
+                    pos += size
+                    self._chunk_remaining -= size
+                    if self._chunk_remaining == 0:
+                        self._chunk_state = HTTP1RecordReqResp.CHUNK_DATA_END
+                elif self._chunk_state == HTTP1RecordReqResp.CHUNK_DATA_END:
+                    line, pos = self._read_chunk_line(data, pos)
+                    if line is not None:
+                        self._chunk_state = HTTP1RecordReqResp.CHUNK_SIZE
+                else:  # CHUNK_TRAILER
+                    line, pos = self._read_chunk_line(data, pos)
+                    if line == b"":
+                        self._set_complete()
+        except ValueError:
+            # the chunked data are malformed, we stop parsing them
+            self._set_complete()
+
+    def _set_complete(self) -> None:
+        self.complete = True
+        self.tend = datetime.datetime.now(datetime.timezone.utc)
+
+    def _has_body(self) -> bool:
+        return True
+
+    def _framing_without_length(self) -> str:
+        return HTTP1RecordReqResp.FRAMING_NONE
+
+    @property
+    def in_progress(self) -> bool:
+        """The headers have been received but not yet the full body."""
+        return self._headers_received and not (
+            self.complete or self._framing == HTTP1RecordReqResp.FRAMING_CLOSE
+        )
 
     @property
     def rawheaders(self) -> bytes:
-        if not self._rawheaders:
-            sep = self.rawdata.find(b"\r\n\r\n")
-            if sep > -1:
-                self._rawheaders = self.rawdata[:sep]
         return self._rawheaders
 
     @property
     def headers(self) -> list[HTTPDBGHeader]:
-        if not self._headers:
-            if self.rawheaders:
-                for header in self.rawheaders[self.rawheaders.find(b"\r\n") :].split(
-                    b"\r\n"
-                ):
-                    sh = header.split(b":")
-                    name = sh[0]
-                    value = b":".join(sh[1:])
-                    if name:
-                        self._headers.append(
-                            HTTPDBGHeader(name.decode().strip(), value.decode().strip())
-                        )
         return self._headers
 
     @property
     def content(self) -> bytes:
-        rawdata = bytes()
-
-        sep = self.rawdata.find(b"\r\n\r\n")
-        if sep > -1:
-            rawcontent = self.rawdata[sep + 4 :]
-
-            content_length = self.get_header("Content-Length")
-
-            if content_length:
-                rawdata = rawcontent[: min(len(rawcontent), int(content_length))]
-            elif "chunked" in self.get_header("Transfer-Encoding", "").lower():
-                rawdata = chunked_to_bytes(rawcontent)
-            else:
-                rawdata = rawcontent
-
-        return rawdata
+        return self._body.getvalue()
 
     @property
     def preview(self):
@@ -69,20 +222,40 @@ class HTTP1RecordReqResp(HTTPRecordReqResp):
 
     @property
     def rawdata(self) -> bytes:
-        return self._rawdata
+        """The raw data until the end of the headers."""
+        return self._rawdata.getvalue()
 
     @rawdata.setter
     def rawdata(self, value: bytes):
-        self.last_update = datetime.datetime.now(datetime.timezone.utc)
-        self._rawdata = value
+        self.touch()
+        self._reset(value)
+
+    @property
+    def size(self) -> int:
+        return len(self._rawdata) + len(self._body)
+
+    @property
+    def rawlength(self) -> int:
+        return len(self._rawdata) + self._raw_body_length
+
+    def append_rawdata(self, data: bytes):
+        self.touch()
+        self._feed(data)
+
+    def close(self) -> None:
+        """No more data will be received: the message is complete, even if truncated."""
+        if self._headers_received and not self.complete:
+            self._set_complete()
 
 
 class HTTP1RecordRequest(HTTPRecordRequest, HTTP1RecordReqResp):
-    def __init__(self) -> None:
-        super().__init__()
+    __slots__ = ("_method", "_uri", "_protocol")
+
+    def _reset(self, value: bytes) -> None:
         self._method = bytes()
         self._uri = bytes()
         self._protocol = bytes()
+        super()._reset(value)
 
     def _parse_first_line(self) -> None:
         if self.rawheaders:
@@ -109,11 +282,28 @@ class HTTP1RecordRequest(HTTPRecordRequest, HTTP1RecordReqResp):
 
 
 class HTTP1RecordResponse(HTTPRecordResponse, HTTP1RecordReqResp):
-    def __init__(self):
-        super().__init__()
+    __slots__ = ("head_request", "_protocol", "_status_code", "_message")
+
+    def __init__(self, max_body_size: int = 0):
+        self.head_request: bool = False
+        super().__init__(max_body_size)
+
+    def _reset(self, value: bytes) -> None:
         self._protocol = bytes()
         self._status_code = bytes()
         self._message = bytes()
+        super()._reset(value)
+
+    def _has_body(self) -> bool:
+        # https://www.rfc-editor.org/rfc/rfc9112#section-6.3
+        return not (
+            self.head_request
+            or (100 <= self.status_code < 200)
+            or self.status_code in (204, 304)
+        )
+
+    def _framing_without_length(self) -> str:
+        return HTTP1RecordReqResp.FRAMING_CLOSE
 
     def _parse_first_line(self) -> None:
         if self.rawheaders:
@@ -140,6 +330,8 @@ class HTTP1RecordResponse(HTTPRecordResponse, HTTP1RecordReqResp):
 
 
 class HTTP1Record(HTTPRecord):
+    __slots__ = ()
+
     def __init__(
         self,
         initiator_id: str,
@@ -147,10 +339,11 @@ class HTTP1Record(HTTPRecord):
         tag: str = None,
         tbegin: datetime.datetime = None,
         is_client: bool = True,
+        max_body_size: int = 0,
     ) -> None:
         super().__init__(initiator_id, group_id, tag, tbegin, is_client)
-        self.request: HTTP1RecordRequest = HTTP1RecordRequest()
-        self.response: HTTP1RecordResponse = HTTP1RecordResponse()
+        self.request: HTTP1RecordRequest = HTTP1RecordRequest(max_body_size)
+        self.response: HTTP1RecordResponse = HTTP1RecordResponse(max_body_size)
 
     @property
     def url(self) -> str:
@@ -174,24 +367,47 @@ class HTTP1Record(HTTPRecord):
     def url(self, value: str) -> None:
         self._url = value
 
-    def receive_data(self, data: bytes):
+    @property
+    def in_progress(self) -> bool:
+        return self.response.in_progress
+
+    @property
+    def complete(self) -> bool:
+        # a body read until the connection is closed is not "in progress" but may grow
+        return self.exception is not None or self.incomplete or self.response.complete
+
+    def receive_data(self, data: bytes, timestamp: int = 0):
+        if data:
+            self.mark_received(timestamp)
         if self.is_client:
-            self.response.rawdata += data
-            if self.response.rawdata.lower() in {
-                b"http/1.1 100 continue\r\n\r\n",
-                b"http/1.0 100 continue\r\n\r\n",
-            }:
+            if not self.response.rawlength:
+                self.response.head_request = self.request.method == "HEAD"
+            self.response.append_rawdata(data)
+            # the length is checked first to avoid materializing the buffer each time
+            if (
+                self.response.rawlength == 25
+                and self.response.rawdata.lower() in HTTP100_CONTINUE
+            ):
                 # in case we receive an HTTP 100 code, we do not record it as the final HTTP response headers
                 # but we keep the information to display it in the UI
                 self.http100 = True
+                self.touch()
                 self.response.rawdata = (
                     bytes()
                 )  # very important to have the HTTP request body recorded.
         else:
-            self.request.rawdata += data
+            self.request.append_rawdata(data)
+
+    def connection_closed(self):
+        self.request.close()
+        self.response.close()
 
-    def send_data(self, data: bytes):
+    def send_data(self, data: bytes, timestamp: int = 0):
+        if data:
+            self.mark_sent(timestamp)
         if self.is_client:
-            self.request.rawdata += data
+            self.request.append_rawdata(data)
         else:
-            self.response.rawdata += data
+            if not self.response.rawlength:
+                self.response.head_request = self.request.method == "HEAD"
+            self.response.append_rawdata(data)
@@ -10,19 +10,27 @@ from httpdbg.utils import HTTPDBGHeader
 
 
 class HTTP2RecordReqResp(HTTPRecordReqResp):
-    def __init__(self) -> None:
-        super().__init__()
-        self._content: bytes = bytes()
+    __slots__ = ("_headers",)
+
+    def __init__(self, max_body_size: int = 0) -> None:
+        super().__init__(max_body_size)
         self._headers: list[HTTPDBGHeader] = list()
 
     @property
     def content(self) -> bytes:
-        return self._content
+        return self._body.getvalue()
 
     @content.setter
     def content(self, value: bytes):
-        self.last_update = datetime.datetime.now(datetime.timezone.utc)
-        self._content = value
+        self.touch()
+        self._body.clear()
+        self.body_length = 0
+        self.truncated = False
+        self._append_body(value)
+
+    def append_content(self, data: bytes):
+        self.touch()
+        self._append_body(data)
 
     @property
     def headers(self) -> list[HTTPDBGHeader]:
@@ -32,6 +40,12 @@ class HTTP2RecordReqResp(HTTPRecordReqResp):
     def headers(self, values: list[tuple[bytes, bytes]]) -> None:
         for header in values:
             self._headers.append(HTTPDBGHeader(header[0].decode(), header[1].decode()))
+        self.headers_changed()
+
+    @property
+    def size(self) -> int:
+        headers = sum(len(header.name) + len(header.value) for header in self._headers)
+        return headers + len(self._body)
 
     @property
     def preview(self):
@@ -43,6 +57,7 @@ class HTTP2RecordReqResp(HTTPRecordReqResp):
 
 
 class HTTP2RecordRequest(HTTPRecordRequest, HTTP2RecordReqResp):
+    __slots__ = ()
 
     @property
     def method(self) -> str:
@@ -58,6 +73,7 @@ class HTTP2RecordRequest(HTTPRecordRequest, HTTP2RecordReqResp):
 
 
 class HTTP2RecordResponse(HTTPRecordResponse, HTTP2RecordReqResp):
+    __slots__ = ()
 
     @property
     def protocol(self) -> str:
@@ -73,6 +89,8 @@ class HTTP2RecordResponse(HTTPRecordResponse, HTTP2RecordReqResp):
 
 
 class HTTP2Record(HTTPRecord):
+    __slots__ = ("ended",)
+
     def __init__(
         self,
         initiator_id: str,
@@ -80,10 +98,21 @@ class HTTP2Record(HTTPRecord):
         tag: str = None,
         tbegin: datetime.datetime = None,
         is_client: bool = True,
+        max_body_size: int = 0,
     ) -> None:
         super().__init__(initiator_id, group_id, tag, tbegin, is_client)
-        self.request: HTTP2RecordRequest = HTTP2RecordRequest()
-        self.response: HTTP2RecordResponse = HTTP2RecordResponse()
+        self.request: HTTP2RecordRequest = HTTP2RecordRequest(max_body_size)
+        self.response: HTTP2RecordResponse = HTTP2RecordResponse(max_body_size)
+        self.ended: bool = False  # the stream has been ended (or reset) by the peer
+
+    @property
+    def complete(self) -> bool:
+        # without a Content-Length, the body is complete only at the end of the stream
+        return self.exception is not None or self.ended
+
+    def end(self) -> None:
+        self.ended = True
+        self.touch()  # the record has changed: saved and published again
 
     @property
     def url(self) -> str:
@@ -100,14 +129,18 @@ class HTTP2Record(HTTPRecord):
     def url(self, value: str) -> None:
         self._url = value
 
-    def receive_data(self, data: bytes):
+    def receive_data(self, data: bytes, timestamp: int = 0):
+        if data:
+            self.mark_received(timestamp)
         if self.is_client:
-            self.response.content += data
+            self.response.append_content(data)
         else:
-            self.request.content += data
+            self.request.append_content(data)
 
-    def send_data(self, data: bytes):
+    def send_data(self, data: bytes, timestamp: int = 0):
+        if data:
+            self.mark_sent(timestamp)
         if self.is_client:
-            self.request.content += data
+            self.request.append_content(data)
         else:
-            self.response.content += data
+            self.response.append_content(data)
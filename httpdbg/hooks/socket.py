@@ -7,15 +7,24 @@ import platform
 import socket
 import ssl
 import sys
+import time
+import weakref
 from typing import Generator
 from typing import Union
 
 from httpdbg.initiator import httpdbg_initiator
+from httpdbg.log import log_info
 from httpdbg.log import logger
+from httpdbg.hooks.record import HTTPRecordTiming
+from httpdbg.hooks.loopback import LoopbackGroups
 from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.hooks.recordhttp1 import HTTP100_CONTINUE
 from httpdbg.hooks.utils import getcallargs
 from httpdbg.hooks.utils import decorate
 from httpdbg.hooks.utils import undecorate
+from httpdbg.ingestion import IngestionQueue
+from httpdbg.utils import HTTPDBGBuffer
+from httpdbg.utils import get_new_uuid
 
 from httpdbg.records import HTTPRecords
 
@@ -23,33 +32,99 @@ from httpdbg.records import HTTPRecords
 class SocketRawData(object):
     """Store the request data without encryption, even when using an SSLSocket."""
 
-    def __init__(self, id: int, address: tuple[str, int], ssl: bool) -> None:
+    def __init__(
+        self,
+        id: int,
+        address: tuple[str, int],
+        ssl: bool,
+        connection_id: Union[str, None] = None,
+        sequence: int = 1,
+    ) -> None:
         self.id: int = id
         self.address: tuple[str, int] = address
         self.ssl: bool = ssl
-        self._rawdata: bytes = bytes()
+        # all the requests sent using the same connection share the same connection_id
+        self.connection_id: str = connection_id if connection_id else get_new_uuid()
+        self.sequence: int = sequence  # number of the request on the connection
+        self._rawdata: HTTPDBGBuffer = HTTPDBGBuffer()
         self.record: Union[HTTP1Record, None] = None
         self.tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        # the connection and TLS handshake timestamps are set by the hooks and the
+        # timing is transferred to the record when the HTTP request is detected
+        self.timing: HTTPRecordTiming = HTTPRecordTiming()
+        # a request sampled out is not recorded but we track the direction of the
+        # exchanges to detect when the socket is reused for a new request
+        self.sampled_out: bool = False
+        self.is_client: bool = True
+        self.sent: bool = False
+        self.received: bool = False
 
     @property
     def rawdata(self) -> bytes:
-        return self._rawdata
+        return self._rawdata.getvalue()
+
+    def append(self, data: bytes) -> None:
+        self._rawdata.append(data)
+        if log_info():
+            logger().info(
+                f"SocketRawData id={self.id} newdata={bytes(data[:20])!r} len={len(self._rawdata)}"
+            )
+
+    def next_request(self) -> "SocketRawData":
+        """Return a new SocketRawData for the next request sent using the same connection."""
+        return SocketRawData(
+            self.id,
+            self.address,
+            self.ssl,
+            connection_id=self.connection_id,
+            sequence=self.sequence + 1,
+        )
+
+    def link_record(self) -> None:
+        """An HTTP request has been detected, the connection info are given to its record."""
+        if self.record:
+            self.record.address = self.address
+            self.record.ssl = self.ssl
+            self.record.timing = self.timing
+            self.record.connection_id = self.connection_id
+            self.record.connection_sequence = self.sequence
+
+    def pop_rawdata(self) -> bytes:
+        """Return the data received before the HTTP detection and forget them.
 
-    @rawdata.setter
-    def rawdata(self, value: bytes) -> None:
-        logger().info(
-            f"SocketRawData id={self.id} newdata={value[:20]!r} len={len(value)}"
+        Once the record is created, the data are only stored by the record.
+        """
+        rawdata = self._rawdata.getvalue()
+        self._rawdata.clear()
+        return rawdata
+
+    @property
+    def host(self) -> str:
+        rawdata = self._rawdata[:4096]
+        start = rawdata.lower().find(b"\r\nhost:")
+        if start == -1:
+            return ""
+        end = rawdata.find(b"\r\n", start + 2)
+        return (
+            rawdata[start + 7 : end if end > -1 else None]
+            .strip()
+            .decode(errors="replace")
         )
-        self._rawdata = value
+
+    def sample_out(self, is_client: bool) -> None:
+        self.sampled_out = True
+        self.is_client = is_client
+        self._rawdata.clear()
 
     def http_detected(self) -> Union[bool, None]:
-        end_of_first_line = self.rawdata[:2048].find(b"\r\n")
+        # sliced: the buffer is not copied
+        end_of_first_line = self._rawdata[:2048].find(b"\r\n")
         if end_of_first_line == -1:
-            if len(self.rawdata) > 2048:
+            if len(self._rawdata) > 2048:
                 return False
             else:
                 return None
-        firstline = self.rawdata[:end_of_first_line]
+        firstline = self._rawdata[:end_of_first_line]
         if firstline.upper().endswith(b"HTTP/1.1"):
             return True
         if firstline.upper().endswith(b"HTTP/1.0"):
@@ -65,11 +140,33 @@ class TracerHTTP1:
     def __init__(
         self,
         ignore: tuple[tuple[str, int], ...] = (),
+        ingestion: Union[IngestionQueue, None] = None,
     ):
+        # the key is the id of the socket object, the entry is removed when the socket
+        # is closed or garbage collected so an id can't be reused by another socket
         self.sockets: dict[int, Union[SocketRawData, None]] = (
             {}
         )  # if None, this is not a HTTP/1 request
         self.ignore: tuple[tuple[str, int], ...] = ignore
+        self.ingestion: IngestionQueue = ingestion if ingestion else IngestionQueue()
+        # to link a request sent by the process to itself with its server side
+        self.loopback: LoopbackGroups = LoopbackGroups()
+
+    def _track(self, obj, socketdata: SocketRawData) -> SocketRawData:
+        """Add a new entry and make sure it does not outlive the socket object."""
+        if id(obj) not in self.sockets:
+            try:
+                finalizer = weakref.finalize(obj, self._untrack, id(obj))
+                finalizer.atexit = False
+            except TypeError:
+                # the object can't be weakly referenced, the entry is removed on close only
+                pass
+        self.sockets[id(obj)] = socketdata
+        return socketdata
+
+    def _untrack(self, key: int) -> Union[SocketRawData, None]:
+        self.loopback.untrack(key)
+        return self.sockets.pop(key, None)
 
     def get_socket_data(
         self, obj, extra_sock=None, force_new=False, request=None, is_uvicorn=False
@@ -82,43 +179,53 @@ class TracerHTTP1:
 
         if id(obj) in self.sockets:
             socketdata = self.sockets[id(obj)]
+            if socketdata and socketdata.sampled_out:
+                if (request and socketdata.is_client and socketdata.received) or (
+                    (not request) and (not socketdata.is_client) and socketdata.sent
+                ):
+                    # the socket is reused for a new request
+                    self.sockets[id(obj)] = socketdata.next_request()
+                    return self.sockets[id(obj)]
+                if request:
+                    socketdata.sent = True
+                else:
+                    socketdata.received = True
+                return None
             if (
                 request
                 and socketdata
                 and socketdata.record
                 and socketdata.record.is_client
-                and socketdata.record.response.rawdata
+                and socketdata.received
             ) or (
                 (not request)
                 and socketdata
                 and socketdata.record
                 and (not socketdata.record.is_client)
-                and socketdata.record.request.rawdata
+                and socketdata.received
             ):
                 # the socket is reused for a new request
-                self.sockets[id(obj)] = SocketRawData(
-                    id(obj), socketdata.address, socketdata.ssl
-                )
+                self.sockets[id(obj)] = socketdata.next_request()
                 socketdata = self.sockets[id(obj)]
         else:
             if isinstance(obj, socket.socket):
                 try:
                     address = obj.getsockname()
                     if address not in self.ignore:
-                        self.sockets[id(obj)] = SocketRawData(
-                            id(obj), address, isinstance(obj, ssl.SSLSocket)
+                        socketdata = self._track(
+                            obj,
+                            SocketRawData(
+                                id(obj), address, isinstance(obj, ssl.SSLSocket)
+                            ),
                         )
-                        socketdata = self.sockets[id(obj)]
                 except OSError:
                     # OSError: [WinError 10022] An invalid argument was supplied
                     pass
             elif isinstance(obj, asyncio.proactor_events._ProactorSocketTransport):
                 # only for async HTTP requests (not HTTPS) on Windows
-                self.sockets[id(obj)] = SocketRawData(id(obj), ("", 0), False)
-                socketdata = self.sockets[id(obj)]
+                socketdata = self._track(obj, SocketRawData(id(obj), ("", 0), False))
             elif is_uvicorn:
-                self.sockets[id(obj)] = SocketRawData(id(obj), ("", 0), False)
-                socketdata = self.sockets[id(obj)]
+                socketdata = self._track(obj, SocketRawData(id(obj), ("", 0), False))
             else:
                 if extra_sock:
                     try:
@@ -128,35 +235,94 @@ class TracerHTTP1:
                             else ("", 0)  # wrap_bio
                         )
                         if address not in self.ignore:
-                            self.sockets[id(obj)] = SocketRawData(
-                                id(obj),
-                                address,
-                                isinstance(obj, (ssl.SSLObject, ssl.SSLSocket)),
+                            socketdata = self._track(
+                                obj,
+                                SocketRawData(
+                                    id(obj),
+                                    address,
+                                    isinstance(obj, (ssl.SSLObject, ssl.SSLSocket)),
+                                ),
                             )
-                            socketdata = self.sockets[id(obj)]
                     except OSError:
                         # OSError: [WinError 10022] An invalid argument was supplied
                         pass
 
         return socketdata
 
-    def move_socket_data(self, dest, ori):
+    def http_detected(
+        self, socketdata: SocketRawData, records: HTTPRecords, is_client: bool
+    ) -> Union[bool, None]:
+        """Detect a new HTTP request and decide if it must be recorded (sampling)."""
+        http_detected = socketdata.http_detected()
+        if (
+            http_detected
+            and (records.client if is_client else records.server)
+            and not records.sampling.keep(socketdata.host, records.current_call_site())
+        ):
+            if log_info():
+                logger().info(f"SocketRawData id={socketdata.id} sampled out")
+            socketdata.sample_out(is_client)
+            if is_client:
+                socketdata.sent = True
+            else:
+                socketdata.received = True
+            return None  # the request is not recorded but the socket is still tracked
+        return http_detected
+
+    def send(self, socketdata: SocketRawData, data: bytes) -> None:
+        """Record the data sent for the request being exchanged on the connection."""
+        if socketdata.record:
+            if data:
+                socketdata.sent = True
+            self.ingestion.send(socketdata.record, data)
+
+    def receive(self, socketdata: SocketRawData, data: bytes) -> None:
+        """Record the data received for the request being exchanged on the connection."""
+        if socketdata.record:
+            # the record may be updated later by the ingestion thread, so the
+            # direction of the exchanges is tracked here to detect a new request
+            if data and not (
+                socketdata.record.is_client
+                and not socketdata.received
+                and len(data) == 25
+                and bytes(data).lower() in HTTP100_CONTINUE
+            ):
+                socketdata.received = True
+            self.ingestion.receive(socketdata.record, data)
+
+    def move_socket_data(self, dest, ori) -> Union[SocketRawData, None]:
+        socketdata = None
         if id(ori) in self.sockets:
             socketdata = self.get_socket_data(ori)
             if socketdata:
-                self.sockets[id(dest)] = socketdata
+                self._track(dest, socketdata)
                 if isinstance(dest, (ssl.SSLSocket, ssl.SSLObject)):
                     socketdata.ssl = True
                 self.del_socket_data(ori)
+        return socketdata
 
     def del_socket_data(self, obj):
         if id(obj) in self.sockets:
-            logger().info(f"SocketRawData del id={id(obj)}")
-            self.sockets.pop(id(obj))
+            if log_info():
+                logger().info(f"SocketRawData del id={id(obj)}")
+            self._untrack(id(obj))
+
+    def close_socket(self, obj):
+        """The connection is closed: the entry is removed.
+
+        A message whose body is delimited by the end of the connection is now complete.
+        """
+        socketdata = self._untrack(id(obj))
+        if socketdata:
+            if log_info():
+                logger().info(f"SocketRawData close id={id(obj)}")
+            if socketdata.record:
+                self.ingestion.close(socketdata.record)
 
     def mark_as_not_a_http_request(self, obj):
         if id(obj) in self.sockets:
-            logger().info(f"Socket not HTTP request id={id(obj)}")
+            if log_info():
+                logger().info(f"Socket not HTTP request id={id(obj)}")
             self.sockets[id(obj)] = None
 
 
@@ -172,17 +338,32 @@ def set_hook_for_socket_init(records: HTTPRecords, method: Callable):
     return hook
 
 
+# hook: socket.socket._real_close, ssl.SSLSocket.unwrap
+# what: The socket is closed (close() only closes the socket when no file object uses it anymore)
+# or the SSL layer is shut down.
+# action: The entry in the temporary raw socket storage list is removed.
+def set_hook_for_socket_close(records: HTTPRecords, method: Callable):
+    def hook(self, *args, **kwargs):
+        records._tracerhttp1.close_socket(self)
+
+        return method(self, *args, **kwargs)
+
+    return hook
+
+
 # hook: socket.socket.connect, ssl.SSLSocket.connect
 # what: A connection to a remote socket is initiated.
 # action: A new entry is added to the temporary raw socket storage list.
 def set_hook_for_socket_connect(records: HTTPRecords, method: Callable):
     def hook(self, *args, **kwargs):
         tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        connect_start = time.perf_counter_ns()
         socketdata = records._tracerhttp1.get_socket_data(self, force_new=True)
         if socketdata:
-            logger().info(
-                f"CONNECT - self={self} id={id(self)} socketdata={socketdata} args={args} kwargs={kwargs}"
-            )
+            if log_info():
+                logger().info(
+                    f"CONNECT - self={self} id={id(self)} socketdata={socketdata} args={args} kwargs={kwargs}"
+                )
         try:
             r = method(self, *args, **kwargs)
         except Exception as ex:
@@ -202,6 +383,10 @@ def set_hook_for_socket_connect(records: HTTPRecords, method: Callable):
                             )
             raise
 
+        if socketdata:
+            socketdata.timing.connect_start = connect_start
+            socketdata.timing.connect_end = time.perf_counter_ns()
+
         return r
 
     return hook
@@ -214,6 +399,7 @@ def set_hook_for_socket_connect(records: HTTPRecords, method: Callable):
 def set_hook_for_ssl_wrap_socket(records: HTTPRecords, method: Callable):
     def hook(sock, *args, **kwargs):
         tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        tls_start = time.perf_counter_ns()
         try:
             sslsocket = method(sock, *args, **kwargs)
         except Exception as ex:
@@ -230,13 +416,19 @@ def set_hook_for_ssl_wrap_socket(records: HTTPRecords, method: Callable):
                         )
             raise
 
-        logger().info(
-            f"WRAP_SOCKET - {type(sock)}={id(sock)} {type(sslsocket)}={id(sslsocket)}"
-        )
+        if log_info():
+            logger().info(
+                f"WRAP_SOCKET - {type(sock)}={id(sock)} {type(sslsocket)}={id(sslsocket)}"
+            )
 
         socketdata = records._tracerhttp1.move_socket_data(sslsocket, sock)
         if socketdata:
-            logger().info(f"WRAP_SOCKET * - socketdata={socketdata}")
+            if log_info():
+                logger().info(f"WRAP_SOCKET * - socketdata={socketdata}")
+            if getattr(sslsocket, "_connected", False):
+                # the handshake is done when the socket is wrapped
+                socketdata.timing.tls_start = tls_start
+                socketdata.timing.tls_end = time.perf_counter_ns()
 
         return sslsocket
 
@@ -249,6 +441,7 @@ def set_hook_for_ssl_wrap_socket(records: HTTPRecords, method: Callable):
 def set_hook_for_sslcontext_wrap_socket(records: HTTPRecords, method: Callable):
     def hook(self, sock, *args, **kwargs):
         tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        tls_start = time.perf_counter_ns()
         try:
             sslsocket = method(self, sock, *args, **kwargs)
         except Exception as ex:
@@ -265,13 +458,19 @@ def set_hook_for_sslcontext_wrap_socket(records: HTTPRecords, method: Callable):
                         )
             raise
 
-        logger().info(
-            f"WRAP_SOCKET (SSLContext) - {type(self)}={id(self)}  {type(sock)}={id(sock)} {type(sslsocket)}={id(sslsocket)}"
-        )
+        if log_info():
+            logger().info(
+                f"WRAP_SOCKET (SSLContext) - {type(self)}={id(self)}  {type(sock)}={id(sock)} {type(sslsocket)}={id(sslsocket)}"
+            )
 
         socketdata = records._tracerhttp1.move_socket_data(sslsocket, sock)
         if socketdata:
-            logger().info(f"WRAP_SOCKET (SSLContext) * - socketdata={socketdata}")
+            if log_info():
+                logger().info(f"WRAP_SOCKET (SSLContext) * - socketdata={socketdata}")
+            if getattr(sslsocket, "_connected", False):
+                # the handshake is done when the socket is wrapped
+                socketdata.timing.tls_start = tls_start
+                socketdata.timing.tls_end = time.perf_counter_ns()
 
         return sslsocket
 
@@ -300,13 +499,15 @@ def set_hook_for_socket_wrap_bio(records: HTTPRecords, method: Callable):
                         )
             raise
 
-        logger().info(
-            f"WRAP_SOCKET_BIO - {type(self)}={id(self)} {type(sslobject)}={id(sslobject)}"
-        )
+        if log_info():
+            logger().info(
+                f"WRAP_SOCKET_BIO - {type(self)}={id(self)} {type(sslobject)}={id(sslobject)}"
+            )
 
         socketdata = records._tracerhttp1.get_socket_data(sslobject, self)
         if socketdata:
-            logger().info(f"WRAP_SOCKET_BIO * - socketdata={socketdata}")
+            if log_info():
+                logger().info(f"WRAP_SOCKET_BIO * - socketdata={socketdata}")
 
         return sslobject
 
@@ -320,27 +521,34 @@ def set_hook_for_socket_recv_into(records: HTTPRecords, method: Callable):
     def hook(self, buffer, *args, **kwargs):
         socketdata = records._tracerhttp1.get_socket_data(self)
         if socketdata:
-            logger().info(
-                f"RECV_INTO - self={self} id={id(self)} socketdata={socketdata} args={args} kwargs={kwargs}"
-            )
+            if log_info():
+                logger().info(
+                    f"RECV_INTO - self={self} id={id(self)} socketdata={socketdata} args={args} kwargs={kwargs}"
+                )
 
         nbytes = method(self, buffer, *args, **kwargs)
 
         if buffer:  # it appears that the buffer may be None (observed on Windows).
             if socketdata:
                 if socketdata.record:
-                    logger().info(
-                        f"RECV_INTO (after) - id={id(self)} buffer={(b''+buffer)[:20]}"
-                    )
-                    socketdata.record.receive_data(buffer[:nbytes])
-                else:
-                    socketdata.rawdata += buffer[:nbytes]
-                    http_detected = socketdata.http_detected()
-                    if http_detected:
-                        logger().info("RECV_INTO - http detected")
+                    if log_info():
                         logger().info(
                             f"RECV_INTO (after) - id={id(self)} buffer={(b''+buffer)[:20]}"
                         )
+                    records._tracerhttp1.receive(socketdata, buffer[:nbytes])
+                else:
+                    socketdata.append(buffer[:nbytes])
+                    http_detected = records._tracerhttp1.http_detected(
+                        socketdata, records, is_client=False
+                    )
+                    if http_detected:
+                        if log_info():
+                            logger().info("RECV_INTO - http detected")
+                        records._tracerhttp1.loopback.join(records, self)
+                        if log_info():
+                            logger().info(
+                                f"RECV_INTO (after) - id={id(self)} buffer={(b''+buffer)[:20]}"
+                            )
                         with httpdbg_initiator(
                             records,
                             method,
@@ -362,14 +570,14 @@ def set_hook_for_socket_recv_into(records: HTTPRecords, method: Callable):
                                 records.current_tag,
                                 tbegin=socketdata.tbegin,
                                 is_client=False,
+                                max_body_size=records.max_body_size,
+                            )
+                            socketdata.link_record()
+                            records._tracerhttp1.receive(
+                                socketdata, socketdata.pop_rawdata()
                             )
-                            socketdata.record.address = socketdata.address
-                            socketdata.record.ssl = socketdata.ssl
-                            socketdata.record.receive_data(socketdata.rawdata)
                             if records.server:
-                                records.requests[socketdata.record.id] = (
-                                    socketdata.record
-                                )
+                                records.add_request(socketdata.record)
                     elif http_detected is False:  # if None, there is nothing to do
                         records._tracerhttp1.mark_as_not_a_http_request(self)
 
@@ -385,20 +593,25 @@ def set_hook_for_socket_recv(records: HTTPRecords, method: Callable):
     def hook(self, bufsize, *args, **kwargs):
         socketdata = records._tracerhttp1.get_socket_data(self)
         if socketdata:
-            logger().info(
-                f"RECV - self={self} id={id(self)} socketdata={socketdata} bufsize={bufsize} args={args} kwargs={kwargs}"
-            )
+            if log_info():
+                logger().info(
+                    f"RECV - self={self} id={id(self)} socketdata={socketdata} bufsize={bufsize} args={args} kwargs={kwargs}"
+                )
 
         buffer = method(self, bufsize, *args, **kwargs)
 
         if socketdata:
             if socketdata.record:
-                socketdata.record.receive_data(buffer)
+                records._tracerhttp1.receive(socketdata, buffer)
             else:
-                socketdata.rawdata += buffer
-                http_detected = socketdata.http_detected()
+                socketdata.append(buffer)
+                http_detected = records._tracerhttp1.http_detected(
+                    socketdata, records, is_client=False
+                )
                 if http_detected:
-                    logger().info("RECV - http detected")
+                    if log_info():
+                        logger().info("RECV - http detected")
+                    records._tracerhttp1.loopback.join(records, self)
                     with httpdbg_initiator(
                         records,
                         method,
@@ -420,12 +633,14 @@ def set_hook_for_socket_recv(records: HTTPRecords, method: Callable):
                             records.current_tag,
                             tbegin=socketdata.tbegin,
                             is_client=False,
+                            max_body_size=records.max_body_size,
+                        )
+                        socketdata.link_record()
+                        records._tracerhttp1.receive(
+                            socketdata, socketdata.pop_rawdata()
                         )
-                        socketdata.record.address = socketdata.address
-                        socketdata.record.ssl = socketdata.ssl
-                        socketdata.record.receive_data(socketdata.rawdata)
                         if records.server:
-                            records.requests[socketdata.record.id] = socketdata.record
+                            records.add_request(socketdata.record)
                 elif http_detected is False:  # if None, there is nothing to do
                     records._tracerhttp1.mark_as_not_a_http_request(self)
 
@@ -442,17 +657,21 @@ def set_hook_for_socket_sendall(records: HTTPRecords, method: Callable):
     def hook(self, data, *args, **kwargs):
         socketdata = records._tracerhttp1.get_socket_data(self, request=True)
         if socketdata:
-            logger().info(
-                f"SENDALL - self={self} id={id(self)} socketdata={socketdata} data={(b''+bytes(data))[:20]!r} type={type(data)} args={args} kwargs={kwargs}"
-            )
+            if log_info():
+                logger().info(
+                    f"SENDALL - self={self} id={id(self)} socketdata={socketdata} data={(b''+bytes(data))[:20]!r} type={type(data)} args={args} kwargs={kwargs}"
+                )
         if socketdata:
             if socketdata.record:
-                socketdata.record.send_data(data)
+                records._tracerhttp1.send(socketdata, data)
             else:
-                socketdata.rawdata += data
-                http_detected = socketdata.http_detected()
+                socketdata.append(data)
+                http_detected = records._tracerhttp1.http_detected(
+                    socketdata, records, is_client=True
+                )
                 if http_detected:
-                    logger().info("SENDALL - http detected")
+                    if log_info():
+                        logger().info("SENDALL - http detected")
                     with httpdbg_initiator(
                         records,
                         method,
@@ -473,12 +692,14 @@ def set_hook_for_socket_sendall(records: HTTPRecords, method: Callable):
                             group.id,
                             records.current_tag,
                             tbegin=socketdata.tbegin,
+                            max_body_size=records.max_body_size,
                         )
-                        socketdata.record.address = socketdata.address
-                        socketdata.record.ssl = socketdata.ssl
-                        socketdata.record.send_data(socketdata.rawdata)
+                        socketdata.link_record()
+                        records._tracerhttp1.send(socketdata, socketdata.pop_rawdata())
                         if records.client:
-                            records.requests[socketdata.record.id] = socketdata.record
+                            records.add_request(socketdata.record)
+                        if records.server:
+                            records._tracerhttp1.loopback.track(self, socketdata.record)
                 elif http_detected is False:  # if None, there is nothing to do
                     records._tracerhttp1.mark_as_not_a_http_request(self)
 
@@ -495,18 +716,21 @@ def set_hook_for_socket_send(records: HTTPRecords, method: Callable):
     def hook(self, data, *args, **kwargs):
         socketdata = records._tracerhttp1.get_socket_data(self, request=True)
         if socketdata:
-            logger().info(
-                f"SEND - self={self} id={id(self)} socketdata={socketdata} bytes={(b''+data)[:20]} args={args} kwargs={kwargs}"
-            )
+            if log_info():
+                logger().info(
+                    f"SEND - self={self} id={id(self)} socketdata={socketdata} bytes={(b''+data)[:20]} args={args} kwargs={kwargs}"
+                )
 
         size = method(self, data, *args, **kwargs)
 
         if socketdata:
             if socketdata.record:
-                socketdata.record.send_data(data[:size])
+                records._tracerhttp1.send(socketdata, data[:size])
             else:
-                socketdata.rawdata += data[:size]
-                http_detected = socketdata.http_detected()
+                socketdata.append(data[:size])
+                http_detected = records._tracerhttp1.http_detected(
+                    socketdata, records, is_client=True
+                )
                 if http_detected:
                     with httpdbg_initiator(
                         records,
@@ -528,12 +752,14 @@ def set_hook_for_socket_send(records: HTTPRecords, method: Callable):
                             group.id,
                             records.current_tag,
                             tbegin=socketdata.tbegin,
+                            max_body_size=records.max_body_size,
                         )
-                        socketdata.record.address = socketdata.address
-                        socketdata.record.ssl = socketdata.ssl
-                        socketdata.record.send_data(socketdata.rawdata)
+                        socketdata.link_record()
+                        records._tracerhttp1.send(socketdata, socketdata.pop_rawdata())
                         if records.client:
-                            records.requests[socketdata.record.id] = socketdata.record
+                            records.add_request(socketdata.record)
+                        if records.server:
+                            records._tracerhttp1.loopback.track(self, socketdata.record)
                 elif http_detected is False:  # if None, there is nothing to do
                     records._tracerhttp1.mark_as_not_a_http_request(self)
         return size
@@ -546,9 +772,10 @@ def set_hook_for_socket_send(records: HTTPRecords, method: Callable):
 # action: Link the socket and the sslsocket
 def set_hook_for_asyncio_create_connection(records: HTTPRecords, method: Callable):
     async def hook(self, *args, **kwargs):
-        logger().info(
-            f"CREATE_CONNECTION - self={self} id={id(self)} args={args} kwargs={kwargs}"
-        )
+        if log_info():
+            logger().info(
+                f"CREATE_CONNECTION - self={self} id={id(self)} args={args} kwargs={kwargs}"
+            )
         r = await method(self, *args, **kwargs)
 
         transport = r[0]
@@ -559,9 +786,10 @@ def set_hook_for_asyncio_create_connection(records: HTTPRecords, method: Callabl
                 socketdata = records._tracerhttp1.get_socket_data(
                     ssl_object, sock, force_new=True
                 )  # to link the cnx info to the sslobject
-                logger().info(
-                    f"CREATE_CONNECTION - ssl_object ssl_object={ssl_object} ssl_objectid={id(ssl_object)} socketdata={socketdata}"
-                )
+                if log_info():
+                    logger().info(
+                        f"CREATE_CONNECTION - ssl_object ssl_object={ssl_object} ssl_objectid={id(ssl_object)} socketdata={socketdata}"
+                    )
         return r
 
     return hook
@@ -573,19 +801,23 @@ def set_hook_for_asyncio_create_connection(records: HTTPRecords, method: Callabl
 # and record it if this is case, otherwise delete the temporay SocketRawData.
 def set_hook_for_sslobject_write(records: HTTPRecords, method: Callable):
     def hook(self, buf, *args, **kwargs):
-        logger().info(f"WRITE - {type(self)}={id(self)} buf={(b'' + buf)[:20]}")
+        if log_info():
+            logger().info(f"WRITE - {type(self)}={id(self)} buf={(b'' + buf)[:20]}")
         socketdata = records._tracerhttp1.get_socket_data(self, request=True)
         if socketdata:
-            logger().info(f"WRITE * - socketdata={socketdata}")
+            if log_info():
+                logger().info(f"WRITE * - socketdata={socketdata}")
 
         size = method(self, buf, *args, **kwargs)
 
         if socketdata:
             if socketdata.record:
-                socketdata.record.send_data(bytes(buf[:size]))
+                records._tracerhttp1.send(socketdata, bytes(buf[:size]))
             else:
-                socketdata.rawdata += bytes(buf[:size])
-                http_detected = socketdata.http_detected()
+                socketdata.append(bytes(buf[:size]))
+                http_detected = records._tracerhttp1.http_detected(
+                    socketdata, records, is_client=True
+                )
                 if http_detected:
                     with httpdbg_initiator(
                         records,
@@ -607,12 +839,12 @@ def set_hook_for_sslobject_write(records: HTTPRecords, method: Callable):
                             group.id,
                             records.current_tag,
                             tbegin=socketdata.tbegin,
+                            max_body_size=records.max_body_size,
                         )
-                        socketdata.record.address = socketdata.address
-                        socketdata.record.ssl = socketdata.ssl
-                        socketdata.record.send_data(socketdata.rawdata)
+                        socketdata.link_record()
+                        records._tracerhttp1.send(socketdata, socketdata.pop_rawdata())
                         if records.client:
-                            records.requests[socketdata.record.id] = socketdata.record
+                            records.add_request(socketdata.record)
                 elif http_detected is False:  # if None, there is nothing to do
                     records._tracerhttp1.mark_as_not_a_http_request(self)
         return size
@@ -625,19 +857,23 @@ def set_hook_for_sslobject_write(records: HTTPRecords, method: Callable):
 # action: Append the data to an existing SocketRawData.
 def set_hook_for_sslobject_read(records: HTTPRecords, method: Callable):
     def hook(self, *args, **kwargs):
-        logger().info(f"READ - {type(self)}={id(self)}")
+        if log_info():
+            logger().info(f"READ - {type(self)}={id(self)}")
         socketdata = records._tracerhttp1.get_socket_data(self)
         if socketdata:
-            logger().info(f"READ * - socketdata={socketdata}")
+            if log_info():
+                logger().info(f"READ * - socketdata={socketdata}")
 
         r = method(self, *args, **kwargs)
 
         if socketdata and socketdata.record:
             allargs = getcallargs(method, self, *args, **kwargs)
             if allargs.get("buffer"):
-                socketdata.record.receive_data(bytes(allargs.get("buffer"))[:r])
+                records._tracerhttp1.receive(
+                    socketdata, bytes(allargs.get("buffer"))[:r]
+                )
             else:
-                socketdata.record.receive_data(bytes(r)[: allargs.get("len")])
+                records._tracerhttp1.receive(socketdata, bytes(r)[: allargs.get("len")])
 
         return r
 
@@ -661,6 +897,9 @@ def hook_socket(records: HTTPRecords) -> Generator[None, None, None]:
         records, socket.socket.sendall, set_hook_for_socket_sendall
     )
     socket.socket.send = decorate(records, socket.socket.send, set_hook_for_socket_send)
+    socket.socket._real_close = decorate(  # type: ignore[attr-defined]
+        records, socket.socket._real_close, set_hook_for_socket_close  # type: ignore[attr-defined]
+    )
 
     if (sys.version_info.major == 3) and (sys.version_info.minor < 12):
         ssl.wrap_socket = decorate(  # type: ignore[attr-defined]
@@ -685,6 +924,9 @@ def hook_socket(records: HTTPRecords) -> Generator[None, None, None]:
     #     records, ssl.SSLSocket.sendall, set_hook_for_socket_sendall
     # )
     ssl.SSLSocket.send = decorate(records, ssl.SSLSocket.send, set_hook_for_socket_send)
+    ssl.SSLSocket.unwrap = decorate(
+        records, ssl.SSLSocket.unwrap, set_hook_for_socket_close
+    )
 
     # for aiohttp
     ssl.SSLObject.write = decorate(
@@ -721,6 +963,7 @@ def hook_socket(records: HTTPRecords) -> Generator[None, None, None]:
     socket.socket.recv = undecorate(socket.socket.recv)
     socket.socket.sendall = undecorate(socket.socket.sendall)
     socket.socket.send = undecorate(socket.socket.send)
+    socket.socket._real_close = undecorate(socket.socket._real_close)  # type: ignore[attr-defined]
 
     if (sys.version_info.major == 3) and (sys.version_info.minor < 12):
         ssl.wrap_socket = undecorate(ssl.wrap_socket)  # type: ignore[attr-defined]
@@ -733,6 +976,7 @@ def hook_socket(records: HTTPRecords) -> Generator[None, None, None]:
     ssl.SSLSocket.recv = undecorate(ssl.SSLSocket.recv)
     # ssl.SSLSocket.sendall = undecorate(ssl.SSLSocket.sendall)
     ssl.SSLSocket.send = undecorate(ssl.SSLSocket.send)
+    ssl.SSLSocket.unwrap = undecorate(ssl.SSLSocket.unwrap)
 
     # for aiohttp / async httpx
     ssl.SSLObject.write = undecorate(ssl.SSLObject.write)
@@ -749,3 +993,6 @@ def hook_socket(records: HTTPRecords) -> Generator[None, None, None]:
         asyncio.proactor_events._ProactorBaseWritePipeTransport.write = undecorate(
             asyncio.proactor_events._ProactorBaseWritePipeTransport.write
         )
+
+    # the data pushed by the last calls are parsed before the records are used
+    records.ingestion.flush()
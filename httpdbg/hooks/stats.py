@@ -0,0 +1,213 @@
+from collections.abc import Callable
+import functools
+import inspect
+import threading
+import time
+from typing import Any
+from typing import TYPE_CHECKING
+from typing import Union
+
+if TYPE_CHECKING:
+    from httpdbg.hooks.record import HTTPRecord
+
+
+class _HookCall:
+    """A hook being executed in the current thread."""
+
+    def __init__(self) -> None:
+        self.inner_ns: int = 0  # time spent in the hooked (original) method
+        self.record: Union["HTTPRecord", None] = None
+
+
+# the hooks being executed, for each thread (a hooked method may call another hooked method)
+_calls = threading.local()
+
+
+def _current_calls() -> list[_HookCall]:
+    calls = getattr(_calls, "calls", None)
+    if calls is None:
+        calls = _calls.calls = []
+    return calls
+
+
+def attribute_overhead(record: "HTTPRecord") -> None:
+    """The time spent in the current hook is counted for this record."""
+    calls = _current_calls()
+    if calls:
+        calls[-1].record = record
+
+
+class _ThreadStats:
+    """The stats of the hooks executed by a thread: updated without a lock."""
+
+    __slots__ = ("thread", "by_hook", "initiator_ns")
+
+    def __init__(self, thread: Union[threading.Thread, None]) -> None:
+        self.thread: Union[threading.Thread, None] = thread
+        self.by_hook: dict[str, list[int]] = {}  # name -> [calls, overhead in ns]
+        self.initiator_ns: int = 0
+
+    def merge(self, other: "_ThreadStats") -> None:
+        for name, (calls, overhead) in list(other.by_hook.items()):
+            stats = self.by_hook.setdefault(name, [0, 0])
+            stats[0] += calls
+            stats[1] += overhead
+        self.initiator_ns += other.initiator_ns
+
+
+class HookStats:
+    """Measure the time spent by httpdbg in the hooks.
+
+    The time spent in the hooked methods themselves is excluded, so the overhead
+    is the time the recorded application would not spend without httpdbg.
+    The coroutine functions are not measured.
+
+    Each thread updates its own stats, they are merged when read. The overhead is
+    summed over the threads: its percentage of the wall time is divided by the
+    number of threads that executed a hook.
+    """
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._local: threading.local = threading.local()
+        self._generation: int = 0
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.tbegin_ns: int = time.perf_counter_ns()
+            # a new generation: each thread starts new stats
+            self._generation += 1
+            self._threads: list[_ThreadStats] = []
+            # the stats of the threads that have ended (and of a pickled copy)
+            self._ended: _ThreadStats = _ThreadStats(None)
+            self.nb_threads: int = 0
+
+    def _thread_stats(self) -> _ThreadStats:
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            with self._lock:
+                local.stats = _ThreadStats(threading.current_thread())
+                local.generation = self._generation
+                self._threads.append(local.stats)
+                self.nb_threads += 1
+        return local.stats
+
+    def _merged(self) -> _ThreadStats:
+        merged = _ThreadStats(None)
+        with self._lock:
+            for stats in self._threads[:]:
+                if stats.thread is not None and not stats.thread.is_alive():
+                    self._ended.merge(stats)
+                    self._threads.remove(stats)
+            merged.merge(self._ended)
+            threads = self._threads[:]
+        for stats in threads:
+            merged.merge(stats)
+        return merged
+
+    @property
+    def by_hook(self) -> dict[str, list[int]]:
+        return self._merged().by_hook
+
+    @property
+    def overhead_ns(self) -> int:
+        return sum(overhead for _, overhead in self.by_hook.values())
+
+    @property
+    def initiator_ns(self) -> int:
+        """The time spent to capture the initiators (included in the overhead)."""
+        return self._merged().initiator_ns
+
+    def add(self, name: str, overhead_ns: int) -> None:
+        stats = self._thread_stats().by_hook.get(name)
+        if stats is None:
+            stats = self._thread_stats().by_hook.setdefault(name, [0, 0])
+        stats[0] += 1
+        stats[1] += overhead_ns
+
+    def add_initiator(self, ns: int) -> None:
+        self._thread_stats().initiator_ns += ns
+
+    def instrument(
+        self, hook_factory: Callable, records: Any, method: Callable
+    ) -> Callable:
+        """Create the hook using hook_factory, and measure its overhead."""
+        if inspect.iscoroutinefunction(method):
+            return hook_factory(records, method)
+
+        factory = getattr(hook_factory, "func", hook_factory)  # functools.partial
+        name = (
+            getattr(factory, "__name__", "hook")
+            .removeprefix("set_hook_for_")
+            .removeprefix("set_hook_")
+        )
+
+        @functools.wraps(method)
+        def original(*args, **kwargs):
+            t0 = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                calls = _current_calls()
+                if calls:
+                    calls[-1].inner_ns += time.perf_counter_ns() - t0
+
+        original.__httpdbg__ = method  # type: ignore[attr-defined]
+
+        hook = hook_factory(records, original)
+
+        if inspect.iscoroutinefunction(hook):
+            return hook
+
+        @functools.wraps(hook)
+        def measured(*args, **kwargs):
+            calls = _current_calls()
+            call = _HookCall()
+            calls.append(call)
+            t0 = time.perf_counter_ns()
+            try:
+                return hook(*args, **kwargs)
+            finally:
+                overhead = time.perf_counter_ns() - t0 - call.inner_ns
+                calls.pop()
+                self.add(name, overhead)
+                if call.record is not None:
+                    call.record.overhead_ns += overhead
+
+        return measured
+
+    def to_json(self) -> dict:
+        wall_time_ns = time.perf_counter_ns() - self.tbegin_ns
+        merged = self._merged()
+        overhead_ns = sum(overhead for _, overhead in merged.by_hook.values())
+        # the overhead is summed over the threads
+        thread_time_ns = wall_time_ns * max(1, self.nb_threads)
+        return {
+            "wall_time_ms": round(wall_time_ns / 1_000_000, 3),
+            "overhead_ms": round(overhead_ns / 1_000_000, 3),
+            "threads": self.nb_threads,
+            "overhead_percent": (
+                round(overhead_ns * 100 / thread_time_ns, 2) if wall_time_ns else 0
+            ),
+            "initiator_ms": round(merged.initiator_ns / 1_000_000, 3),
+            "hooks": {
+                name: {"calls": calls, "overhead_ms": round(overhead / 1_000_000, 3)}
+                for name, (calls, overhead) in sorted(merged.by_hook.items())
+            },
+        }
+
+    def __getstate__(self) -> dict:
+        # the lock and the stats of the threads can't be pickled (multiprocess dump)
+        return {
+            "tbegin_ns": self.tbegin_ns,
+            "nb_threads": self.nb_threads,
+            "_ended": self._merged(),
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._threads = []
+        self.__dict__.update(state)
@@ -8,12 +8,21 @@ from typing import Union
 import uuid
 
 from httpdbg import HTTPRecords
+from httpdbg.argsrepr import ArgsRepr
 from httpdbg.env import HTTPDBG_MULTIPROCESS_DIR
 from httpdbg.hooks.all import httprecord
+from httpdbg.ingestion import IngestionQueue
 from httpdbg.log import logger
+from httpdbg.retention import RetentionPolicy
+from httpdbg.sampling import SamplingPolicy
 
 HTTPDBG_INITIATORS = []  # type: ignore
 HTTPDBG_RECORD_SERVER = False
+HTTPDBG_MAX_BODY_SIZE = 0
+HTTPDBG_SAMPLING = {}  # type: ignore
+HTTPDBG_ARGS_REPR = {}  # type: ignore
+HTTPDBG_INGESTION = {}  # type: ignore
+HTTPDBG_RETENTION = {}  # type: ignore
 
 
 class HttpdbgRecorder:
@@ -55,7 +64,13 @@ class HttpdbgRecorder:
     def start(self):
         """Start recording."""
         self.context = httprecord(
-            initiators=HTTPDBG_INITIATORS, server=HTTPDBG_RECORD_SERVER
+            initiators=HTTPDBG_INITIATORS,
+            server=HTTPDBG_RECORD_SERVER,
+            max_body_size=HTTPDBG_MAX_BODY_SIZE,
+            sampling=SamplingPolicy(**HTTPDBG_SAMPLING),
+            args_repr=ArgsRepr(**HTTPDBG_ARGS_REPR),
+            ingestion=IngestionQueue(**HTTPDBG_INGESTION),
+            retention=RetentionPolicy(**HTTPDBG_RETENTION),
         )
         self.records = self.context.__enter__()
         self._running = True
@@ -3,6 +3,8 @@ import inspect
 import typing
 from typing import Any
 
+from httpdbg.log import log_debug
+from httpdbg.log import log_info
 from httpdbg.log import logger
 
 if typing.TYPE_CHECKING:
@@ -22,7 +24,8 @@ def getcallargs(original_method, *args, **kwargs):
             inspect.signature(original_method).bind_partial(*args, **kwargs).arguments
         )
     except Exception as ex:
-        logger().debug(f"getcallargs - exception {str(ex)}")
+        if log_debug():
+            logger().debug(f"getcallargs - exception {str(ex)}")
         # TypeError('too many positional arguments') may occur when using pytest (seems related to teardown_method)
         i = 0
         for arg in args:
@@ -30,13 +33,14 @@ def getcallargs(original_method, *args, **kwargs):
             callargs[f"_positional_argument{i}"] = arg
 
     callargs.update(kwargs)
-    logger().info(f"getcallargs {original_method} - {[arg for arg in callargs]}")
+    if log_info():
+        logger().info(f"getcallargs {original_method} - {[arg for arg in callargs]}")
     return callargs
 
 
 def decorate(records: "HTTPRecords", method: Callable, hook: Callable):
     ori = method
-    method = hook(records, method)
+    method = records.stats.instrument(hook, records, method)
     method.__httpdbg__ = ori  # type: ignore[attr-defined]
     return method
 
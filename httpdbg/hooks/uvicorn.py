@@ -7,6 +7,8 @@ from typing import Generator
 from httpdbg.hooks.utils import decorate
 from httpdbg.hooks.utils import undecorate
 from httpdbg.initiator import httpdbg_initiator
+from httpdbg.log import log_debug
+from httpdbg.log import log_info
 from httpdbg.log import logger
 from httpdbg.hooks.recordhttp1 import HTTP1Record
 from httpdbg.records import HTTPRecords
@@ -17,14 +19,14 @@ if typing.TYPE_CHECKING:
 
 # we use a proxy class to be able to override the write method
 class TCPTransport:
-    def __init__(self, transport, socketdata: "SocketRawData"):
+    def __init__(self, transport, socketdata: "SocketRawData", records: HTTPRecords):
         self.__httpdbg_original_transport = transport
         self.__httpdbg_socketdata = socketdata
+        self.__httpdbg_records = records
 
     def write(self, buf):
         if self.__httpdbg_socketdata:
-            if self.__httpdbg_socketdata.record:
-                self.__httpdbg_socketdata.record.send_data(buf)
+            self.__httpdbg_records._tracerhttp1.send(self.__httpdbg_socketdata, buf)
         return self.__httpdbg_original_transport.write(buf)
 
     def __getattr__(self, attr):
@@ -39,11 +41,13 @@ def set_hook_uvicorn_connection_made(records: HTTPRecords, method: Callable):
             self, force_new=True, is_uvicorn=True
         )
         if socketdata:
-            logger().debug(f"UVICORN - connection made - {socketdata}")
-            return method(self, TCPTransport(transport, socketdata))
+            if log_debug():
+                logger().debug(f"UVICORN - connection made - {socketdata}")
+            return method(self, TCPTransport(transport, socketdata, records))
         else:
             # should not happen
-            logger().debug("UVICORN - connection made - ignored")
+            if log_debug():
+                logger().debug("UVICORN - connection made - ignored")
             return method(self, transport)
 
     return hook
@@ -56,12 +60,16 @@ def set_hook_uvicorn_data_received(records: HTTPRecords, method: Callable):
         socketdata = records._tracerhttp1.get_socket_data(self)
         if socketdata:
             if socketdata.record:
-                socketdata.record.receive_data(data)
+                records._tracerhttp1.receive(socketdata, data)
             else:
-                socketdata.rawdata += data
-                http_detected = socketdata.http_detected()
+                socketdata.append(data)
+                http_detected = records._tracerhttp1.http_detected(
+                    socketdata, records, is_client=False
+                )
                 if http_detected:
-                    logger().info("UVICORN - http detected")
+                    if log_info():
+                        logger().info("UVICORN - http detected")
+                    records._tracerhttp1.loopback.join(records, self)
                     with httpdbg_initiator(
                         records,
                         method,
@@ -80,12 +88,14 @@ def set_hook_uvicorn_data_received(records: HTTPRecords, method: Callable):
                             group.id,
                             tbegin=socketdata.tbegin,
                             is_client=False,
+                            max_body_size=records.max_body_size,
+                        )
+                        socketdata.link_record()
+                        records._tracerhttp1.receive(
+                            socketdata, socketdata.pop_rawdata()
                         )
-                        socketdata.record.address = socketdata.address
-                        socketdata.record.ssl = socketdata.ssl
-                        socketdata.record.receive_data(socketdata.rawdata)
                         if records.server:
-                            records.requests[socketdata.record.id] = socketdata.record
+                            records.add_request(socketdata.record)
                 elif http_detected is False:  # if None, there is nothing to do
                     records._tracerhttp1.mark_as_not_a_http_request(self)
 
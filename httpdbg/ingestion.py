@@ -0,0 +1,161 @@
+from collections import deque
+import threading
+import time
+from typing import TYPE_CHECKING
+from typing import Union
+
+from httpdbg.log import logger
+
+if TYPE_CHECKING:
+    from httpdbg.hooks.recordhttp1 import HTTP1Record
+
+
+class IngestionQueue:
+    """Update the HTTP/1 records in a background thread.
+
+    Once a request has been detected (and its initiator captured), the hooks only
+    append an event (record, direction, timestamp, data) to a bounded queue. The data
+    are parsed by a background thread, in the order of the events.
+
+    When the queue is full, the policy decides what to do with a new event:
+      - drop: the data are not recorded (the drops are counted), the record is
+        flagged as incomplete and its next events are dropped too: its data
+        are not parsed with a gap,
+      - wait: the application waits until the queue has been processed.
+
+    A size of 0 disables the queue: the data are parsed by the application thread.
+    """
+
+    DROP = "drop"
+    WAIT = "wait"
+
+    SEND = 0
+    RECEIVE = 1
+    CLOSE = 2
+    FLUSH = 3
+
+    def __init__(self, size: int = 0, policy: str = DROP) -> None:
+        if policy not in (IngestionQueue.DROP, IngestionQueue.WAIT):
+            raise ValueError(f"unknown ingestion policy: {policy}")
+        self.size: int = size
+        self.policy: str = policy
+        self._lock: threading.Lock = threading.Lock()
+        self._init_worker()
+        self.reset()
+
+    def _init_worker(self) -> None:
+        # deque.append and deque.popleft are thread-safe, no lock is taken to push an event
+        self._events: deque = deque()
+        self._wakeup: threading.Event = threading.Event()
+        self._worker: Union[threading.Thread, None] = None
+
+    def reset(self) -> None:
+        self.flush()
+        self.processed: int = 0
+        self.dropped: int = 0
+        self.dropped_bytes: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def send(self, record: "HTTP1Record", data: bytes) -> None:
+        if self.enabled:
+            self._push(record, IngestionQueue.SEND, data)
+        else:
+            record.send_data(data)
+
+    def receive(self, record: "HTTP1Record", data: bytes) -> None:
+        if self.enabled:
+            self._push(record, IngestionQueue.RECEIVE, data)
+        else:
+            record.receive_data(data)
+
+    def close(self, record: "HTTP1Record") -> None:
+        if self.enabled:
+            self._push(record, IngestionQueue.CLOSE, b"")
+        else:
+            record.connection_closed()
+
+    def _push(self, record: "HTTP1Record", direction: int, data: bytes) -> None:
+        if not record.incomplete and len(self._events) >= self.size:
+            if self.policy == IngestionQueue.WAIT:
+                self.flush()
+            else:
+                record.incomplete = True
+                record.touch()  # the record has changed: published again
+        if record.incomplete:
+            with self._lock:
+                self.dropped += 1
+                self.dropped_bytes += len(data)
+            return
+        # the buffer may be reused by the application once the call returns
+        self._events.append((record, direction, time.perf_counter_ns(), bytes(data)))
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+            self._start_worker()
+
+    def _start_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run, name="httpdbg-ingestion", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while self._events:
+                record, direction, timestamp, data = self._events.popleft()
+                try:
+                    if direction == IngestionQueue.SEND:
+                        record.send_data(data, timestamp)
+                    elif direction == IngestionQueue.RECEIVE:
+                        record.receive_data(data, timestamp)
+                    elif direction == IngestionQueue.CLOSE:
+                        record.connection_closed()
+                    else:  # FLUSH
+                        data.set()
+                        continue
+                except Exception:
+                    logger().exception("ingestion - the data can't be recorded")
+                self.processed += 1
+
+    def flush(self, timeout: Union[float, None] = None) -> bool:
+        """Wait until all the events already pushed have been processed."""
+        if self._worker is None:
+            return True  # nothing has been pushed
+        done = threading.Event()
+        self._events.append((None, IngestionQueue.FLUSH, 0, done))
+        self._wakeup.set()
+        self._start_worker()
+        return done.wait(timeout)
+
+    def to_args(self) -> dict:
+        return {"size": self.size, "policy": self.policy}
+
+    def to_json(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": self.size,
+            "policy": self.policy,
+            "pending": len(self._events),
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "dropped_bytes": self.dropped_bytes,
+        }
+
+    def __getstate__(self) -> dict:
+        # the lock, the queue and the thread can't be pickled (multiprocess dump)
+        state = self.__dict__.copy()
+        for name in ("_lock", "_events", "_wakeup", "_worker"):
+            del state[name]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._init_worker()
@@ -1,12 +1,18 @@
 from collections.abc import Callable
 from contextlib import contextmanager
+import concurrent.futures.thread
 import datetime
-import functools
 import inspect
 import linecache
 import os
 import platform
+import runpy
+import sys
+import threading
+import time
 import traceback
+from types import CodeType
+from types import FrameType
 from typing import Generator
 from typing import Union
 from typing import TYPE_CHECKING
@@ -14,34 +20,163 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from httpdbg.records import HTTPRecords
 
+from httpdbg.argsrepr import ArgsRepr
 from httpdbg.hooks.utils import getcallargs
 from httpdbg.utils import get_new_uuid
+from httpdbg.utils import LRUCache
+from httpdbg.log import log_debug
+from httpdbg.log import log_info
 from httpdbg.log import logger
 
+# the code and the line number of each frame of a stack, the outermost first
+Frames = list[tuple[CodeType, int]]
+
+# a frame of the stack of an initiator: (filename, lineno, name)
+StackFrame = tuple[str, int, str]
+
+# the (filename, lineno) of each frame and the qualified name of the hooked callable
+CallSite = tuple[tuple[tuple[str, int], ...], str]
+
+
+class Call:
+    """The arguments of a hooked call, rendered only if a record is attached to it."""
+
+    __slots__ = ("_text", "_pending")
+
+    def __init__(
+        self,
+        original_method: Callable,
+        args: tuple,
+        kwargs: dict,
+        args_repr: ArgsRepr,
+    ):
+        self._text: str = ""
+        self._pending: Union[tuple[Callable, tuple, dict, ArgsRepr], None] = (
+            original_method,
+            args,
+            kwargs,
+            args_repr,
+        )
+
+    def materialize(self) -> None:
+        # reset before the rendering in case a __repr__ or __str__ calls a hooked method
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._text = construct_call_str(*pending)
+
+    def release(self) -> None:
+        self._pending = None
+
+    @property
+    def text(self) -> str:
+        self.materialize()
+        return self._text
+
+    def __getstate__(self) -> dict:
+        # the arguments can't be pickled (multiprocess dump)
+        self.materialize()
+        return {"_text": self._text, "_pending": None}
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
 
 class Initiator:
+    __slots__ = (
+        "id",
+        "_label",
+        "_short_stack",
+        "_frames",
+        "_site",
+        "tbegin",
+        "attached",
+        "call",
+        "_pending",
+    )
+
     def __init__(
         self,
         label: str,
         short_stack: str,
-        stack: list[str],
+        frames: tuple[StackFrame, ...] = (),
     ):
         self.id = get_new_uuid()
-        self.label = label
-        self.short_stack = short_stack
-        self.stack = stack
+        self._label = label
+        self._short_stack = short_stack
+        self._frames = frames
+        # the call site: the (filename, lineno) of the frames and the hooked callable
+        self._site: Union[CallSite, None] = None
         self.tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        self.attached: bool = False  # at least one record is attached to it
+        # the arguments of the call, until the initiator is closed (kept by the records)
+        self.call: Union[Call, None] = None
+        # the frames to render the initiator (only if it is used)
+        self._pending: Union[Frames, None] = None
+
+    @classmethod
+    def from_call(
+        cls,
+        frames: Frames,
+        original_method: Callable,
+        args: tuple,
+        kwargs: dict,
+        args_repr: ArgsRepr,
+    ) -> "Initiator":
+        initiator = cls("", "")
+        initiator._site = call_site(frames, original_method)
+        initiator.call = Call(original_method, args, kwargs, args_repr)
+        initiator._pending = frames
+        return initiator
+
+    def materialize(self) -> None:
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._label, self._short_stack, self._frames = get_current_instruction(
+                pending
+            )
+
+    def release(self) -> None:
+        self._pending = None
+
+    @property
+    def key(self) -> tuple:
+        # the call site, the arguments are not part of it (they are kept by the records)
+        if self._site is not None:
+            return self._site
+        return (self._label, self._frames)
+
+    @property
+    def label(self) -> str:
+        self.materialize()
+        return self._label
+
+    @property
+    def short_stack(self) -> str:
+        self.materialize()
+        return self._short_stack
+
+    @property
+    def stack(self) -> list[str]:
+        self.materialize()
+        last = len(self._frames) - 1
+        return [render_frame(frame, i == last) for i, frame in enumerate(self._frames)]
 
     def __eq__(self, other) -> bool:
         if type(other) is Initiator:
-            return (
-                self.label == other.label
-                and self.short_stack == other.short_stack
-                and self.stack == other.stack
-            )
+            return self.key == other.key
         else:
             return False
 
+    def __getstate__(self) -> dict:
+        # the frames and the arguments can't be pickled (multiprocess dump)
+        self.materialize()
+        return {name: getattr(self, name) for name in Initiator.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def to_json(self, full: bool = True) -> dict:
         if full:
             json = {
@@ -62,13 +197,43 @@ class Initiator:
 
 
 class Group:
-    def __init__(self, label: str, full_label: str, updatable: bool):
+    __slots__ = ("id", "_label", "_full_label", "updatable", "initiator", "tbegin")
+
+    def __init__(
+        self,
+        label: str,
+        full_label: str,
+        updatable: bool,
+        initiator: Union[Initiator, None] = None,
+    ):
         self.id: str = get_new_uuid()
-        self.label: str = label
-        self.full_label: str = full_label
+        self._label: str = label
+        self._full_label: str = full_label
         self.updatable: bool = updatable
+        # a group created for an initiator is labelled by it (until it is updated)
+        self.initiator: Union[Initiator, None] = initiator
         self.tbegin: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
 
+    @property
+    def label(self) -> str:
+        if self.initiator is not None:
+            return self.initiator.label
+        return self._label
+
+    @label.setter
+    def label(self, value: str) -> None:
+        self._label = value
+
+    @property
+    def full_label(self) -> str:
+        if self.initiator is not None:
+            return self.initiator.short_stack
+        return self._full_label
+
+    @full_label.setter
+    def full_label(self, value: str) -> None:
+        self._full_label = value
+
     def to_json(self) -> dict:
         return {
             "id": self.id,
@@ -96,69 +261,181 @@ def in_lib(line: str, packages: list[str] = None):
     )
 
 
+def get_frames(depth: int = 1) -> Frames:
+    """Capture the code and the line number of each frame of the caller's stack.
+
+    This is much cheaper than traceback.extract_stack: nothing is read from the
+    source files.
+    """
+    frames: Frames = []
+    frame: Union[FrameType, None] = sys._getframe(depth)
+    while frame is not None:
+        frames.append((frame.f_code, frame.f_lineno or 0))
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def call_site(
+    frames: Frames, original_method: Union[Callable, None] = None
+) -> CallSite:
+    """Identify a call site without rendering anything (see Initiator.key)."""
+    return (
+        tuple((code.co_filename, lineno) for code, lineno in frames),
+        qualified_name(original_method) if original_method is not None else "",
+    )
+
+
+# the same frame tuple is shared by all the initiators
+_interned_frames: dict[StackFrame, StackFrame] = {}
+
+
+def intern_frame(code: CodeType, lineno: int) -> StackFrame:
+    frame = (code.co_filename, lineno, code.co_name)
+    return _interned_frames.setdefault(frame, frame)
+
+
+def render_frame(frame: StackFrame, last: bool) -> str:
+    filename, lineno, _ = frame
+    _, _, long_stack = extract_short_stack_from_file(filename, lineno, not last)
+    return f'File "{filename}", line {lineno}, \n{long_stack}\n'
+
+
+# the modules that run the user code: pyhttpdbg (but not its hooks) and runpy
+_HTTPDBG_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_HOOKS_DIR = os.path.join(_HTTPDBG_DIR, "hooks") + os.sep
+_RUNPY_FILENAME = runpy.run_path.__code__.co_filename  # "<frozen runpy>" if frozen
+
+
+def count_runner_frames(frames: Frames, end: int) -> int:
+    """The number of the first frames that belong to the runner of the user code.
+
+    For example pyhttpdbg --script runs the script through mode_script and runpy:
+    these frames are not part of the stack of an initiator.
+    """
+    first = 0
+    for i in range(end):
+        filename = frames[i][0].co_filename
+        if filename == _RUNPY_FILENAME or (
+            filename.startswith(_HTTPDBG_DIR) and not filename.startswith(_HOOKS_DIR)
+        ):
+            first = i + 1
+    return first
+
+
 def get_current_instruction(
-    extracted_stack: traceback.StackSummary,
-) -> tuple[str, str, list[str]]:
+    frames: Frames,
+) -> tuple[str, str, tuple[StackFrame, ...]]:
     instruction: str = ""
     short_stack: str = ""
-    stack: list[str] = []
+    stack: list[StackFrame] = []
 
     try:
         n_stack = -2
-        framesummary = extracted_stack[-3]
+        code, lineno = frames[-3]
 
         while (
-            ("httpdbg/hooks" in framesummary.filename)
-            or ("httpdbg\\hooks" in framesummary.filename)
-            or ("asyncio" in framesummary.filename)
+            ("httpdbg/hooks" in code.co_filename)
+            or ("httpdbg\\hooks" in code.co_filename)
+            or ("asyncio" in code.co_filename)
         ):
             n_stack -= 1
-            framesummary = extracted_stack[n_stack - 1]
+            code, lineno = frames[n_stack - 1]
 
-        if os.path.exists(framesummary.filename) and framesummary.lineno is not None:
+        if source_exists(code.co_filename):
 
             # stack
             to_include = False
-            for i_stack in range(7, len(extracted_stack) + n_stack):
-                last_stack = i_stack == len(extracted_stack) + n_stack - 1
-                fs = extracted_stack[i_stack]
+            first = count_runner_frames(frames, len(frames) + n_stack)
+            for i_stack in range(first, len(frames) + n_stack):
+                last_stack = i_stack == len(frames) + n_stack - 1
+                code, lineno = frames[i_stack]
                 to_include = to_include or (
-                    ("/site-packages/" not in fs.filename)
-                    and ("importlib" not in fs.filename)
+                    ("/site-packages/" not in code.co_filename)
+                    and ("importlib" not in code.co_filename)
+                    and (code.co_filename != threading.__file__)
+                    and (code.co_filename != concurrent.futures.thread.__file__)
                 )  # remove the stack before to start the user part
                 if to_include:
-                    instruction, s_stack, l_stack = extract_short_stack_from_file(
-                        fs.filename,
-                        fs.lineno if fs.lineno else 0,
-                        not last_stack,
-                    )
                     if last_stack:
-                        short_stack = (
-                            f'File "{fs.filename}", line {fs.lineno}, in {fs.name}\n'
+                        instruction, s_stack, _ = extract_short_stack_from_file(
+                            code.co_filename, lineno, False
                         )
+                        short_stack = f'File "{code.co_filename}", line {lineno}, in {code.co_name}\n'
                         short_stack += s_stack
 
-                    stack.append(
-                        f'File "{fs.filename}", line {fs.lineno}, \n{l_stack}\n'
-                    )
+                    stack.append(intern_frame(code, lineno))
 
         else:
-            instruction = framesummary.line if framesummary.line else "console"
+            line = linecache.getline(code.co_filename, lineno).strip()
+            instruction = line if line else "console"
             short_stack += f"{instruction}\n"
             stack = []
     except Exception as ex:
-        logger().info(
-            f"GET_CURRENT_INSTRUCTION [{str(extracted_stack)}] - error - {str(ex)}"
-        )
+        if log_info():
+            logger().info(f"GET_CURRENT_INSTRUCTION [{frames}] - error - {str(ex)}")
+
+    return instruction.replace("\n", " "), short_stack, tuple(stack)
+
+
+# the source files: (time of the last check, modification time or None if missing)
+_source_files: dict[str, tuple[float, Union[int, None]]] = {}
+
+# the lines extracted from the source files, invalidated if a file is modified
+_source_cache = LRUCache(max_entries=4096, max_size=8 * 1024 * 1024)
+
 
-    return instruction.replace("\n", " "), short_stack, stack
+def get_source_mtime(filename: str) -> Union[int, None]:
+    """The modification time of a source file, None if it does not exist.
+
+    The file is checked at most once per second.
+    """
+    now = time.monotonic()
+    checked = _source_files.get(filename)
+    if checked is not None and now - checked[0] < 1.0:
+        return checked[1]
+
+    try:
+        mtime: Union[int, None] = os.stat(filename).st_mtime_ns
+    except (OSError, ValueError):
+        mtime = None
+    if checked is None or checked[1] != mtime:
+        linecache.checkcache(filename)
+    _source_files[filename] = (now, mtime)
+    return mtime
+
+
+def source_exists(filename: str) -> bool:
+    return get_source_mtime(filename) is not None
 
 
-@functools.cache
 def extract_short_stack_from_file(
     filename: str,
     lineno: int,
     stop_if_instruction_ends: bool = True,
+) -> tuple[str, str, str]:
+    mtime = get_source_mtime(filename)
+    if mtime is None:
+        return "", "", ""
+
+    key = (filename, mtime, lineno, stop_if_instruction_ends)
+    extract = _source_cache.get(key)
+    if extract is None:
+        extract = _extract_short_stack_from_file(
+            filename, lineno, stop_if_instruction_ends
+        )
+        _source_cache.set(key, extract, sum(len(text) for text in extract))
+        if log_debug():
+            logger().debug(
+                f"SOURCE_CACHE miss {filename}:{lineno} - hits={_source_cache.hits} misses={_source_cache.misses} entries={len(_source_cache)} size={_source_cache.size}"
+            )
+    return extract
+
+
+def _extract_short_stack_from_file(
+    filename: str,
+    lineno: int,
+    stop_if_instruction_ends: bool = True,
 ) -> tuple[str, str, str]:
     before: int = 4
     after: int = 8
@@ -167,56 +444,63 @@ def extract_short_stack_from_file(
     long_stack: str = ""
 
     try:
-        if os.path.exists(filename):
-            # copy the lines before, only for the "long" stack (if they are not empty)
-            copyit = False
-            for i in range(max(0, lineno - before), lineno):
-                line = linecache.getline(filename, i).removesuffix("\n").rstrip()
-                copyit = copyit or (line != "")
-                if copyit:
-                    long_stack += f" {i}. {line}\n"
-
-            # try to recompose the instruction if on multi-lines
-            end_of_instruction_found = False
-            for i in range(max(0, lineno), lineno + after):
-                line = linecache.getline(filename, i).removesuffix("\n").rstrip()
-                if not end_of_instruction_found:
-                    instruction += line.strip()
-                    short_stack += f" {i}. {line}\n"
-                long_stack += (
-                    f" {i}. {line}{' <====' if (before > 0 and i == lineno) else ''}\n"
-                )
-                nb_parenthesis = 0
-                for c in instruction[instruction.find("(") :]:
-                    if c == "(":
-                        nb_parenthesis += 1
-                    if c == ")":
-                        nb_parenthesis -= 1
-                    if nb_parenthesis == 0:
-                        end_of_instruction_found = True
-                        break
-                if end_of_instruction_found and stop_if_instruction_ends:
+        # copy the lines before, only for the "long" stack (if they are not empty)
+        copyit = False
+        for i in range(max(0, lineno - before), lineno):
+            line = linecache.getline(filename, i).removesuffix("\n").rstrip()
+            copyit = copyit or (line != "")
+            if copyit:
+                long_stack += f" {i}. {line}\n"
+
+        # try to recompose the instruction if on multi-lines
+        end_of_instruction_found = False
+        for i in range(max(0, lineno), lineno + after):
+            line = linecache.getline(filename, i).removesuffix("\n").rstrip()
+            if not end_of_instruction_found:
+                instruction += line.strip()
+                short_stack += f" {i}. {line}\n"
+            long_stack += (
+                f" {i}. {line}{' <====' if (before > 0 and i == lineno) else ''}\n"
+            )
+            nb_parenthesis = 0
+            for c in instruction[instruction.find("(") :]:
+                if c == "(":
+                    nb_parenthesis += 1
+                if c == ")":
+                    nb_parenthesis -= 1
+                if nb_parenthesis == 0:
+                    end_of_instruction_found = True
                     break
+            if end_of_instruction_found and stop_if_instruction_ends:
+                break
     except Exception as ex:
         tb = traceback.extract_tb(ex.__traceback__)
         _, lineno, _, _ = tb[-1]
-        logger().info(
-            f"EXTRACT_SHORT_STACK_FROM_FILE {filename} lineno={lineno} before={before} after={after}- error (line {lineno}) - {str(ex)}",
-        )
+        if log_info():
+            logger().info(
+                f"EXTRACT_SHORT_STACK_FROM_FILE {filename} lineno={lineno} before={before} after={after}- error (line {lineno}) - {str(ex)}",
+            )
 
     return instruction, short_stack, long_stack
 
 
-def construct_call_str(original_method, *args, **kwargs):
+def qualified_name(original_method: Callable) -> str:
+    module = getattr(original_method, "__module__", None)
+    name = getattr(
+        original_method, "__qualname__", getattr(original_method, "__name__", "***")
+    )
+    return f"{module}.{name}" if module else name
+
+
+def construct_call_str(
+    original_method: Callable, args: tuple, kwargs: dict, args_repr: ArgsRepr
+) -> str:
 
     def print_v(v) -> str:
-        try:
-            if isinstance(v, str):
-                return f'"{v}"'
-            else:
-                return str(v)
-        except Exception:
-            return "-?-"  # in case __retr__ or __str__ is broken
+        text, length = args_repr.render(v)
+        if length is not None:
+            text += f" [length={length}]"
+        return text
 
     callargs = getcallargs(original_method, *args, **kwargs)
 
@@ -247,39 +531,42 @@ def httpdbg_initiator(
     *args,
     **kwargs,
 ) -> Generator[tuple[Initiator, Group, bool], None, None]:
-    try:
-        if records.current_initiator is None:
-            initiator_already_set = False
-
-            extracted_stack: traceback.StackSummary = traceback.extract_stack()
-
-            # temporary set a fake initiator env variable to avoid a recursion error
-            #  RecursionError: maximum recursion depth exceeded while calling a Python object
-            # TL;DR When we construct the short_stack string, a recursion error occurs if there
-            # is an object from a class where a hooked method is called in __repr__ or __str__.
-            records.current_initiator = "--fakeinitiator--"
-            instruction, short_stack, stack = get_current_instruction(extracted_stack)
-            short_stack += "----------\n" + construct_call_str(
-                original_method, *args, **kwargs
-            )
+    current_initiator = (
+        records.initiators.get(records.current_initiator)
+        if records.current_initiator
+        else None
+    )
 
-            current_initiator = Initiator(instruction, short_stack, stack)
+    if current_initiator is None:
+        # no initiator in this context (or it has been closed by the parent of this thread)
+        initiator_already_set = False
+        t0 = time.perf_counter_ns()
 
-            records.add_initiator(current_initiator)
-        else:
-            initiator_already_set = True
-            if records.current_initiator != "--fakeinitiator--":
-                current_initiator = records.initiators[records.current_initiator]
-            else:
-                # this fake initiator does not need to be recorded
-                current_initiator = Initiator("", "", [])
+        # only the frames are captured here: the initiator is rendered if it is used
+        current_initiator = Initiator.from_call(
+            get_frames(), original_method, args, kwargs, records.args_repr
+        )
+
+        records.add_initiator(current_initiator)
+        records.stats.add_initiator(time.perf_counter_ns() - t0)
+    else:
+        initiator_already_set = True
 
+    try:
         with httpdbg_group(
-            records, current_initiator.label, current_initiator.short_stack
+            records, "", "", initiator=current_initiator
         ) as group:  # by default we group the requests by initiator
-            yield current_initiator, group, initiator_already_set is False
-    except Exception:
-        raise
+            try:
+                yield current_initiator, group, initiator_already_set is False
+            except Exception:
+                # the exception may be recorded by the hook once the initiator is closed
+                current_initiator.materialize()
+                if current_initiator.call is not None:
+                    current_initiator.call.materialize()
+                raise
+            finally:
+                if not initiator_already_set:
+                    records.close_initiator(current_initiator, group)
     finally:
         # import to make the context manager reentrant
         if not initiator_already_set:
@@ -291,13 +578,15 @@ def httpdbg_tag(records: "HTTPRecords", tag: str) -> Generator[None, None, None]
 
     if records.current_tag is None:
         tag_already_set = False
-        logger().info("httpdbg_tag (new)")
+        if log_info():
+            logger().info("httpdbg_tag (new)")
         records.current_tag = tag
     else:
         tag_already_set = True
 
     try:
-        logger().info(f"httpdbg_tag {tag}")
+        if log_info():
+            logger().info(f"httpdbg_tag {tag}")
         yield
     except Exception:
         if not tag_already_set:
@@ -315,33 +604,43 @@ def httpdbg_group(
     full_label: str,
     update: bool = False,
     updatable: bool = True,
+    initiator: Union[Initiator, None] = None,
 ) -> Generator[Group, None, None]:
 
-    if records.current_group is None:
+    current_group = (
+        records.groups.get(records.current_group) if records.current_group else None
+    )
+
+    if current_group is None:
         group_already_set = False
-        logger().info("httpdbg_group (new)")
-        group = Group(label, full_label, updatable=updatable)
+        if log_info():
+            logger().info("httpdbg_group (new)")
+        group = Group(label, full_label, updatable=updatable, initiator=initiator)
         records.add_group(group)
     else:
         group_already_set = True
-        group = records.groups[records.current_group]
+        group = current_group
 
     if update and group.updatable:
         # Update the label and full_label of an existing group, in case of endpoint.
+        group.initiator = None
         group.label = label
         group.full_label = full_label
     try:
-        logger().info(
-            f"httpdbg_group {group} group_id={records.current_group} label={label} full_label={full_label}"
-        )
+        if log_info():
+            logger().info(
+                f"httpdbg_group {group} group_id={records.current_group} label={label} full_label={full_label}"
+            )
         yield group
     except Exception:
         if not group_already_set:
             records.current_group = None
+            records.close_group(group)
         raise
 
     if not group_already_set:
         records.current_group = None
+        records.close_group(group)
 
 
 @contextmanager
@@ -349,7 +648,7 @@ def httpdbg_endpoint(
     records: "HTTPRecords", original_method: Callable, *args, **kwargs
 ) -> Generator[Union[Group, None], None, None]:
 
-    filename = inspect.getsourcefile(original_method)
+    filename = inspect.getsourcefile(inspect.unwrap(original_method))
     if filename:
         _, lineno = inspect.getsourcelines(original_method)
         instruction, s_stack, _ = extract_short_stack_from_file(filename, lineno)
@@ -358,7 +657,7 @@ def httpdbg_endpoint(
         )
         full_label += s_stack
         full_label += "----------\n" + construct_call_str(
-            original_method, *args, **kwargs
+            original_method, args, kwargs, records.args_repr
         )
 
         with httpdbg_group(records, instruction, full_label, update=True) as group:
@@ -1,7 +1,11 @@
+import atexit
 from enum import Enum
 from functools import cache
 import logging
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
 import os
+import queue
 from pathlib import Path
 from typing import Union
 
@@ -50,10 +54,45 @@ def logger() -> logging.Logger:
     if HTTPDBG_LOG_PATH in os.environ:
         file_handler = logging.FileHandler(os.environ[HTTPDBG_LOG_PATH])
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(async_handler(logger, file_handler))
     else:
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
         logger.addHandler(console_handler)
 
     return logger
+
+
+def async_handler(logger: logging.Logger, handler: logging.Handler) -> QueueHandler:
+    """The records are written by a background thread, not by the recorded application.
+
+    In a forked child process, the background thread does not exist anymore so the
+    records are written directly by the handler.
+    """
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    listener = QueueListener(queue_handler.queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def after_in_child():
+        logger.removeHandler(queue_handler)
+        logger.addHandler(handler)
+
+    if hasattr(os, "register_at_fork"):  # not on Windows
+        os.register_at_fork(after_in_child=after_in_child)
+
+    return queue_handler
+
+
+# The hooks are called for each recv/send: the messages must not be formatted
+# if they are not logged. Use: `if log_info(): logger().info(f"...")`.
+
+
+@cache
+def log_debug() -> bool:
+    return logger().isEnabledFor(logging.DEBUG)
+
+
+@cache
+def log_info() -> bool:
+    return logger().isEnabledFor(logging.INFO)
@@ -0,0 +1,159 @@
+import datetime
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Union
+
+if TYPE_CHECKING:
+    from httpdbg.hooks.record import HTTPRecord
+
+
+def parse_datetime(value: str) -> datetime.datetime:
+    """An ISO 8601 date, in UTC if the timezone is not specified."""
+    date = datetime.datetime.fromisoformat(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date
+
+
+def status_class(status_code: int) -> str:
+    """The key of a status code in the index: 2xx, 4xx, 5xx, ... or error."""
+    if status_code < 0:
+        return "error"
+    return f"{status_code // 100}xx"
+
+
+class RecordQuery:
+    """The criteria to select the recorded requests.
+
+    All the criteria must match (None means any value):
+      - netloc: the scheme and the location (ex: https://example.com),
+      - method: the HTTP method,
+      - status: a status code (404), a class of status codes (5xx), or error,
+      - initiator, group, tag: the ids of the initiator and the group, the tag,
+      - since, until: the beginning of the request.
+
+    The requests are sorted by a key (tbegin, duration, status_code, netloc, url or
+    method), in the descending order if prefixed by "-". 0 means no limit.
+    """
+
+    SORT_KEYS = ("tbegin", "duration", "status_code", "netloc", "url", "method")
+    PARAMETERS = (
+        "netloc",
+        "method",
+        "status",
+        "initiator",
+        "group",
+        "tag",
+        "after",
+        "before",
+        "sort",
+        "offset",
+        "limit",
+    )
+
+    def __init__(
+        self,
+        netloc: Union[str, None] = None,
+        method: Union[str, None] = None,
+        status: Union[str, int, None] = None,
+        initiator: Union[str, None] = None,
+        group: Union[str, None] = None,
+        tag: Union[str, None] = None,
+        since: Union[datetime.datetime, None] = None,
+        until: Union[datetime.datetime, None] = None,
+        sort: str = "tbegin",
+        offset: int = 0,
+        limit: int = 0,
+    ) -> None:
+        self.netloc: Union[str, None] = netloc
+        self.method: Union[str, None] = method.upper() if method else None
+        self.status: Union[str, None] = None
+        self.status_code: Union[int, None] = None
+        if status is not None:
+            status = str(status).lower()
+            if status == "error" or (
+                len(status) == 3 and status[0].isdigit() and status[1:] == "xx"
+            ):
+                self.status = status
+            else:
+                # raise a ValueError if not a status code
+                self.status_code = int(status)
+                self.status = status_class(self.status_code)
+        self.initiator: Union[str, None] = initiator
+        self.group: Union[str, None] = group
+        self.tag: Union[str, None] = tag
+        self.since: Union[datetime.datetime, None] = since
+        self.until: Union[datetime.datetime, None] = until
+        self.descending: bool = sort.startswith("-")
+        self.sort: str = sort.lstrip("-")
+        if self.sort not in RecordQuery.SORT_KEYS:
+            raise ValueError(f"unknown sort key: {self.sort}")
+        self.offset: int = max(0, offset)
+        self.limit: int = max(0, limit)
+
+    @classmethod
+    def from_query_string(cls, query: dict[str, list[str]]) -> "RecordQuery":
+        """The criteria of an URL query string (raise a ValueError if invalid)."""
+        criteria: dict[str, Any] = {}
+        for name in ("netloc", "method", "status", "initiator", "group", "tag"):
+            if name in query:
+                criteria[name] = query[name][0]
+        # since is the cursor of the delta (see HTTPRecords.changes) in the web API
+        for name, criterion in (("after", "since"), ("before", "until")):
+            if name in query:
+                criteria[criterion] = parse_datetime(query[name][0])
+        for name in ("offset", "limit"):
+            if name in query:
+                criteria[name] = int(query[name][0])
+        if "sort" in query:
+            criteria["sort"] = query["sort"][0]
+        return cls(**criteria)
+
+    @property
+    def indexed(self) -> dict[str, str]:
+        """The criteria that can be resolved by an index."""
+        criteria = {
+            "netloc": self.netloc,
+            "method": self.method,
+            "status": self.status,
+            "initiator": self.initiator,
+            "group": self.group,
+            "tag": self.tag,
+        }
+        return {name: value for name, value in criteria.items() if value is not None}
+
+    def match(self, record: "HTTPRecord") -> bool:
+        if self.netloc is not None and record.netloc != self.netloc:
+            return False
+        if self.method is not None and record.method.upper() != self.method:
+            return False
+        if self.status_code is not None:
+            if record.status_code != self.status_code:
+                return False
+        elif self.status is not None:
+            if (
+                not record.status_code
+                or status_class(record.status_code) != self.status
+            ):
+                return False
+        if self.initiator is not None and record.initiator_id != self.initiator:
+            return False
+        if self.group is not None and record.group_id != self.group:
+            return False
+        if self.tag is not None and record.tag != self.tag:
+            return False
+        if self.since is not None and record.tbegin < self.since:
+            return False
+        if self.until is not None and record.tbegin > self.until:
+            return False
+        return True
+
+    def sort_key(self, record: "HTTPRecord") -> Any:
+        if self.sort == "tbegin":
+            return (record.tbegin, record.seq)
+        elif self.sort == "duration":
+            return record.timing.duration or 0
+        return getattr(record, self.sort)
+
+    def page(self, records: list["HTTPRecord"]) -> list["HTTPRecord"]:
+        return records[self.offset : self.offset + self.limit if self.limit else None]
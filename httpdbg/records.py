@@ -1,11 +1,27 @@
+import bisect
+from collections.abc import Hashable
+from contextvars import ContextVar
 import datetime
 import sys
+import threading
+from typing import Iterator
 from typing import Union
+from typing import overload
 
+from httpdbg.argsrepr import ArgsRepr
 from httpdbg.hooks.record import HTTPRecord
+from httpdbg.hooks.stats import HookStats
+from httpdbg.initiator import call_site
+from httpdbg.initiator import get_frames
 from httpdbg.initiator import Group
+from httpdbg.ingestion import IngestionQueue
 from httpdbg.initiator import Initiator
 from httpdbg.log import logger
+from httpdbg.query import RecordQuery
+from httpdbg.query import status_class
+from httpdbg.retention import RetentionPolicy
+from httpdbg.sampling import SamplingPolicy
+from httpdbg.store import RecordStore
 from httpdbg.utils import get_new_uuid
 
 
@@ -18,15 +34,33 @@ class HTTPRecordsSessionInfo:
 
 
 class HTTPRecords:
+    # the number of web clients (browser tabs) whose cursor is kept
+    MAX_CLIENTS = 32
+
     def __init__(
         self,
         client: bool = True,
         server: bool = False,
         ignore: tuple[tuple[str, int], ...] = (),
+        max_body_size: int = 0,
+        sampling: Union[SamplingPolicy, None] = None,
+        args_repr: Union[ArgsRepr, None] = None,
+        ingestion: Union[IngestionQueue, None] = None,
+        retention: Union[RetentionPolicy, None] = None,
+        store: Union[RecordStore, None] = None,
     ) -> None:
         self.client: bool = client
         self.server: bool = server
         self._ignore: tuple[tuple[str, int], ...] = ignore
+        self._max_body_size: int = max_body_size
+        self._sampling: SamplingPolicy = sampling if sampling else SamplingPolicy()
+        self.args_repr: ArgsRepr = args_repr if args_repr else ArgsRepr()
+        self._ingestion: IngestionQueue = ingestion if ingestion else IngestionQueue()
+        self.retention: RetentionPolicy = retention if retention else RetentionPolicy()
+        self._store: RecordStore = store if store else RecordStore()
+        self.stats: HookStats = HookStats()
+        self._lock: threading.Lock = threading.Lock()
+        self._new_context()
         self.reset()
 
     def reset(self) -> None:
@@ -36,21 +70,147 @@ class HTTPRecords:
         logger().info("HTTPRecords.reset")
         self.session: HTTPRecordsSessionInfo = HTTPRecordsSessionInfo()
         self.requests: dict[str, HTTPRecord] = {}
-        self.requests_already_loaded = 0
+        # the records ordered by tbegin, for the positional access and the iteration
+        self._ordered: list[HTTPRecord] = []
+        self._ordered_keys: list[tuple[datetime.datetime, int]] = []
+        self._last_seq: int = 0
+        # the ids of the records by netloc, method, status class, initiator, group and tag
+        self._indexes: dict[str, dict[str, set[str]]] = {}
+        self._index_keys: dict[str, list[tuple[str, str]]] = {}
+        # the records not complete yet (with their version): they may change
+        self._unsettled: dict[str, int] = {}
+        # the records ordered by their last change, for the delta of the web clients
+        self._changes: dict[str, int] = {}
+        self._last_change: int = 0
+        # the last change loaded by each web client, the least recent poll first
+        self._loaded: dict[str, int] = {}
+        # the last change loaded by the clients forgotten (see MAX_CLIENTS)
+        self._loaded_forgotten: int = 0
+        # the records older than that have been evicted (they are not merged again)
+        self._evicted_until: Union[datetime.datetime, None] = None
+        # the initiators and groups of the evicted records, removed if not used anymore
+        self._orphans: set[str] = set()
+        # the initiators and groups still in use by a hooked call
+        self._open: set[str] = set()
         self.initiators: dict[str, Initiator] = {}
-        self.current_initiator: Union[str, None] = None
+        # one initiator for all the calls from the same call site
+        self._interned_initiators: dict[tuple, Initiator] = {}
+        self._initiator_aliases: dict[str, str] = {}
         self.groups: dict[str, Group] = {}
-        self.current_group: Union[str, None] = None
-        self.current_tag: Union[str, None] = None
-        self._tracerhttp1: TracerHTTP1 = TracerHTTP1(ignore=self.ignore)
-        self._tracerhttp2: TracerHTTP2 = TracerHTTP2(ignore=self.ignore)
+        self.current_initiator = None
+        self.current_group = None
+        self.current_tag = None
+        self._sampling.reset()
+        self.stats.reset()
+        self.retention.reset()
+        self._ingestion.reset()
+        self._store.reset()
+        self._tracerhttp1: TracerHTTP1 = TracerHTTP1(
+            ignore=self.ignore, ingestion=self.ingestion
+        )
+        self._tracerhttp2: TracerHTTP2 = TracerHTTP2(
+            ignore=self.ignore,
+            max_body_size=self.max_body_size,
+            sampling=self.sampling,
+        )
+
+    def _new_context(self) -> None:
+        # the initiator, the group and the tag are set for each thread and each asyncio task
+        # (created once: a context keeps a reference to each variable set in it)
+        self._current_initiator: ContextVar[Union[str, None]] = ContextVar(
+            "httpdbg_current_initiator", default=None
+        )
+        self._current_group: ContextVar[Union[str, None]] = ContextVar(
+            "httpdbg_current_group", default=None
+        )
+        self._current_tag: ContextVar[Union[str, None]] = ContextVar(
+            "httpdbg_current_tag", default=None
+        )
+
+    @property
+    def current_initiator(self) -> Union[str, None]:
+        return self._current_initiator.get()
+
+    @current_initiator.setter
+    def current_initiator(self, value: Union[str, None]) -> None:
+        self._current_initiator.set(value)
+
+    @property
+    def current_group(self) -> Union[str, None]:
+        return self._current_group.get()
+
+    @current_group.setter
+    def current_group(self, value: Union[str, None]) -> None:
+        self._current_group.set(value)
 
     @property
-    def unread(self) -> int:
-        return self.requests_already_loaded < len(self.requests)
+    def current_tag(self) -> Union[str, None]:
+        return self._current_tag.get()
 
-    def __getitem__(self, item: int) -> HTTPRecord:
-        return list(self.requests.values())[item]
+    @current_tag.setter
+    def current_tag(self, value: Union[str, None]) -> None:
+        self._current_tag.set(value)
+
+    @property
+    def in_context(self) -> bool:
+        return bool(self.current_initiator or self.current_group or self.current_tag)
+
+    def __getstate__(self) -> dict:
+        # the context variables and the lock can't be pickled (multiprocess dump)
+        state = self.__dict__.copy()
+        del state["_current_initiator"]
+        del state["_current_group"]
+        del state["_current_tag"]
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._new_context()
+
+    @property
+    def unread(self) -> bool:
+        """A change has not been loaded by any web client yet."""
+        with self._lock:
+            self._settle()
+            loaded = max(self._loaded.values(), default=0)
+            return max(loaded, self._loaded_forgotten) < self._last_change
+
+    @property
+    def cursor(self) -> int:
+        """The number of the last change (see changes)."""
+        return self._last_change
+
+    @property
+    def last_seq(self) -> int:
+        """The sequence number of the last record added."""
+        return self._last_seq
+
+    def mark_loaded(self, client: str, cursor: int) -> None:
+        """The changes until the cursor have been loaded by a web client."""
+        with self._lock:
+            self._loaded.pop(client, None)
+            self._loaded[client] = cursor
+            if len(self._loaded) > HTTPRecords.MAX_CLIENTS:
+                # each tab is a new client: the one that has not polled for the longest time
+                forgotten = self._loaded.pop(next(iter(self._loaded)))
+                self._loaded_forgotten = max(self._loaded_forgotten, forgotten)
+
+    @overload
+    def __getitem__(self, item: int) -> HTTPRecord: ...
+
+    @overload
+    def __getitem__(self, item: slice) -> list[HTTPRecord]: ...
+
+    def __getitem__(
+        self, item: Union[int, slice]
+    ) -> Union[HTTPRecord, list[HTTPRecord]]:
+        return self._ordered[item]
+
+    def __iter__(self) -> Iterator[HTTPRecord]:
+        # a copy, the records may be added by another thread during the iteration
+        return iter(self._ordered[:])
 
     def __len__(self) -> int:
         return len(self.requests)
@@ -62,20 +222,367 @@ class HTTPRecords:
 
         if initiator.id not in self.initiators:
             self.initiators[initiator.id] = initiator
-        new_record = HTTP1Record(initiator.id, group.id)
+        if group.id not in self.groups:
+            self.groups[group.id] = group
+        new_record = HTTP1Record(
+            initiator.id, group.id, max_body_size=self.max_body_size
+        )
         new_record.url = url
         new_record.exception = exception
-        self.requests[new_record.id] = new_record
+        self.add_request(new_record)
         return new_record
 
+    def add_request(self, record: HTTPRecord) -> None:
+        initiator = self.initiators.get(record.initiator_id)
+        if initiator is not None:
+            if record.call is None:
+                record.call = initiator.call
+            initiator = self.intern_initiator(initiator)
+            record.initiator_id = initiator.id
+        self._index(record)
+
+    def _index(self, record: HTTPRecord) -> None:
+        with self._lock:
+            previous = self.requests.get(record.id)
+            if previous is not None:
+                # a new version of a record already indexed (multiprocess dump)
+                record.seq = previous.seq
+                self._unindex(previous.id)
+                key = (previous.tbegin, previous.seq)
+                pos = bisect.bisect_left(self._ordered_keys, key)
+                if record.tbegin == previous.tbegin:
+                    self._ordered[pos] = record  # same place: replaced
+                else:
+                    del self._ordered_keys[pos]
+                    del self._ordered[pos]
+                    previous = None
+            else:
+                self._last_seq += 1
+                record.seq = self._last_seq
+            if previous is None:
+                key = (record.tbegin, record.seq)
+                pos = bisect.bisect_right(self._ordered_keys, key)
+                self._ordered_keys.insert(pos, key)
+                self._ordered.insert(pos, record)
+            self.requests[record.id] = record
+            self._add_to_index(record.id, "initiator", record.initiator_id)
+            self._add_to_index(record.id, "group", record.group_id)
+            self._add_to_index(record.id, "tag", record.tag)
+            self._unsettled[record.id] = record.version
+            self._mark_changed(record.id)
+        if self._store.enabled:
+            self._store.save(self, record)
+        if self.retention.enabled:
+            self.apply_retention()
+
+    def set_group(self, record: HTTPRecord, group_id: str) -> None:
+        """Move a record already added to another group (indexed again)."""
+        with self._lock:
+            previous = record.group_id
+            if previous == group_id:
+                return
+            record.group_id = group_id
+            record.touch()
+            if record.id not in self.requests:
+                return
+            keys = self._index_keys.get(record.id, [])
+            if ("group", previous) in keys:
+                keys.remove(("group", previous))
+                ids = self._indexes["group"][previous]
+                ids.discard(record.id)
+                if not ids:
+                    del self._indexes["group"][previous]
+            self._add_to_index(record.id, "group", group_id)
+            self._mark_changed(record.id)
+        if self._store.enabled:
+            self._store.save(self, record)
+
+    def _add_to_index(self, record_id: str, name: str, value: Union[str, None]) -> None:
+        if value is None:
+            return
+        self._indexes.setdefault(name, {}).setdefault(value, set()).add(record_id)
+        self._index_keys.setdefault(record_id, []).append((name, value))
+
+    def _unindex(self, record_id: str) -> None:
+        for name, value in self._index_keys.pop(record_id, ()):
+            ids = self._indexes[name][value]
+            ids.discard(record_id)
+            if not ids:
+                del self._indexes[name][value]
+        self._unsettled.pop(record_id, None)
+        self._changes.pop(record_id, None)
+
+    def _mark_changed(self, record_id: str) -> None:
+        self._last_change += 1
+        self._changes.pop(record_id, None)
+        self._changes[record_id] = self._last_change
+
+    def _settle(self) -> None:
+        # the records updated since the last query get a new change number,
+        # the records completed since the last query are indexed and not checked
+        # anymore: a record is complete only when nothing more can be received
+        # (the end of an HTTP/2 stream, see HTTP2Record.end)
+        for record_id, version in list(self._unsettled.items()):
+            record = self.requests.get(record_id)
+            if record is None:
+                del self._unsettled[record_id]
+                continue
+            if record.version != version:
+                self._unsettled[record_id] = record.version
+                self._mark_changed(record_id)
+            if record.complete:
+                self._add_to_index(record_id, "netloc", record.netloc)
+                self._add_to_index(record_id, "method", record.method.upper())
+                if record.status_code:
+                    self._add_to_index(
+                        record_id, "status", status_class(record.status_code)
+                    )
+                del self._unsettled[record_id]
+
+    def changes(self, since: int = 0) -> tuple[list[HTTPRecord], int]:
+        """The records created or updated after a cursor, and the new cursor."""
+        with self._lock:
+            self._settle()
+            changed = []
+            for record_id in reversed(self._changes):
+                if self._changes[record_id] <= since:
+                    break
+                changed.append(self.requests[record_id])
+            cursor = self._last_change
+        changed.sort(key=lambda record: (record.tbegin, record.seq))
+        return changed, cursor
+
+    def select(self, query: RecordQuery) -> list[HTTPRecord]:
+        """All the records matching the criteria of the query, sorted."""
+        with self._lock:
+            self._settle()
+            candidates: Union[set[str], None] = None
+            # the most selective index first
+            indexed = sorted(
+                query.indexed.items(),
+                key=lambda item: len(self._indexes.get(item[0], {}).get(item[1], ())),
+            )
+            for name, value in indexed:
+                ids = self._indexes.get(name, {}).get(value, set())
+                if name in ("netloc", "method", "status"):
+                    ids = ids | set(self._unsettled)
+                candidates = set(ids) if candidates is None else candidates & ids
+            if candidates is None:
+                lo, hi = 0, len(self._ordered)
+                if query.since is not None:
+                    lo = bisect.bisect_left(self._ordered_keys, (query.since, 0))
+                if query.until is not None:
+                    hi = bisect.bisect_right(
+                        self._ordered_keys, (query.until, sys.maxsize)
+                    )
+                selected = self._ordered[lo:hi]
+            else:
+                selected = [
+                    self.requests[id] for id in candidates if id in self.requests
+                ]
+                selected.sort(key=lambda record: (record.tbegin, record.seq))
+
+        selected = [record for record in selected if query.match(record)]
+        selected.sort(key=query.sort_key, reverse=query.descending)
+        return selected
+
+    def query(self, **criteria) -> list[HTTPRecord]:
+        """The records matching the criteria (see RecordQuery), sorted and paginated."""
+        query = RecordQuery(**criteria)
+        return query.page(self.select(query))
+
+    def merge(self, other: "HTTPRecords") -> None:
+        """Add (or update) the records of another process."""
+        used: set[str] = set()
+        for record in list(other.requests.values()):
+            previous = self.requests.get(record.id)
+            if previous is None:
+                if (
+                    self._evicted_until is not None
+                    and record.tbegin <= self._evicted_until
+                ):
+                    continue
+            elif previous.version == record.version:
+                continue  # unchanged since the last dump
+            self._index(record)
+            used.add(record.initiator_id)
+            used.add(record.group_id)
+        # only those of the records merged: not those of the evicted records
+        for key in used:
+            if key in other.initiators:
+                self.initiators[key] = other.initiators[key]
+            if key in other.groups:
+                self.groups[key] = other.groups[key]
+        # the dumps of a subprocess have the same session (cumulative counters)
+        self.sampling.merge(other.session.id, other.sampling)
+
+    def apply_retention(self, force: bool = False) -> int:
+        """Evict the oldest records if a limit of the retention policy is exceeded."""
+        retention = self.retention
+        if not retention.enabled:
+            return 0
+
+        full_check = retention.due() or force
+        with self._lock:
+            nb = 0
+            if retention.max_records:
+                # in batches: the records are removed from the start of a list
+                over = len(self._ordered) - retention.max_records
+                if over > retention.max_records // 10:
+                    nb = over
+            if full_check and retention.max_age:
+                limit = datetime.datetime.now(
+                    datetime.timezone.utc
+                ) - datetime.timedelta(seconds=retention.max_age)
+                nb = max(nb, bisect.bisect_left(self._ordered_keys, (limit, 0)))
+            if full_check and retention.max_bytes:
+                size = sum(record.size for record in self._ordered)
+                oldest = 0
+                while size > retention.max_bytes and oldest < len(self._ordered):
+                    size -= self._ordered[oldest].size
+                    oldest += 1
+                nb = max(nb, oldest)
+            evicted = self._evict_oldest(nb)
+        retention.evicted += evicted
+
+        if full_check:
+            self._remove_orphans()
+
+        return evicted
+
+    def evict(self, before: Union[datetime.datetime, None] = None) -> int:
+        """Evict all the records, or only those started before a date."""
+        with self._lock:
+            nb = len(self._ordered)
+            if before is not None:
+                nb = bisect.bisect_left(self._ordered_keys, (before, 0))
+            evicted = self._evict_oldest(nb)
+        self._remove_orphans()
+        return evicted
+
+    def _evict_oldest(self, nb: int) -> int:
+        if nb <= 0:
+            return 0
+        evicted = self._ordered[:nb]
+        del self._ordered[:nb]
+        del self._ordered_keys[:nb]
+        for record in evicted:
+            self.requests.pop(record.id, None)
+            self._unindex(record.id)
+            self._orphans.add(record.initiator_id)
+            self._orphans.add(record.group_id)
+        if self._evicted_until is None or self._evicted_until < evicted[-1].tbegin:
+            self._evicted_until = evicted[-1].tbegin
+        return nb
+
+    def _remove_orphans(self) -> None:
+        if not self._orphans:
+            return
+        with self._lock:
+            orphans, self._orphans = self._orphans, set()
+        for record in self:
+            orphans.discard(record.initiator_id)
+            orphans.discard(record.group_id)
+        in_use = self._open | set(self._initiator_aliases.values())
+        # an open initiator or group may still be used by a new record
+        with self._lock:
+            self._orphans.update(orphans & in_use)
+        for orphan in orphans - in_use:
+            initiator = self.initiators.pop(orphan, None)
+            if initiator is not None:
+                key = initiator.key
+                if self._interned_initiators.get(key) is initiator:
+                    del self._interned_initiators[key]
+            self.groups.pop(orphan, None)
+
+    def intern_initiator(self, initiator: Initiator) -> Initiator:
+        """Return the initiator already recorded for the same call site, if any."""
+        interned_id = self._initiator_aliases.get(initiator.id)
+        if interned_id is not None and interned_id in self.initiators:
+            return self.initiators[interned_id]
+        interned = self._interned_initiators.setdefault(initiator.key, initiator)
+        if interned is not initiator:
+            if initiator.id in self._open:
+                self._initiator_aliases[initiator.id] = interned.id
+            else:
+                # already closed (an exception recorded after the call)
+                self.initiators.pop(initiator.id, None)
+        initiator.attached = True
+        interned.attached = True
+        return interned
+
+    def close_initiator(self, initiator: Initiator, group: Group) -> None:
+        interned_id = self._initiator_aliases.pop(initiator.id, None)
+        self._open.discard(initiator.id)
+        if initiator.call is not None:
+            if initiator.attached:
+                # the records keep the arguments of the call, not the shared initiator
+                initiator.call.materialize()
+                initiator.call = None
+            else:
+                initiator.call.release()
+        interned = self.initiators.get(interned_id) if interned_id else None
+        if interned is not None:
+            # the initiator of the same call site is used instead, this one is dropped
+            initiator.release()
+            self.initiators.pop(initiator.id, None)
+            if group.initiator is initiator:
+                group.initiator = interned
+        elif initiator.attached:
+            initiator.materialize()
+        else:
+            # nothing has been recorded, the initiator is never rendered
+            initiator.release()
+            self.initiators.pop(initiator.id, None)
+            if group.initiator is initiator:
+                self.groups.pop(group.id, None)
+
+    def connections_summary(self) -> dict[str, dict[str, int]]:
+        """For each netloc, the number of connections opened and of requests sent.
+
+        Many connections for a few requests means the connections are not reused
+        (for example, requests.get called without a Session).
+        """
+        summary: dict[str, dict[str, int]] = {}
+        connections: set[str] = set()
+        for record in self:  # a copy: the hooks may add records meanwhile
+            if not (record.is_client and record.connection_id):
+                continue
+            stats = summary.setdefault(record.netloc, {"connections": 0, "requests": 0})
+            stats["requests"] += 1
+            if record.connection_id not in connections:
+                connections.add(record.connection_id)
+                stats["connections"] += 1
+        return summary
+
+    def current_call_site(self) -> Hashable:
+        """The call site of the current initiator, or of the caller if there is none.
+
+        Nothing is rendered: it is used to sample the requests before the
+        initiator is created (see SamplingPolicy).
+        """
+        initiator = (
+            self.initiators.get(self.current_initiator)
+            if self.current_initiator
+            else None
+        )
+        if initiator is not None:
+            return initiator.key
+        return call_site(get_frames(2))
+
     def add_initiator(self, initiator: Initiator):
         self.initiators[initiator.id] = initiator
+        self._open.add(initiator.id)
         self.current_initiator = initiator.id
 
     def add_group(self, group: Group):
         self.groups[group.id] = group
+        self._open.add(group.id)
         self.current_group = group.id
 
+    def close_group(self, group: Group):
+        self._open.discard(group.id)
+
     @property
     def ignore(self) -> tuple[tuple[str, int], ...]:
         return self._ignore
@@ -85,6 +592,44 @@ class HTTPRecords:
         self._ignore = value
         self._tracerhttp1.ignore = value
 
+    @property
+    def max_body_size(self) -> int:
+        """The maximum number of bytes retained for a body (0 means no limit)."""
+        return self._max_body_size
+
+    @max_body_size.setter
+    def max_body_size(self, value: int) -> None:
+        self._max_body_size = value
+        self._tracerhttp2.max_body_size = value
+
+    @property
+    def sampling(self) -> SamplingPolicy:
+        return self._sampling
+
+    @sampling.setter
+    def sampling(self, value: SamplingPolicy) -> None:
+        self._sampling = value
+        self._tracerhttp2.sampling = value
+
+    @property
+    def ingestion(self) -> IngestionQueue:
+        return self._ingestion
+
+    @ingestion.setter
+    def ingestion(self, value: IngestionQueue) -> None:
+        self._ingestion.flush()
+        self._ingestion = value
+        self._tracerhttp1.ingestion = value
+
+    @property
+    def store(self) -> RecordStore:
+        return self._store
+
+    @store.setter
+    def store(self, value: RecordStore) -> None:
+        self._store.flush()
+        self._store = value
+
     def _print_for_debug(self):
         for request in self.requests.values():
             print(f"+ {request.url}")
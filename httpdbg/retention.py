@@ -0,0 +1,51 @@
+import time
+
+
+class RetentionPolicy:
+    """Limit the memory used by the records of a long-running session.
+
+    The oldest records are evicted as soon as one of the enabled limits is exceeded:
+      - max_records: the number of records,
+      - max_bytes: the size of the headers and bodies retained for the records,
+      - max_age: the age of the records, in seconds.
+
+    0 means no limit. The number of records is checked each time a record is added,
+    the size and the age at most once per second. The records exceeding
+    max_records are evicted in batches, once they are more than 10% of the limit.
+    """
+
+    CHECK_DELAY = 1.0
+
+    def __init__(
+        self, max_records: int = 0, max_bytes: int = 0, max_age: float = 0
+    ) -> None:
+        self.max_records: int = max_records
+        self.max_bytes: int = max_bytes
+        self.max_age: float = max_age
+        self.reset()
+
+    def reset(self) -> None:
+        self.evicted: int = 0
+        self._last_check: float = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_records or self.max_bytes or self.max_age)
+
+    def due(self) -> bool:
+        """The size and the age must be checked."""
+        now = time.monotonic()
+        if now - self._last_check >= RetentionPolicy.CHECK_DELAY:
+            self._last_check = now
+            return True
+        return False
+
+    def to_args(self) -> dict:
+        return {
+            "max_records": self.max_records,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+        }
+
+    def to_json(self) -> dict:
+        return {"enabled": self.enabled, **self.to_args(), "evicted": self.evicted}
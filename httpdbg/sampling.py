@@ -0,0 +1,113 @@
+from collections.abc import Hashable
+import threading
+import time
+
+
+class SamplingPolicy:
+    """Decide, before anything is recorded, if a new request must be kept.
+
+    A request is kept only if all the enabled rules agree:
+      - every: keep 1 request in N,
+      - rate: keep at most N requests per second for each netloc,
+      - first: keep only the first N requests for each call site (see Initiator.key).
+
+    The requests sampled out are still counted, with those of the subprocesses
+    (see merge).
+    """
+
+    def __init__(self, every: int = 0, rate: float = 0, first: int = 0) -> None:
+        self.every: int = every
+        self.rate: float = rate
+        self.first: int = first
+        self._lock: threading.Lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.seen: int = 0
+        self.sampled_out: int = 0
+        self.sampled_out_by_netloc: dict[str, int] = {}
+        self._tokens_by_netloc: dict[str, tuple[float, float]] = {}
+        self._kept_by_site: dict[Hashable, int] = {}
+        # the last counters of each subprocess: seen, sampled out, by netloc
+        self._processes: dict[str, tuple[int, int, dict[str, int]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.every or self.rate or self.first)
+
+    def keep(self, netloc: str, call_site: Hashable) -> bool:
+        if not self.enabled:
+            return True
+
+        with self._lock:
+            self.seen += 1
+            keep = True
+
+            if self.every:
+                keep = (self.seen - 1) % self.every == 0
+
+            if keep and self.rate:
+                # token bucket: a burst of max(1, rate) requests is allowed
+                now = time.monotonic()
+                burst = max(1.0, self.rate)
+                tokens, last = self._tokens_by_netloc.get(netloc, (burst, now))
+                tokens = min(burst, tokens + (now - last) * self.rate)
+                keep = tokens >= 1.0
+                self._tokens_by_netloc[netloc] = (tokens - 1.0 if keep else tokens, now)
+
+            if keep and self.first:
+                kept = self._kept_by_site.get(call_site, 0)
+                keep = kept < self.first
+                if keep:
+                    self._kept_by_site[call_site] = kept + 1
+
+            if not keep:
+                self.sampled_out += 1
+                self.sampled_out_by_netloc[netloc] = (
+                    self.sampled_out_by_netloc.get(netloc, 0) + 1
+                )
+
+        return keep
+
+    def merge(self, source: str, other: "SamplingPolicy") -> None:
+        """Count the requests of a subprocess (its counters replace the previous ones)."""
+        with self._lock:
+            self._processes[source] = (
+                other.seen,
+                other.sampled_out,
+                dict(other.sampled_out_by_netloc),
+            )
+
+    def to_args(self) -> dict:
+        return {"every": self.every, "rate": self.rate, "first": self.first}
+
+    def to_json(self) -> dict:
+        with self._lock:
+            seen = self.seen
+            sampled_out = self.sampled_out
+            by_netloc = dict(self.sampled_out_by_netloc)
+            for (
+                process_seen,
+                process_sampled_out,
+                process_by_netloc,
+            ) in self._processes.values():
+                seen += process_seen
+                sampled_out += process_sampled_out
+                for netloc, nb in process_by_netloc.items():
+                    by_netloc[netloc] = by_netloc.get(netloc, 0) + nb
+        return {
+            "enabled": self.enabled,
+            "seen": seen,
+            "sampled_out": sampled_out,
+            "sampled_out_by_netloc": by_netloc,
+        }
+
+    def __getstate__(self) -> dict:
+        # the lock can't be pickled (multiprocess dump)
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -1,11 +1,13 @@
 from contextlib import contextmanager
 from http.server import HTTPServer
+import queue
 import threading
 from typing import Generator
 
 from httpdbg.exception import HttpdbgException
 from httpdbg.records import HTTPRecords
 from httpdbg.webapp import HttpbgHTTPRequestHandler
+from httpdbg.webapp.events import EventHub
 
 
 @contextmanager
@@ -30,15 +32,57 @@ def httpdbg_srv(host: str, port: int) -> Generator[HTTPRecords, None, None]:
         raise ex
 
 
+class ThreadPoolHTTPServer(HTTPServer):
+    """An HTTP server with a bounded pool of threads.
+
+    Each thread serves a connection (kept alive) at a time. The connections are
+    queued if all the threads are busy.
+    """
+
+    def __init__(self, *args, max_workers: int = 16, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._connections: queue.Queue = queue.Queue()
+        # not a ThreadPoolExecutor: its submit method is hooked by httpdbg
+        self._workers: list[threading.Thread] = []
+        for i in range(max_workers):
+            worker = threading.Thread(
+                target=self._serve_connections, name=f"httpdbg-ui-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address) -> None:
+        self._connections.put((request, client_address))
+
+    def _serve_connections(self) -> None:
+        while True:
+            connection = self._connections.get()
+            if connection is None:
+                return
+            request, client_address = connection
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        for _ in self._workers:
+            self._connections.put(None)
+
+
 class ServerThread(threading.Thread):
     def __init__(self, host: str, port: int, records: HTTPRecords) -> None:
         threading.Thread.__init__(self)
         self.port = port
+        self.events = EventHub(records)
 
         def http_request_handler(*args, **kwargs):
-            HttpbgHTTPRequestHandler(records, *args, **kwargs)
+            HttpbgHTTPRequestHandler(records, *args, events=self.events, **kwargs)
 
-        self.srv = HTTPServer((host, port), http_request_handler)
+        self.srv = ThreadPoolHTTPServer((host, port), http_request_handler)
         records.ignore += (
             (str(self.srv.server_address[0]), self.srv.server_address[1]),
         )
@@ -47,4 +91,6 @@ class ServerThread(threading.Thread):
         self.srv.serve_forever()
 
     def shutdown(self):
+        self.events.close()
         self.srv.shutdown()
+        self.srv.server_close()
@@ -0,0 +1,458 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+from typing import Union
+
+from httpdbg.log import logger
+from httpdbg.query import RecordQuery
+
+if TYPE_CHECKING:
+    from httpdbg.hooks.record import HTTPRecord
+    from httpdbg.records import HTTPRecords
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    command_line TEXT,
+    tbegin REAL
+);
+CREATE TABLE IF NOT EXISTS initiators (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    label TEXT,
+    json TEXT
+);
+CREATE TABLE IF NOT EXISTS groups (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    label TEXT,
+    json TEXT
+);
+CREATE TABLE IF NOT EXISTS requests (
+    id TEXT PRIMARY KEY,
+    session_id TEXT,
+    seq INTEGER,
+    tbegin REAL,
+    initiator_id TEXT,
+    group_id TEXT,
+    tag TEXT,
+    netloc TEXT,
+    url TEXT,
+    method TEXT,
+    status_code INTEGER,
+    duration REAL,
+    summary TEXT,
+    details TEXT,
+    request_body BLOB,
+    response_body BLOB
+);
+CREATE INDEX IF NOT EXISTS requests_by_tbegin ON requests (session_id, tbegin, seq);
+CREATE INDEX IF NOT EXISTS requests_by_initiator ON requests (initiator_id);
+CREATE INDEX IF NOT EXISTS requests_by_group ON requests (group_id);
+CREATE INDEX IF NOT EXISTS requests_by_netloc ON requests (session_id, netloc);
+CREATE INDEX IF NOT EXISTS requests_by_status ON requests (session_id, status_code);
+CREATE INDEX IF NOT EXISTS requests_by_tag ON requests (session_id, tag);
+CREATE TABLE IF NOT EXISTS headers (
+    request_id TEXT,
+    response INTEGER,
+    position INTEGER,
+    name TEXT,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS headers_by_request ON headers (request_id);
+CREATE INDEX IF NOT EXISTS headers_by_name ON headers (name);
+"""
+
+# all the columns of a request, except the bodies
+_REQUEST_COLUMNS = (
+    "id",
+    "session_id",
+    "seq",
+    "tbegin",
+    "initiator_id",
+    "group_id",
+    "tag",
+    "netloc",
+    "url",
+    "method",
+    "status_code",
+    "duration",
+    "summary",
+    "details",
+)
+
+_UPSERT_REQUEST = (
+    f"INSERT INTO requests ({', '.join(_REQUEST_COLUMNS)})"
+    f" VALUES ({', '.join('?' for _ in _REQUEST_COLUMNS)})"
+    " ON CONFLICT (id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in _REQUEST_COLUMNS[1:])
+)
+
+
+class RecordStore:
+    """Save the records in a SQLite database, in WAL mode.
+
+    The hooks only add the new records to a pending list. A background thread
+    writes them by batches, and writes them again each time they are updated, until
+    they are complete (or not updated for IDLE_DELAY seconds). The bodies are
+    written only once, when the record is complete (or idle, or on a flush): a
+    long download is not written again at each update. Each batch is committed:
+    the records already written survive a crash of the process.
+
+    The records are kept in the database even if they are evicted from the memory
+    (see RetentionPolicy). An empty path disables the store.
+    """
+
+    FLUSH_DELAY = 0.5
+    IDLE_DELAY = 60.0
+
+    def __init__(self, path: str = "", batch_size: int = 500) -> None:
+        self.path: str = path
+        self.batch_size: int = batch_size
+        self._lock: threading.Lock = threading.Lock()
+        self._init_worker()
+        self.reset()
+
+    def _init_worker(self) -> None:
+        self._pending: dict[str, tuple["HTTPRecords", "HTTPRecord"]] = {}
+        self._flushes: list[threading.Event] = []
+        self._wakeup: threading.Event = threading.Event()
+        self._worker: Union[threading.Thread, None] = None
+        # a connection to read the database, opened once by each thread (web server)
+        self._readers: threading.local = threading.local()
+        self._schema: bool = False
+
+    def reset(self) -> None:
+        self.flush()
+        self.written: int = 0
+        self.batches: int = 0
+        self.errors: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def save(self, records: "HTTPRecords", record: "HTTPRecord") -> None:
+        with self._lock:
+            self._pending[record.id] = (records, record)
+        self._start_worker()
+
+    def _start_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run, name="httpdbg-store", daemon=True
+                    )
+                    self._worker.start()
+                    atexit.register(self.flush, 5.0)
+
+    def _create_schema(self, connection: sqlite3.Connection) -> None:
+        # once: the WAL mode is kept by the database file
+        with self._lock:
+            if not self._schema:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(_SCHEMA)
+                self._schema = True
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema(connection)
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """The connection of the current thread to read the database."""
+        connection = getattr(self._readers, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            self._create_schema(connection)
+            self._readers.connection = connection
+        return connection
+
+    def _run(self) -> None:
+        # the records written, until they are complete: id -> (records, record, version)
+        watched: dict[str, tuple["HTTPRecords", "HTTPRecord", int]] = {}
+        connection = self._connect()
+        while True:
+            self._wakeup.wait(RecordStore.FLUSH_DELAY)
+            self._wakeup.clear()
+
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                flushes, self._flushes = self._flushes, []
+
+            for records, record in pending.values():
+                watched[record.id] = (records, record, -1)
+
+            now = time.time()
+            # (records, record, with the bodies)
+            batch: list[tuple["HTTPRecords", "HTTPRecord", bool]] = []
+            for record_id, (records, record, version) in list(watched.items()):
+                final = record.complete or (
+                    now - record.updated > RecordStore.IDLE_DELAY
+                )
+                if record.version != version or final or flushes:
+                    batch.append((records, record, final or bool(flushes)))
+                if final:
+                    del watched[record_id]
+                else:
+                    watched[record_id] = (records, record, record.version)
+
+            for i in range(0, len(batch), self.batch_size):
+                try:
+                    with connection:
+                        self._write(connection, batch[i : i + self.batch_size])
+                    self.batches += 1
+                except Exception:
+                    self.errors += 1
+                    logger().exception("store - the records can't be saved")
+
+            for done in flushes:
+                done.set()
+
+    def _write(
+        self,
+        connection: sqlite3.Connection,
+        batch: list[tuple["HTTPRecords", "HTTPRecord", bool]],
+    ) -> None:
+        from httpdbg.webapp.api import RequestPayload
+        from httpdbg.webapp.api import request_summary
+
+        sessions = {}
+        initiators = {}
+        groups = {}
+
+        for records, record, with_bodies in batch:
+            session = records.session
+            sessions[session.id] = session
+
+            initiator = records.initiators.get(record.initiator_id)
+            if initiator is not None:
+                initiators[initiator.id] = (session.id, initiator)
+            group = records.groups.get(record.group_id)
+            if group is not None:
+                groups[group.id] = (session.id, group)
+
+            connection.execute(
+                _UPSERT_REQUEST,
+                (
+                    record.id,
+                    session.id,
+                    record.seq,
+                    record.tbegin.timestamp(),
+                    record.initiator_id,
+                    record.group_id,
+                    record.tag,
+                    record.netloc,
+                    record.url,
+                    record.method,
+                    record.status_code,
+                    record.timing.duration or 0,
+                    json.dumps(request_summary(record)),
+                    json.dumps(record, cls=RequestPayload),
+                ),
+            )
+            if with_bodies:
+                connection.execute(
+                    "UPDATE requests SET request_body = ?, response_body = ?"
+                    " WHERE id = ?",
+                    (record.request.content, record.response.content, record.id),
+                )
+
+            connection.execute("DELETE FROM headers WHERE request_id = ?", (record.id,))
+            connection.executemany(
+                "INSERT INTO headers VALUES (?, ?, ?, ?, ?)",
+                [
+                    (record.id, response, position, header.name.lower(), header.value)
+                    for response, reqresp in enumerate(
+                        (record.request, record.response)
+                    )
+                    for position, header in enumerate(reqresp.headers)
+                ],
+            )
+
+            self.written += 1
+
+        connection.executemany(
+            "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?)",
+            [
+                (session.id, session.command_line, session.tbegin.timestamp())
+                for session in sessions.values()
+            ],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO initiators VALUES (?, ?, ?, ?)",
+            [
+                (
+                    initiator.id,
+                    session_id,
+                    initiator.label,
+                    json.dumps(initiator.to_json()),
+                )
+                for session_id, initiator in initiators.values()
+            ],
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO groups VALUES (?, ?, ?, ?)",
+            [
+                (group.id, session_id, group.label, json.dumps(group.to_json()))
+                for session_id, group in groups.values()
+            ],
+        )
+
+    def flush(self, timeout: Union[float, None] = None) -> bool:
+        """Wait until all the records already saved have been written."""
+        if self._worker is None:
+            return True  # nothing has been saved
+        done = threading.Event()
+        with self._lock:
+            self._flushes.append(done)
+        self._wakeup.set()
+        self._start_worker()
+        return done.wait(timeout)
+
+    def count(self, session_id: str, query: Union[RecordQuery, None] = None) -> int:
+        where, parameters = self._where(session_id, query or RecordQuery())
+        row = (
+            self._reader()
+            .execute(f"SELECT COUNT(*) FROM requests WHERE {where}", parameters)
+            .fetchone()
+        )
+        return row[0]
+
+    def list_requests(
+        self, session_id: str, query: Union[RecordQuery, None] = None
+    ) -> dict:
+        """The summary of the requests matching the query, sorted and paginated."""
+        query = query or RecordQuery()
+        where, parameters = self._where(session_id, query)
+        direction = "DESC" if query.descending else "ASC"
+        order = f"{query.sort} {direction}, tbegin, seq"
+        if query.sort == "tbegin":
+            order = f"tbegin {direction}, seq {direction}"
+        rows = (
+            self._reader()
+            .execute(
+                f"SELECT summary FROM requests WHERE {where}"
+                f" ORDER BY {order} LIMIT ? OFFSET ?",
+                parameters + [query.limit if query.limit else -1, query.offset],
+            )
+            .fetchall()
+        )
+        requests = [json.loads(summary) for summary, in rows]
+        return {request["id"]: request for request in requests}
+
+    @staticmethod
+    def _where(session_id: str, query: RecordQuery) -> tuple[str, list]:
+        clauses = ["session_id = ?"]
+        parameters: list = [session_id]
+        for column, value in (
+            ("netloc", query.netloc),
+            ("UPPER(method)", query.method),
+            ("initiator_id", query.initiator),
+            ("group_id", query.group),
+            ("tag", query.tag),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                parameters.append(value)
+        if query.status_code is not None:
+            clauses.append("status_code = ?")
+            parameters.append(query.status_code)
+        elif query.status == "error":
+            clauses.append("status_code < 0")
+        elif query.status is not None:
+            first = int(query.status[0]) * 100
+            clauses.append("status_code BETWEEN ? AND ?")
+            parameters += [max(first, 1), first + 99]
+        if query.since is not None:
+            clauses.append("tbegin >= ?")
+            parameters.append(query.since.timestamp())
+        if query.until is not None:
+            clauses.append("tbegin <= ?")
+            parameters.append(query.until.timestamp())
+        return " AND ".join(clauses), parameters
+
+    def get_request(self, request_id: str) -> Union[dict, None]:
+        row = (
+            self._reader()
+            .execute("SELECT details FROM requests WHERE id = ?", (request_id,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def get_content(
+        self, request_id: str, response: bool
+    ) -> Union[tuple[bytes, str], None]:
+        """The body of the request (or the response), and its content type."""
+        column = "response_body" if response else "request_body"
+        connection = self._reader()
+        row = connection.execute(
+            f"SELECT {column} FROM requests WHERE id = ?", (request_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        content_type = connection.execute(
+            "SELECT value FROM headers WHERE request_id = ? AND response = ?"
+            " AND name = 'content-type' ORDER BY position LIMIT 1",
+            (request_id, int(response)),
+        ).fetchone()
+        return row[0] or b"", content_type[0] if content_type else ""
+
+    def get_initiators(self, ids: list[str]) -> dict[str, dict]:
+        return self._get_json("initiators", ids)
+
+    def get_groups(self, ids: list[str]) -> dict[str, dict]:
+        return self._get_json("groups", ids)
+
+    def _get_json(self, table: str, ids: list[str]) -> dict[str, dict]:
+        ids = list(set(ids))
+        found = {}
+        connection = self._reader()
+        # the number of parameters of a query is limited
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            rows = connection.execute(
+                f"SELECT id, json FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            found.update({id: json.loads(content) for id, content in rows})
+        return found
+
+    def to_args(self) -> dict:
+        return {"path": self.path, "batch_size": self.batch_size}
+
+    def to_json(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+    def __getstate__(self) -> dict:
+        # the lock and the thread can't be pickled (multiprocess dump)
+        state = self.__dict__.copy()
+        for name in (
+            "_lock",
+            "_pending",
+            "_flushes",
+            "_wakeup",
+            "_worker",
+            "_readers",
+            "_schema",
+        ):
+            del state[name]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._init_worker()
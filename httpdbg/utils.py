@@ -1,6 +1,10 @@
+from collections import OrderedDict
+from collections.abc import Hashable
 from http.cookies import SimpleCookie
 import secrets
 import string
+import threading
+from typing import Any
 
 
 def get_new_uuid() -> str:
@@ -8,22 +12,94 @@ def get_new_uuid() -> str:
     return "".join(secrets.choice(string.ascii_letters) for i in range(10))
 
 
-def chunked_to_bytes(chunked: bytes) -> bytes:
-    data = bytes()
-    try:
-        b1 = 0
-        while b1 < len(chunked):
-            sep = chunked[b1:].find(b"\r\n")
-            size = int(chunked[b1 : b1 + sep], 16)
-            data += chunked[b1 + sep + 2 : b1 + sep + 2 + size]
-            b1 = b1 + sep + 2 + size + 2
-        return data
-    except Exception:
-        # the chunked data can be incomplete or malformated
-        return bytes()
+class HTTPDBGBuffer(object):
+    """Append-only buffer. The bytes are materialized only when read.
+
+    The value is not cached: a copy kept with the buffer would double the memory
+    used by each body read once (UI, store). Use len() or a slice if possible.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: bytes = b"") -> None:
+        self._data: bytearray = bytearray(data)
+
+    def append(self, data: bytes) -> None:
+        if data:
+            self._data += data
+
+    def clear(self) -> None:
+        self._data = bytearray()
+
+    def getvalue(self) -> bytes:
+        return bytes(self._data)
+
+    def find(self, sub: bytes, start: int = 0) -> int:
+        return self._data.find(sub, start)
+
+    def __getitem__(self, key: slice) -> bytes:
+        return bytes(self._data[key])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __bool__(self) -> bool:
+        return len(self._data) > 0
+
+    def __getstate__(self) -> dict:
+        return {"_data": self._data}
+
+    def __setstate__(self, state: dict) -> None:
+        self._data = state["_data"]
+
+
+class LRUCache(object):
+    """Least recently used cache, bounded by a number of entries and a total size."""
+
+    def __init__(self, max_entries: int, max_size: int) -> None:
+        self.max_entries: int = max_entries
+        self.max_size: int = max_size
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.size: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, size: int) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self.size > self.max_size
+            ):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
 
 class HTTPDBGCookie(object):
+    __slots__ = ("name", "value", "attributes")
+
     def __init__(self, name: str, value: str = None, attributes: list = None) -> None:
         self.name = name
         self.value = value
@@ -53,6 +129,8 @@ class HTTPDBGCookie(object):
 
 
 class HTTPDBGHeader(object):
+    __slots__ = ("name", "value")
+
     def __init__(self, name: str, value: str = ""):
         self.name = name
         self.value = value
@@ -3,6 +3,7 @@ import traceback
 from typing import Any
 from typing import Union
 
+from httpdbg.query import RecordQuery
 from httpdbg.records import HTTPRecords
 from httpdbg.records import HTTPRecord
 
@@ -23,17 +24,28 @@ class RequestPayload(JSONEncoder):
             "exception": None,
             "tag": req.tag,
             "initiator_id": req.initiator_id,
+            "call": req.call.text if req.call is not None else "",
             "group_id": req.group_id,
             "in_progress": req.in_progress,
+            "incomplete": req.incomplete,
             "is_server": not req.is_client,
+            "timing": req.timing.to_json(),
+            "connection": {
+                "id": req.connection_id,
+                "sequence": req.connection_sequence,
+                "new": req.new_connection,
+            },
+            "overhead_ms": round(req.overhead_ns / 1_000_000, 3),
         }
 
         payload["request"] = {
             "headers": [header.to_json() for header in req.request.headers],
             "cookies": [cookie.to_json() for cookie in req.request.cookies],
+            "body_length": req.request.body_length,
+            "truncated": req.request.truncated,
         }
 
-        if req.request.content:
+        if req.request.has_content:
             payload["request"]["body"] = {
                 "path": f"/request/{req.id}/up",
                 "filename": "upload",
@@ -43,9 +55,11 @@ class RequestPayload(JSONEncoder):
         payload["response"] = {
             "headers": [header.to_json() for header in req.response.headers],
             "cookies": [cookie.to_json() for cookie in req.response.cookies],
+            "body_length": req.response.body_length,
+            "truncated": req.response.truncated,
         }
 
-        if req.response.content:
+        if req.response.has_content:
             payload["response"]["body"] = {
                 "path": f"/request/{req.id}/down",
                 "filename": "download",
@@ -65,6 +79,48 @@ class RequestPayload(JSONEncoder):
         return payload
 
 
+def request_details(records: HTTPRecords, req: HTTPRecord) -> dict[str, Any]:
+    """The details of a request, with the full stack of its initiator."""
+    payload = RequestPayload().default(req)
+    initiator = records.initiators.get(req.initiator_id)
+    if initiator is not None:
+        payload["initiator"] = initiator.to_json(full=True)
+    return payload
+
+
+def session_info(records: HTTPRecords) -> dict[str, Any]:
+    return {
+        "id": records.session.id,
+        "command_line": records.session.command_line,
+        "tbegin": records.session.tbegin.isoformat(),
+    }
+
+
+def request_summary(req: HTTPRecord) -> dict[str, Any]:
+    return {
+        "id": req.id,
+        "url": req.url,
+        "netloc": req.netloc,
+        "urlext": req.urlext,
+        "status_code": req.status_code,
+        "http100": req.http100,
+        "protocol": req.protocol,
+        "reason": req.reason,
+        "verb": req.method,
+        "tag": req.tag,
+        "initiator_id": req.initiator_id,
+        "call": req.call.text if req.call is not None else "",
+        "group_id": req.group_id,
+        "in_progress": req.in_progress,
+        "incomplete": req.incomplete,
+        "is_server": not req.is_client,
+        "tbegin": req.tbegin.isoformat(),
+        "last_update": req.last_update.isoformat(),
+        "version": req.version,
+        "duration": req.timing.duration,
+    }
+
+
 class RequestListPayload(JSONEncoder):
     def default(self, records: HTTPRecords):
         assert isinstance(
@@ -72,40 +128,93 @@ class RequestListPayload(JSONEncoder):
         ), "This encoder works only for HTTPRecords object."
 
         payload: dict[str, dict[str, Union[str, dict]]] = {
-            "session": {
-                "id": records.session.id,
-                "command_line": records.session.command_line,
-                "tbegin": records.session.tbegin.isoformat(),
-            },
+            "session": session_info(records),
             "requests": {},
             "initiators": {},
             "groups": {},
+            "sampling": records.sampling.to_json(),
         }
 
-        for id, req in records.requests.items():
-            payload["requests"][id] = {
-                "id": req.id,
-                "url": req.url,
-                "netloc": req.netloc,
-                "urlext": req.urlext,
-                "status_code": req.status_code,
-                "http100": req.http100,
-                "protocol": req.protocol,
-                "reason": req.reason,
-                "verb": req.method,
-                "tag": req.tag,
-                "initiator_id": req.initiator_id,
-                "group_id": req.group_id,
-                "in_progress": req.in_progress,
-                "is_server": not req.is_client,
-                "tbegin": req.tbegin.isoformat(),
-                "last_update": req.last_update.isoformat(),
-            }
-
-        for id, initiator in records.initiators.items():
-            payload["initiators"][id] = initiator.to_json(full=True)
+        for req in records:
+            payload["requests"][req.id] = request_summary(req)
+            # only the initiators of the requests, without their full stack (see
+            # request_details): the initiators still open are not rendered
+            if req.initiator_id not in payload["initiators"]:
+                initiator = records.initiators.get(req.initiator_id)
+                if initiator is not None:
+                    payload["initiators"][initiator.id] = initiator.to_json(full=False)
 
         for id, group in records.groups.items():
             payload["groups"][id] = group.to_json()
 
         return payload
+
+
+def requests_changes(records: HTTPRecords, since: int = 0) -> dict:
+    """The requests created or updated after a cursor, with their initiators and groups."""
+    changed, cursor = records.changes(since)
+
+    payload: dict[str, Any] = {
+        "session": session_info(records),
+        "since": since,
+        "cursor": cursor,
+        "requests": {},
+        "initiators": {},
+        "groups": {},
+        "sampling": records.sampling.to_json(),
+    }
+
+    for req in changed:
+        payload["requests"][req.id] = request_summary(req)
+        if req.initiator_id not in payload["initiators"]:
+            initiator = records.initiators.get(req.initiator_id)
+            if initiator is not None:
+                payload["initiators"][initiator.id] = initiator.to_json(full=False)
+        if req.group_id not in payload["groups"]:
+            group = records.groups.get(req.group_id)
+            if group is not None:
+                payload["groups"][group.id] = group.to_json()
+
+    return payload
+
+
+def requests_page(records: HTTPRecords, query: RecordQuery) -> dict:
+    """A page of the requests matching the query.
+
+    If the store is enabled, the requests are read from the database: it keeps the
+    requests evicted from the memory.
+    """
+    payload: dict[str, Any] = {
+        "session": session_info(records),
+        "offset": query.offset,
+        "limit": query.limit,
+        "total": 0,
+        "requests": {},
+        "initiators": {},
+        "groups": {},
+    }
+
+    if records.store.enabled:
+        store = records.store
+        payload["total"] = store.count(records.session.id, query)
+        payload["requests"] = store.list_requests(records.session.id, query)
+        summaries = payload["requests"].values()
+        payload["initiators"] = store.get_initiators(
+            [summary["initiator_id"] for summary in summaries]
+        )
+        payload["groups"] = store.get_groups(
+            [summary["group_id"] for summary in summaries]
+        )
+    else:
+        selected = records.select(query)
+        payload["total"] = len(selected)
+        for req in query.page(selected):
+            payload["requests"][req.id] = request_summary(req)
+            initiator = records.initiators.get(req.initiator_id)
+            if initiator is not None:
+                payload["initiators"][initiator.id] = initiator.to_json(full=False)
+            group = records.groups.get(req.group_id)
+            if group is not None:
+                payload["groups"][group.id] = group.to_json()
+
+    return payload
@@ -4,12 +4,22 @@ from http.server import BaseHTTPRequestHandler
 import json
 from pathlib import Path
 import re
+from typing import Union
 from urllib.parse import ParseResult
 from urllib.parse import parse_qs
 from urllib.parse import urlparse
 
 from httpdbg.log import logger
-from httpdbg.webapp.api import RequestListPayload, RequestPayload
+from httpdbg.query import RecordQuery
+from httpdbg.query import parse_datetime
+from httpdbg.webapp.api import request_details
+from httpdbg.webapp.api import requests_changes
+from httpdbg.webapp.api import requests_page
+from httpdbg.webapp.compression import MIN_SIZE
+from httpdbg.webapp.compression import compress
+from httpdbg.webapp.compression import compressible
+from httpdbg.webapp.compression import negotiate_encoding
+from httpdbg.webapp.events import EventHub
 from httpdbg.records import HTTPRecords
 
 
@@ -25,11 +35,21 @@ def silently_catch_error():
 
 
 class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
+    # the connections are kept alive, and closed if idle for 5s
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+    # the headers and the body are written separately: no delay between them
+    disable_nagle_algorithm = True
 
     def __init__(
-        self: "HttpbgHTTPRequestHandler", records: HTTPRecords, *args, **kwargs
+        self: "HttpbgHTTPRequestHandler",
+        records: HTTPRecords,
+        *args,
+        events: Union[EventHub, None] = None,
+        **kwargs,
     ):
         self.records = records
+        self.events = events
         super().__init__(*args, **kwargs)
 
     @silently_catch_error()
@@ -40,41 +60,70 @@ class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
         serve_funcs: list[Callable[[ParseResult], bool]] = [
             self.serve_static,
             self.serve_requests,
+            self.serve_connections,
+            self.serve_stats,
+            self.serve_events,
             self.serve_request,
             self.serve_request_content_up,
             self.serve_request_content_down,
             self.serve_not_found,
         ]
 
-        for serve in serve_funcs:
-            if serve(url):
-                break
+        try:
+            for serve in serve_funcs:
+                if serve(url):
+                    break
+        except Exception:
+            self.close_connection = True  # the response may be incomplete
+            raise
+
+    @silently_catch_error()
+    def do_DELETE(self):
+        url = urlparse(self.path)
+
+        try:
+            if url.path.lower() == "/requests":
+                self.clear_requests(url)
+            else:
+                self.serve_not_found(url)
+        except Exception:
+            self.close_connection = True  # the response may be incomplete
+            raise
+
+    def clear_requests(self, url: ParseResult):
+        query = parse_qs(url.query)
+
+        before = None
+        if "before" in query:
+            try:
+                before = parse_datetime(query["before"][0])
+            except ValueError:
+                return self.serve_bad_request(url, "before must be an ISO 8601 date")
+
+        evicted = self.records.evict(before)
+
+        self.send_json(json.dumps({"evicted": evicted}))
+
+        return True
 
     def serve_static(self, url: ParseResult):
 
         if url.path.lower() in ["/", "index.htm", "index.html"]:
             from httpdbg.export import generate_html
 
-            self.send_response(200)
-            self.send_header("content-type", "text/html")
-            self.send_header_no_cache()
-            self.end_headers()
-            self.wfile.write(
-                generate_html(self.records, for_export=False).encode("utf-8")
+            self.send_content(
+                200,
+                generate_html(self.records, for_export=False).encode("utf-8"),
+                "text/html",
             )
             return True
 
         if url.path.lower() == "favicon.ico":
-            self.send_response(200)
-            self.send_header("content-type", "image/x-icon")
-            self.send_header_no_cache()
-            self.end_headers()
-
             current_dir = Path(__file__).resolve().parent
 
             with open(Path(current_dir) / "static/favicon.ico") as f:
                 filecontent = f.read()
-                self.wfile.write(filecontent.encode("utf-8"))
+                self.send_content(200, filecontent.encode("utf-8"), "image/x-icon")
 
             return True
 
@@ -86,20 +135,96 @@ class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
 
         query = parse_qs(url.query)
 
+        if any(name in query for name in RecordQuery.PARAMETERS):
+            return self.serve_requests_page(url, query)
+
+        since = 0
+        # the cursor of a client is valid only for the session it has been built for
         if query.get("id", [""])[0] == self.records.session.id:
-            self.records.requests_already_loaded = int(
-                query.get("requests_already_loaded", [0])[0]
-            )
-        else:
-            self.records.requests_already_loaded = 0
+            try:
+                since = max(0, int(query.get("since", [0])[0]))
+            except ValueError:
+                return self.serve_bad_request(url, "since must be an integer")
+            if "client" in query:
+                self.records.mark_loaded(query["client"][0], since)
+
+        self.send_json(json.dumps(requests_changes(self.records, since)))
+
+        return True
+
+    def serve_requests_page(self, url: ParseResult, query: dict[str, list[str]]):
+        try:
+            record_query = RecordQuery.from_query_string(query)
+        except ValueError as ex:
+            return self.serve_bad_request(url, str(ex))
+
+        self.send_json(json.dumps(requests_page(self.records, record_query)))
+
+        return True
+
+    def serve_connections(self, url: ParseResult):
+        if not (url.path.lower() == "/connections"):
+            return False
+
+        self.send_json(json.dumps(self.records.connections_summary()))
+
+        return True
+
+    def serve_stats(self, url: ParseResult):
+        if not (url.path.lower() == "/stats"):
+            return False
+
+        stats = self.records.stats.to_json()
+        stats["ingestion"] = self.records.ingestion.to_json()
+        stats["retention"] = self.records.retention.to_json()
+        stats["store"] = self.records.store.to_json()
+        self.send_json(json.dumps(stats))
+
+        return True
+
+    def serve_events(self, url: ParseResult):
+        if not (url.path.lower() == "/events"):
+            return False
+
+        if self.events is None:
+            return self.serve_not_found(url)
+
+        subscriber = self.events.subscribe()
+        if subscriber is None:
+            # the client polls the changes instead
+            self.send_content(503, b"503 Service Unavailable - too many streams")
+            return True
 
+        # no Content-Length: the stream ends when the connection is closed
         self.send_response(200)
-        self.send_header("Content-type", "application/json")
+        self.send_header("Content-type", "text/event-stream")
+        self.send_header("Connection", "close")
         self.send_header_no_cache()
         self.end_headers()
-        self.wfile.write(
-            json.dumps(self.records, cls=RequestListPayload).encode("utf-8")
-        )
+
+        # a client that doesn't read the stream anymore is disconnected
+        self.connection.settimeout(EventHub.HEARTBEAT * 2)
+        self.close_connection = True
+
+        try:
+            # the browser reconnects after 1s if the stream is closed
+            self.wfile.write(b"retry: 1000\n\n")
+            self.wfile.flush()
+            while not subscriber.closed:
+                changes = subscriber.next(EventHub.HEARTBEAT)
+                if changes is None:
+                    self.wfile.write(b": heartbeat\n\n")
+                elif not subscriber.closed:
+                    self.wfile.write(
+                        f"event: changes\ndata: {json.dumps(changes)}\n\n".encode(
+                            "utf-8"
+                        )
+                    )
+                self.wfile.flush()
+        except OSError:
+            pass  # the client is gone
+        finally:
+            self.events.unsubscribe(subscriber)
 
         return True
 
@@ -111,18 +236,26 @@ class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
 
         req_id = re.findall(regexp, url.path)[0]
 
-        if req_id not in self.records.requests:
+        etag = self.record_etag(req_id)
+        if self.serve_not_modified(etag):
+            return True
+
+        details = None
+        record = self.records.requests.get(req_id)
+        if record is not None:
+            details = json.dumps(request_details(self.records, record))
+        elif self.records.store.enabled:
+            stored = self.records.store.get_request(req_id)  # evicted from the memory
+            if stored is not None:
+                initiators = self.records.store.get_initiators([stored["initiator_id"]])
+                if stored["initiator_id"] in initiators:
+                    stored["initiator"] = initiators[stored["initiator_id"]]
+                details = json.dumps(stored)
+
+        if details is None:
             return self.serve_not_found(url)
 
-        self.send_response(200)
-        self.send_header("Content-type", "application/json")
-        self.send_header_no_cache()
-        self.end_headers()
-        self.wfile.write(
-            json.dumps(self.records.requests[req_id], cls=RequestPayload).encode(
-                "utf-8"
-            )
-        )
+        self.send_content(200, details.encode("utf-8"), "application/json", etag=etag)
 
         return True
 
@@ -134,16 +267,15 @@ class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
 
         req_id = re.findall(regexp, url.path)[0]
 
-        if req_id not in self.records.requests:
-            return self.serve_not_found(url)
+        etag = self.record_etag(req_id)
+        if self.serve_not_modified(etag):
+            return True
 
-        req = self.records.requests[req_id]
+        content = self.get_content(req_id, False)
+        if content is None:
+            return self.serve_not_found(url)
 
-        self.send_response(200)
-        self.send_header("Content-type", "application/octet-stream")
-        self.send_header_no_cache()
-        self.end_headers()
-        self.wfile.write(req.request.content)
+        self.send_content(200, content[0], "application/octet-stream", etag=etag)
 
         return True
 
@@ -155,27 +287,111 @@ class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
 
         req_id = re.findall(regexp, url.path)[0]
 
-        if req_id not in self.records.requests:
+        etag = self.record_etag(req_id)
+        if self.serve_not_modified(etag):
+            return True
+
+        content = self.get_content(req_id, True)
+        if content is None:
             return self.serve_not_found(url)
 
-        req = self.records.requests[req_id]
+        self.send_content(200, content[0], content[1], etag=etag)
 
-        self.send_response(200)
-        self.send_header("Content-type", req.response.get_header("Content-Type"))
-        self.send_header_no_cache()
+        return True
+
+    def record_etag(self, req_id: str) -> Union[str, None]:
+        """The ETag of a record, derived from its version.
+
+        Even a complete record may still change (moved to another group, updated by
+        another process): it is cached, but revalidated before each use. A record
+        evicted from the memory (read from the store) has no ETag.
+        """
+        record = self.records.requests.get(req_id)
+        if record is None:
+            return None
+        return f'W/"{record.version:x}"'
+
+    def serve_not_modified(self, etag: Union[str, None]) -> bool:
+        """Answer 304 if the ETag matches one of the If-None-Match header."""
+        if etag is None:
+            return False
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is None:
+            return False
+
+        # weak comparison: the same content is sent compressed or not
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if not ("*" in tags or etag.removeprefix("W/") in tags):
+            return False
+
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header_revalidate()
         self.end_headers()
-        self.wfile.write(req.response.content)
+
+        return True
+
+    def get_content(
+        self, req_id: str, response: bool
+    ) -> Union[tuple[bytes, str], None]:
+        if req_id in self.records.requests:
+            req = self.records.requests[req_id]
+            if response:
+                return req.response.content, req.response.get_header("Content-Type")
+            return req.request.content, req.request.get_header("Content-Type")
+        if self.records.store.enabled:
+            return self.records.store.get_content(req_id, response)  # evicted
+        return None
+
+    def serve_bad_request(self, url: ParseResult, reason: str):
+        self.send_content(400, f"400 Bad request - {reason}".encode("utf-8"))
 
         return True
 
     def serve_not_found(self, url: ParseResult):
-        self.send_response(404)
-        self.send_header_no_cache()
-        self.end_headers()
-        self.wfile.write(b"404 Not found")
+        self.send_content(404, b"404 Not found")
 
         return True
 
+    def send_json(self, payload: str):
+        self.send_content(200, payload.encode("utf-8"), "application/json")
+
+    def send_content(
+        self,
+        status: int,
+        content: bytes,
+        content_type: Union[str, None] = None,
+        etag: Union[str, None] = None,
+    ):
+        encoding = None
+        if compressible(content_type) and len(content) >= MIN_SIZE:
+            encoding = negotiate_encoding(self.headers.get("Accept-Encoding", ""))
+            if encoding is not None:
+                compressed = compress(content, encoding)
+                # the content may be compressed already (a body recorded as is)
+                if len(compressed) < len(content):
+                    content = compressed
+                else:
+                    encoding = None
+
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header("Content-type", content_type)
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        if compressible(content_type):
+            self.send_header("Vary", "Accept-Encoding")
+        # the length is required to keep the connection alive (HTTP/1.1)
+        self.send_header("Content-Length", str(len(content)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header_revalidate()
+        else:
+            self.send_header_no_cache()
+        self.end_headers()
+        self.wfile.write(content)
+
     def log_message(self, format, *args):
         pass
 
@@ -184,3 +400,7 @@ class HttpbgHTTPRequestHandler(BaseHTTPRequestHandler):
 
     def send_header_with_cache(self, seconds):
         self.send_header("Cache-Control", f"max-age={seconds}")
+
+    def send_header_revalidate(self):
+        # cached, but revalidated (If-None-Match) before each use
+        self.send_header("Cache-Control", "no-cache")
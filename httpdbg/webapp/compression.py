@@ -0,0 +1,60 @@
+import gzip
+from typing import Union
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    try:
+        import brotlicffi as brotli  # type: ignore
+    except ImportError:
+        brotli = None
+
+# a smaller content is sent as is: the compression would save a few bytes only
+MIN_SIZE = 1024
+
+# fast levels: the content is compressed for each response
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def compressible(content_type: Union[str, None]) -> bool:
+    """The content is text (JSON, HTML, ...): the images, archives, ... are not compressed."""
+    if not content_type:
+        return False
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type.endswith(
+        ("json", "xml", "javascript")
+    )
+
+
+def negotiate_encoding(accept_encoding: str) -> Union[str, None]:
+    """The content encoding (br or gzip) preferred by the client, or None."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, parameters = item.partition(";")
+        weight = 1.0
+        parameter = parameters.strip().replace(" ", "")
+        if parameter.startswith("q="):
+            try:
+                weight = float(parameter[2:])
+            except ValueError:
+                continue
+        weights[name.strip().lower()] = weight
+
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), encoding)
+        for encoding in supported
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    if not candidates:
+        return None
+    # br is preferred if both have the same weight
+    return max(candidates, key=lambda candidate: candidate[0])[1]
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    # mtime=0: the same content is always compressed the same way
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
@@ -0,0 +1,152 @@
+import threading
+from typing import Union
+
+from httpdbg.log import logger
+from httpdbg.records import HTTPRecords
+
+
+class EventSubscriber:
+    """The notifications not yet sent to a web client (Server-Sent Events).
+
+    The notifications are merged until the client is ready to receive them: a slow
+    client receives fewer notifications, never a longer queue. Beyond MAX_IDS, only
+    the cursor is kept (overflow): the client loads the changes from the cursor anyway.
+    """
+
+    MAX_IDS = 1000
+
+    def __init__(self) -> None:
+        self._lock: threading.Lock = threading.Lock()
+        self._ready: threading.Event = threading.Event()
+        self._pending: Union[dict, None] = None
+        self.closed: bool = False
+
+    def push(
+        self, cursor: int, created: set[str], updated: set[str], completed: set[str]
+    ) -> None:
+        with self._lock:
+            if self._pending is None:
+                self._pending = {
+                    "cursor": cursor,
+                    "created": set(),
+                    "updated": set(),
+                    "completed": set(),
+                    "overflow": False,
+                }
+            pending = self._pending
+            pending["cursor"] = cursor
+            if not pending["overflow"]:
+                pending["created"] |= created
+                pending["completed"] |= completed
+                pending["updated"] = (pending["updated"] | updated) - pending[
+                    "completed"
+                ]
+                nb = sum(
+                    len(pending[name]) for name in ("created", "updated", "completed")
+                )
+                if nb > EventSubscriber.MAX_IDS:
+                    pending["overflow"] = True
+                    pending["created"] = pending["updated"] = pending["completed"] = (
+                        set()
+                    )
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    def next(self, timeout: float) -> Union[dict, None]:
+        """The merged notification, or None if nothing has changed before the timeout."""
+        self._ready.wait(timeout)
+        with self._lock:
+            self._ready.clear()
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return None
+        for name in ("created", "updated", "completed"):
+            pending[name] = sorted(pending[name])
+        return pending
+
+
+class EventHub:
+    """Publish the changes of the records to the web clients (Server-Sent Events).
+
+    While at least one client is subscribed, a thread reads the changes of the
+    records (see HTTPRecords.changes) every WINDOW seconds: the creations and the
+    updates of a record during this window are sent as one notification.
+    """
+
+    WINDOW = 0.2
+    HEARTBEAT = 15.0
+    # each stream keeps a thread of the server busy
+    MAX_SUBSCRIBERS = 4
+
+    def __init__(self, records: HTTPRecords) -> None:
+        self.records: HTTPRecords = records
+        self._lock: threading.Lock = threading.Lock()
+        self._subscribers: set[EventSubscriber] = set()
+        self._worker: Union[threading.Thread, None] = None
+        self._stop: threading.Event = threading.Event()
+
+    def subscribe(self) -> Union[EventSubscriber, None]:
+        """A new subscriber, or None if there are too many subscribers already."""
+        subscriber = EventSubscriber()
+        with self._lock:
+            if len(self._subscribers) >= EventHub.MAX_SUBSCRIBERS:
+                return None
+            self._subscribers.add(subscriber)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="httpdbg-events", daemon=True
+                )
+                self._worker.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: EventSubscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.close()
+            self._subscribers.clear()
+
+    def _run(self) -> None:
+        records = self.records
+        session = records.session
+        cursor = records.cursor
+        last_seq = records.last_seq
+        while not self._stop.wait(EventHub.WINDOW):
+            with self._lock:
+                if not self._subscribers:
+                    self._worker = None
+                    return
+                subscribers = list(self._subscribers)
+
+            try:
+                if records.session is not session:
+                    # reset: everything must be loaded again
+                    session = records.session
+                    cursor = last_seq = 0
+
+                changed, new_cursor = records.changes(cursor)
+                if not changed:
+                    continue
+
+                created, updated, completed = set(), set(), set()
+                for record in changed:
+                    if record.seq > last_seq:
+                        created.add(record.id)
+                    if record.complete:
+                        completed.add(record.id)
+                    elif record.seq <= last_seq:
+                        updated.add(record.id)
+                cursor = new_cursor
+                last_seq = max(last_seq, max(record.seq for record in changed))
+
+                for subscriber in subscribers:
+                    subscriber.push(cursor, created, updated, completed)
+            except Exception:
+                logger().exception("events - the changes can't be published")
@@ -2,6 +2,11 @@
 
 const global = {
     session: null,
+    cursor: 0,  // the last change loaded for the current session
+    client: Math.random().toString(36).substring(2),
+    events: null,  // the stream of the changes (server-sent events), if connected
+    changed: false,
+    on_change: null,
     sessions: {},
     requests: {},
     initiators: {},
@@ -41,10 +46,16 @@ function save_request(request_id, request, session_id) {
             }
         }
 
+        if (request.incomplete) {
+            request.status_code_view += ' <span title="incomplete: some data have not been recorded (the ingestion queue was full)">!</span>';
+        }
+
+        request.duration_view = format_duration(request.duration);
+
         global.requests[request_id] = request;
 
         if (!request.pin) {
-            get_request(request_id);
+            return get_request(request_id);
         }
     }
 }
@@ -56,16 +67,11 @@ async function load_all_requests() {
         return global.static_all_requests;
     }
 
-    // connected mode
-    var requests_already_loaded = 0
-    for (const [request_id, request] of Object.entries(global.requests)) {
-        if (request.loaded && (global.session == request.session_id)) {
-            requests_already_loaded += 1;
-        }
-    }
+    // connected mode: only the requests created or updated since the last call
     var url = "/requests?" + new URLSearchParams({
         "id": global.session,
-        "requests_already_loaded": requests_already_loaded,
+        "since": global.cursor,
+        "client": global.client,
     })
 
     try {
@@ -91,22 +97,68 @@ async function get_all_requests() {
             global.sessions[data.session.id] = data.session;
         };
 
+        update_sampling_info(data.sampling);
+
         // for the initiators and the groups, we can just save them without any verification
         Object.assign(global.initiators, data.initiators);
         Object.assign(global.groups, data.groups);
 
         // for the requests, we may have to update them 
+        const loading = [];
         for (const [request_id, request] of Object.entries(data.requests)) {
             if (!(request_id in global.requests)) {
                 // this is a new request
-                save_request(request_id, request, data.session.id);
+                loading.push(save_request(request_id, request, data.session.id));
             } else {
-                if (global.requests[request_id].last_update < request.last_update) {
+                if (global.requests[request_id].version != request.version) {
                     // this request has been updated (probably a "big" file) 
-                    save_request(request_id, request, data.session.id);
+                    loading.push(save_request(request_id, request, data.session.id));
                 }
             };
         };
+
+        // the cursor is sent back to the server once the details have been loaded
+        await Promise.all(loading);
+        global.cursor = data.cursor ?? 0;
+    }
+}
+
+function format_duration(duration) {
+    // the duration is in ms
+    if ((duration === null) || (duration === undefined)) {
+        return "";
+    }
+    if (duration >= 1000) {
+        return (duration / 1000).toFixed(2) + " s";
+    }
+    return duration.toFixed(1) + " ms";
+}
+
+function update_sampling_info(sampling) {
+    const elt = document.getElementById("sampling-info");
+    if (elt && sampling && sampling.sampled_out) {
+        const recorded = sampling.seen - sampling.sampled_out;
+        elt.textContent = recorded + "/" + sampling.seen + " requests recorded (sampling) -";
+    }
+}
+
+async function get_stats() {
+    if (typeof global.static_all_requests !== "undefined") {
+        return;
+    }
+
+    try {
+        const res = await fetch("/stats");
+        const stats = await res.json();
+        const elt = document.getElementById("overhead-info");
+        if (elt) {
+            elt.textContent = "httpdbg overhead: " + stats.overhead_percent + "% of wall time";
+            if (stats.threads > 1) {
+                elt.textContent += " (average over " + stats.threads + " threads)";
+            }
+        }
+    } catch (error) {
+        // the overhead is only informative
     }
 }
 
@@ -155,7 +207,12 @@ async function get_request(request_id) {
 
         // the full stack is not present in request summary
         global.requests[request_id].initiator_id = data.initiator_id;
+        if (data.initiator && global.requests[request_id].initiator) {
+            Object.assign(global.requests[request_id].initiator, data.initiator);
+        }
         global.requests[request_id].exception = data.exception;
+        global.requests[request_id].timing = data.timing;
+        global.requests[request_id].connection = data.connection;
 
         global.requests[request_id].to_refresh = true;
 
@@ -163,13 +220,62 @@ async function get_request(request_id) {
     }
 }
 
+function listen_events() {
+    // export mode
+    if ((typeof global.static_all_requests !== "undefined") || (typeof EventSource === "undefined")) {
+        return;
+    }
+
+    const source = new EventSource("/events");
+    source.onopen = function () {
+        global.events = source;
+        notify_change();  // something may have changed while disconnected
+    };
+    source.onerror = function () {
+        // the browser reconnects automatically, we poll until then
+        global.events = null;
+        notify_change();
+    };
+    source.addEventListener("changes", notify_change);
+}
+
+function notify_change() {
+    global.changed = true;
+    if (global.on_change) {
+        global.on_change();
+    }
+}
+
+function wait_for_change(ms) {
+    // with the events stream, we wait for a change (or for a long time, just in case)
+    const delay = global.events ? 30000 : ms;
+    return new Promise(resolve => {
+        const timer = setTimeout(done, delay);
+        function done() {
+            clearTimeout(timer);
+            global.on_change = null;
+            resolve();
+        }
+        if (global.changed) {
+            done();
+        } else {
+            global.on_change = done;
+        }
+    });
+}
+
 async function pol_new_data() {
 
+    listen_events();
+
     while (true) {
+        global.changed = false;
         await Promise.all([
             get_all_requests(),
-            wait_for(1000)
+            get_stats(),
+            wait_for(100),
         ]);
+        await wait_for_change(900);
     }
 }
 
@@ -94,6 +94,10 @@ window.addEventListener('keydown', (event) => {
         opentab_stack();
     }
 
+    if (keys_history.endsWith("rd")) {
+        opentab_timing();
+    }
+
     if (keys_history.endsWith("oh")) {
         help();
     }
@@ -21,6 +21,12 @@ async function refresh_resquests() {
             if (request.initiator.short_stack) {
                 request.title += "\n\n" + request.initiator.short_stack;
             }
+            if (request.call) {
+                request.title += "----------\n" + request.call;
+            }
+            if (request.incomplete) {
+                request.title += "\n\nincomplete: some data have not been recorded (the ingestion queue was full)";
+            }
             request.title += "\n\nclick to select -/- ctrl+click to compare to";
 
             let groupby = get_groupby(global.groupby, request);
@@ -204,6 +210,12 @@ function fill_content(request_id, name) {
 
     update_with_template("template_stack", document.querySelector("#stack > div[name='" + name + "']"), req);
 
+    var timing = req.timing ? Object.fromEntries(
+        Object.entries(req.timing).map(([phase, duration]) => [phase, format_duration(duration)])
+    ) : null;
+
+    update_with_template("template_timing", document.querySelector("#timing > div[name='" + name + "']"), { "timing": timing });
+
     apply_config();
 }
 
@@ -250,6 +262,10 @@ function opentab_stack() {
     opentab(document.getElementById("btn-tab-stack"), "tabStack");
 }
 
+function opentab_timing() {
+    opentab(document.getElementById("btn-tab-timing"), "tabTiming");
+}
+
 
 async function disable_link_if_server_disconnected() {
     var sheet = document.getElementById("serverstatuscss").sheet;
@@ -0,0 +1,41 @@
+import time
+
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.hooks.recordhttp2 import HTTP2Record
+
+CHUNK = b"x" * 16 * 1024
+
+
+def capture_http1(size_mb: int) -> float:
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    t0 = time.perf_counter()
+    record.receive_data(
+        f"HTTP/1.1 200 OK\r\nContent-Length: {size_mb * 1024 * 1024}\r\n\r\n".encode()
+    )
+    for _ in range(size_mb * 64):
+        record.receive_data(CHUNK)
+    t1 = time.perf_counter()
+    assert len(record.response.content) == size_mb * 1024 * 1024
+    return t1 - t0
+
+
+def capture_http2(size_mb: int) -> float:
+    record = HTTP2Record("initiator", "group")
+    t0 = time.perf_counter()
+    for _ in range(size_mb * 64):
+        record.receive_data(CHUNK)
+    t1 = time.perf_counter()
+    assert len(record.response.content) == size_mb * 1024 * 1024
+    return t1 - t0
+
+
+if __name__ == "__main__":
+    # the capture cost per MB must stay (roughly) constant when the body size grows
+    print("protocol,size_mb,total_ms,ms_per_mb")
+    for capture, protocol in ((capture_http1, "HTTP/1"), (capture_http2, "HTTP/2")):
+        for size_mb in (1, 4, 16, 64, 200):
+            duration = capture(size_mb)
+            print(
+                f"{protocol},{size_mb},{int(duration*1000)},{duration*1000/size_mb:.2f}"
+            )
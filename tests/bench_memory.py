@@ -0,0 +1,57 @@
+import gc
+import tracemalloc
+
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.initiator import Group
+from httpdbg.initiator import Initiator
+from httpdbg.records import HTTPRecords
+
+REQUEST = (
+    b"GET /api/items?page=1 HTTP/1.1\r\n"
+    b"Host: localhost:8000\r\n"
+    b"User-Agent: python-requests/2.32.3\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Accept: */*\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Cookie: session=abc; theme=dark\r\n\r\n"
+)
+
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Server: uvicorn\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: 13\r\n"
+    b"Set-Cookie: session=abc; Path=/; HttpOnly\r\n\r\n"
+    b'{"items": []}'
+)
+
+
+def record_requests(nb: int) -> HTTPRecords:
+    records = HTTPRecords()
+    for i in range(nb):
+        initiator = Initiator(f"label {i}", f"short stack {i}")
+        group = Group(f"group {i}", "", False, initiator)
+        records.initiators[initiator.id] = initiator
+        records.groups[group.id] = group
+        record = HTTP1Record(initiator.id, group.id)
+        record.send_data(REQUEST)
+        record.receive_data(RESPONSE)
+        records.add_request(record)
+    return records
+
+
+def bytes_per_request(nb: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    records = record_requests(nb)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(records) == nb
+    return size / nb
+
+
+if __name__ == "__main__":
+    # the memory retained for each recorded request (with its initiator and group)
+    print("requests,bytes_per_request")
+    for nb in (1_000, 10_000, 100_000):
+        print(f"{nb},{bytes_per_request(nb):.0f}")
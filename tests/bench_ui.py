@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import requests
+
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.records import HTTPRecords
+from httpdbg.server import httpdbg_srv
+
+HOST = "127.0.0.1"
+PORT = 4919
+URL = f"http://{HOST}:{PORT}"
+
+BIG_BODY = 64 * 1024 * 1024
+
+
+def add_records(records: HTTPRecords, nb: int) -> None:
+    for i in range(nb):
+        record = HTTP1Record("initiator", "group")
+        record.send_data(f"GET /{i} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        records.add_request(record)
+
+
+def load_burst(nb: int, keep_alive: bool) -> float:
+    """Load the list then the details of each request, like the UI (6 connections)."""
+    with httpdbg_srv(HOST, PORT) as records:
+        add_records(records, nb)
+        t0 = time.perf_counter()
+        ids = list(requests.get(f"{URL}/requests").json()["requests"])
+
+        def load(ids: list[str]) -> None:
+            session = requests.Session() if keep_alive else requests
+            for request_id in ids:
+                session.get(f"{URL}/request/{request_id}").raise_for_status()
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(load, [ids[i::6] for i in range(6)]))
+        return time.perf_counter() - t0
+
+
+def stats_latency_during_download() -> float:
+    """The time to load /stats while a big body is downloaded (slowly) by another client."""
+    with httpdbg_srv(HOST, PORT) as records:
+        record = HTTP1Record("initiator", "group")
+        record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        record.receive_data(
+            f"HTTP/1.1 200 OK\r\nContent-Length: {BIG_BODY}\r\n\r\n".encode()
+            + b"x" * BIG_BODY
+        )
+        records.add_request(record)
+
+        with requests.get(f"{URL}/request/{record.id}/down", stream=True) as download:
+            next(download.iter_content(1024))  # the download is in progress
+            t0 = time.perf_counter()
+            requests.get(f"{URL}/stats").raise_for_status()
+            return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    # the UI must stay responsive when a burst of requests is recorded
+    print("scenario,requests,total_ms,ms_per_request")
+    for nb in (500, 5_000):
+        for keep_alive in (False, True):
+            duration = load_burst(nb, keep_alive)
+            scenario = "burst keep-alive" if keep_alive else "burst new connections"
+            print(f"{scenario},{nb},{int(duration*1000)},{duration*1000/nb:.3f}")
+    duration = stats_latency_during_download()
+    print(f"/stats during a download,1,{duration*1000:.1f},{duration*1000:.1f}")
@@ -0,0 +1,9 @@
+import requests
+
+
+def fnc_without_request(value):
+    return value
+
+
+def fnc_with_request(url):
+    requests.get(url)
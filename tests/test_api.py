@@ -1,8 +1,11 @@
+import http.client
+
 import requests
 
 import pytest
 
 from httpdbg.hooks.all import httprecord
+from httpdbg.retention import RetentionPolicy
 from httpdbg.server import httpdbg_srv
 
 from tests.utils import get_request_content_up
@@ -225,6 +228,24 @@ def test_api_get_request_content_up_text(httpbin, httpdbg_host, httpdbg_port):
     assert ret1.content == b"hello"
 
 
+@pytest.mark.api
+def test_api_get_request_max_body_size(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records, max_body_size=10):
+            requests.post(httpbin.url + "/post", data=b"0123456789abcdef")
+
+        ret = get_request_details(httpdbg_port, 0)
+        ret_up = get_request_content_up(httpdbg_port, 0)
+
+    assert ret.json()["status_code"] == 200
+    assert ret.json()["request"]["truncated"] is True
+    assert ret.json()["request"]["body_length"] == 16
+    assert ret_up.content == b"0123456789"
+
+    assert ret.json()["response"]["truncated"] is True
+    assert ret.json()["response"]["body_length"] > 10
+
+
 @pytest.mark.api
 @pytest.mark.cookies
 def test_cookies_request(httpbin, httpdbg_host, httpdbg_port):
@@ -260,3 +281,161 @@ def test_cookies_response(httpbin, httpdbg_host, httpdbg_port):
     assert cookies[0]["name"] == "THE_COOKIE_NAME"
     assert cookies[0]["value"] == "THE_COOKIE_VALUE"
     assert {"name": "path", "attr": "/"} in cookies[0]["attributes"]
+
+
+@pytest.mark.api
+def test_api_get_request_timing(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            requests.get(httpbin.url + "/get")
+
+        ret = get_request_details(httpdbg_port, 0)
+        reqs = requests.get(f"http://{httpdbg_host}:{httpdbg_port}/requests")
+
+    timing = ret.json()["timing"]
+    assert timing["connect"] is not None
+    assert timing["tls"] is None
+    assert 0 <= timing["ttfb"] <= timing["total"]
+    assert timing["receive"] is not None
+
+    duration = list(reqs.json()["requests"].values())[0]["duration"]
+    assert duration == timing["total"]
+
+
+@pytest.mark.api
+def test_api_connections(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            requests.get(httpbin.url + "/get")
+            requests.get(httpbin.url + "/get")
+
+        ret = get_request_details(httpdbg_port, 1)
+        connections = requests.get(
+            f"http://{httpdbg_host}:{httpdbg_port}/connections"
+        ).json()
+
+    assert ret.json()["connection"]["sequence"] == 1
+    assert ret.json()["connection"]["new"] is True
+    assert connections == {httpbin.url: {"connections": 2, "requests": 2}}
+
+
+@pytest.mark.api
+def test_api_stats(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            requests.get(httpbin.url + "/get")
+
+        ret = get_request_details(httpdbg_port, 0)
+        stats = requests.get(f"http://{httpdbg_host}:{httpdbg_port}/stats").json()
+
+    assert ret.json()["overhead_ms"] > 0
+    assert stats["overhead_ms"] > 0
+    assert 0 < stats["overhead_percent"] < 100
+    assert stats["hooks"]["socket_sendall"]["calls"] > 0
+
+
+@pytest.mark.api
+@pytest.mark.retention
+def test_api_delete_requests(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records, retention=RetentionPolicy(max_records=2)):
+            for _ in range(3):
+                requests.get(httpbin.url + "/get")
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/requests"
+        stats = requests.get(f"http://{httpdbg_host}:{httpdbg_port}/stats").json()
+        bad_date = requests.delete(url, params={"before": "yesterday"})
+        before = requests.delete(url, params={"before": records[1].tbegin.isoformat()})
+        remaining = len(records)
+        evicted = requests.delete(url)
+
+    assert stats["retention"]["max_records"] == 2
+    assert stats["retention"]["evicted"] == 1
+    assert bad_date.status_code == 400
+    assert before.json() == {"evicted": 1}
+    assert remaining == 1
+    assert evicted.json() == {"evicted": 1}
+    assert len(records) == 0
+
+
+@pytest.mark.api
+def test_api_requests_page(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            for i in range(3):
+                requests.get(httpbin.url + f"/get?{i}")
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/requests"
+        page = requests.get(url, params={"offset": 1, "limit": 1}).json()
+        bad = requests.get(url, params={"limit": "all"})
+
+    assert page["total"] == 3
+    assert list(page["requests"]) == [records[1].id]
+    assert list(page["initiators"]) == [records[1].initiator_id]
+    assert bad.status_code == 400
+
+
+@pytest.mark.api
+def test_api_requests_since(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        url = f"http://{httpdbg_host}:{httpdbg_port}/requests"
+        with httprecord(records):
+            requests.get(httpbin.url + "/get")
+        first = requests.get(url).json()
+        with httprecord(records):
+            requests.get(httpbin.url + "/get?second")
+
+        session = first["session"]["id"]
+        cursor = first["cursor"]
+        delta = requests.get(url, params={"id": session, "since": cursor}).json()
+        unchanged = requests.get(
+            url, params={"id": session, "since": delta["cursor"], "client": "tab"}
+        ).json()
+        other_session = requests.get(url, params={"id": "x", "since": cursor}).json()
+
+    assert len(first["requests"]) == 1
+    assert list(delta["requests"]) == [records[1].id]
+    assert list(delta["initiators"]) == [records[1].initiator_id]
+    assert unchanged["requests"] == {}
+    assert unchanged["cursor"] == delta["cursor"]
+    assert len(other_session["requests"]) == 2
+    assert not records.unread
+
+
+@pytest.mark.api
+def test_api_keep_alive(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            requests.get(httpbin.url + "/get")
+
+        connection = http.client.HTTPConnection(httpdbg_host, httpdbg_port, timeout=10)
+        responses = []
+        for path in ("/requests", f"/request/{records[0].id}", "/request/unknown"):
+            connection.request("GET", path)
+            sock = connection.sock
+            response = connection.getresponse()
+            responses.append((response, response.read()))
+            # the same connection is used for all the requests
+            assert connection.sock is sock
+        connection.close()
+
+    assert [response.status for response, _ in responses] == [200, 200, 404]
+    for response, content in responses:
+        assert not response.will_close
+        assert response.headers["Content-Length"] == str(len(content))
+
+
+@pytest.mark.api
+def test_api_requests_initiators_without_stack(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            requests.get(httpbin.url + "/get")
+
+        listed = requests.get(f"http://{httpdbg_host}:{httpdbg_port}/requests").json()
+        details = get_request_details(httpdbg_port, 0).json()
+
+    initiator_id = records[0].initiator_id
+    assert list(listed["initiators"]) == [initiator_id]
+    assert "stack" not in listed["initiators"][initiator_id]
+    assert details["initiator"]["id"] == initiator_id
+    assert "stack" in details["initiator"]
@@ -0,0 +1,68 @@
+from collections import deque
+
+import pytest
+import requests
+
+from httpdbg.argsrepr import ArgsRepr
+from httpdbg.hooks.all import httprecord
+
+
+@pytest.mark.initiator
+def test_argsrepr_not_truncated():
+    args_repr = ArgsRepr()
+
+    assert args_repr.render("abc") == ('"abc"', None)
+    assert args_repr.render(b"abc") == ("b'abc'", None)
+    assert args_repr.render([1, 2]) == ("[1, 2]", None)
+    assert args_repr.render({"a": 1}) == ("{'a': 1}", None)
+    assert args_repr.render(None) == ("None", None)
+
+
+@pytest.mark.initiator
+def test_argsrepr_truncated():
+    args_repr = ArgsRepr(max_length=4, max_items=2)
+
+    assert args_repr.render("abcdef") == ('"abcd..."', 6)
+    assert args_repr.render(b"abcdef") == ("b'abcd'...", 6)
+    assert args_repr.render([1, 2, 3]) == ("[1, 2, ...]", 3)
+    assert args_repr.render({"a": 1, "b": 2, "c": 3}) == ("{'a': 1, 'b': 2, ...}", 3)
+    assert args_repr.render(123456) == ("1234...", 6)
+
+
+@pytest.mark.initiator
+def test_argsrepr_no_limit():
+    args_repr = ArgsRepr(max_length=0, max_items=0)
+
+    assert args_repr.render("a" * 10000) == ('"' + "a" * 10000 + '"', None)
+    assert args_repr.render(list(range(1000)))[1] is None
+
+
+@pytest.mark.initiator
+def test_argsrepr_broken_str():
+    class Broken:
+        def __str__(self):
+            raise Exception("broken")
+
+    assert ArgsRepr().render(Broken()) == ("-?-", None)
+
+
+@pytest.mark.initiator
+def test_argsrepr_initiator(httpbin):
+    with httprecord(args_repr=ArgsRepr(max_length=10)) as records:
+        requests.post(f"{httpbin.url}/post", data=b"x" * 100000)
+
+    call = records[0].call.text
+    assert "data=b'xxxxxxxxxx'... [length=100000]," in call
+    assert len(call) < 1000
+
+
+@pytest.mark.initiator
+def test_argsrepr_bounded():
+    args_repr = ArgsRepr(max_length=4, max_items=2)
+
+    assert args_repr.render(10**100000) == ("<int of about 100001 digits>", None)
+    assert args_repr.render([10**100000]) == ("[<int of about 100001 digits>]", None)
+    # in the order of insertion
+    assert args_repr.render({"b": 2, "a": 1, "c": 3}) == ("{'b': 2, 'a': 1, ...}", 3)
+    assert args_repr.render({3, 2, 1})[0].endswith(", ...}")
+    assert args_repr.render(deque(range(100000))) == ("deque([0, 1, ...])", 100000)
@@ -0,0 +1,151 @@
+import pytest
+import requests
+
+from httpdbg.hooks.h2 import TracerHTTP2
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.hooks.recordhttp2 import HTTP2Record
+from httpdbg.server import httpdbg_srv
+from httpdbg.webapp import compression
+from httpdbg.webapp.compression import negotiate_encoding
+
+BODY = b'{"value": "' + b"x" * 10_000 + b'"}'
+
+
+@pytest.mark.cache
+def test_cache_negotiate_encoding(monkeypatch):
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, *") == "gzip"
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("") is None
+
+    # br is negotiated only if a brotli library is installed
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("gzip, br") == "gzip"
+
+
+@pytest.mark.api
+@pytest.mark.cache
+def test_cache_compressed_response(httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        record = HTTP1Record("initiator", "group")
+        record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        record.receive_data(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(BODY)}\r\n\r\n".encode()
+            + BODY
+        )
+        records.add_request(record)
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/request/{record.id}/down"
+        compressed = requests.get(url, headers={"Accept-Encoding": "gzip"})
+        identity = requests.get(url, headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert int(compressed.headers["Content-Length"]) < len(BODY)
+    assert compressed.content == BODY
+    assert "Content-Encoding" not in identity.headers
+    assert identity.content == BODY
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+
+
+@pytest.mark.api
+@pytest.mark.cache
+def test_cache_etag(httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        record = HTTP1Record("initiator", "group")
+        record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        records.add_request(record)
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/request/{record.id}"
+
+        # in progress: revalidated before each use
+        in_progress = requests.get(url)
+        etag = in_progress.headers["ETag"]
+        not_modified = requests.get(url, headers={"If-None-Match": etag})
+
+        record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+
+        # complete: the record has been updated
+        complete = requests.get(url, headers={"If-None-Match": etag})
+        body = requests.get(
+            f"{url}/down", headers={"If-None-Match": complete.headers["ETag"]}
+        )
+
+        # no ETag for the list of the requests: it changes all the time
+        listing = requests.get(f"http://{httpdbg_host}:{httpdbg_port}/requests")
+
+    assert in_progress.headers["Cache-Control"] == "no-cache"
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+
+    assert complete.status_code == 200
+    assert complete.headers["ETag"] != etag
+    assert complete.headers["Cache-Control"] == "no-cache"
+    assert complete.json()["status_code"] == 200
+    assert body.status_code == 304
+
+    assert "ETag" not in listing.headers
+    assert "no-store" in listing.headers["Cache-Control"]
+
+
+@pytest.mark.api
+@pytest.mark.cache
+def test_cache_http2_streamed_body(httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        tracer = TracerHTTP2()
+        record = HTTP2Record("initiator", "group")
+        tracer.link_record(1, 1, record)
+        record.request.headers = [
+            (b":method", b"GET"),
+            (b":scheme", b"https"),
+            (b":authority", b"localhost"),
+            (b":path", b"/"),
+        ]
+        # no Content-Length: the body is complete at the end of the stream only
+        record.response.headers = [(b":status", b"200")]
+        record.receive_data(b"ab")
+        records.add_request(record)
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/request/{record.id}"
+        streaming = requests.get(url)
+        streaming_body = requests.get(f"{url}/down")
+
+        record.receive_data(b"cd")
+        tracer.end_stream(1, 1, received=True)
+
+        ended = requests.get(url, headers={"If-None-Match": streaming.headers["ETag"]})
+        ended_body = requests.get(f"{url}/down")
+
+    assert streaming.headers["Cache-Control"] == "no-cache"
+    assert streaming_body.headers["Cache-Control"] == "no-cache"
+    assert streaming_body.content == b"ab"
+
+    assert ended.status_code == 200
+    assert ended.headers["ETag"] != streaming.headers["ETag"]
+    assert ended_body.headers["Cache-Control"] == "no-cache"
+    assert ended_body.content == b"abcd"
+
+
+@pytest.mark.api
+@pytest.mark.cache
+def test_cache_etag_group(httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        record = HTTP1Record("initiator", "group")
+        record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        records.add_request(record)
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/request/{record.id}"
+        complete = requests.get(url)
+
+        # a complete record may still be moved to another group
+        records.set_group(record, "other")
+        moved = requests.get(url, headers={"If-None-Match": complete.headers["ETag"]})
+
+    assert complete.json()["group_id"] == "group"
+    assert moved.status_code == 200
+    assert moved.headers["ETag"] != complete.headers["ETag"]
+    assert moved.json()["group_id"] == "other"
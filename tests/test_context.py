@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.initiator import httpdbg_group
+from httpdbg.initiator import httpdbg_tag
+from httpdbg.records import HTTPRecords
+
+
+@pytest.mark.initiator
+def test_context_thread_isolated():
+    with httprecord() as records:
+        records.current_initiator = "initiator"
+        records.current_group = "group"
+
+        seen = []
+        thread = threading.Thread(
+            target=lambda: seen.append(
+                (records.current_initiator, records.current_group)
+            )
+        )
+        thread.start()
+        thread.join()
+
+        assert seen == [(None, None)]
+        assert records.current_initiator == "initiator"
+
+        records.current_initiator = None
+        records.current_group = None
+
+
+@pytest.mark.initiator
+def test_context_reset():
+    records = HTTPRecords()
+    variable = records._current_initiator
+    records.current_initiator = "initiator"
+    records.current_tag = "tag"
+
+    records.reset()
+
+    # the same variables, their values are reset
+    assert records._current_initiator is variable
+    assert records.current_initiator is None
+    assert records.current_tag is None
+
+
+@pytest.mark.tag
+def test_context_asyncio_tasks_isolated():
+    async def tagged(records, tag, seen):
+        with httpdbg_tag(records, tag):
+            await asyncio.sleep(0.01)
+            seen[tag] = records.current_tag
+
+    async def main(records, seen):
+        await asyncio.gather(*(tagged(records, tag, seen) for tag in ("a", "b", "c")))
+
+    with httprecord() as records:
+        seen: dict[str, str] = {}
+        asyncio.run(main(records, seen))
+
+    assert seen == {"a": "a", "b": "b", "c": "c"}
+    assert records.current_tag is None
+
+
+@pytest.mark.initiator
+def test_context_concurrent_initiators(httpbin):
+    def get1():
+        requests.get(f"{httpbin.url}/get?f=1")
+
+    def get2():
+        requests.get(f"{httpbin.url}/get?f=2")
+
+    with httprecord() as records:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(8):
+                executor.submit(get1)
+                executor.submit(get2)
+
+    assert len(records) == 16
+    for record in records.requests.values():
+        label = records.initiators[record.initiator_id].label
+        assert label.endswith(f'/get?f={record.url[-1]}")')
+
+
+@pytest.mark.group
+@pytest.mark.tag
+def test_context_propagated_to_executor(httpbin):
+    with httprecord() as records:
+        with httpdbg_group(records, "group", "group") as group:
+            with httpdbg_tag(records, "tag"):
+                with ThreadPoolExecutor() as executor:
+                    executor.submit(requests.get, f"{httpbin.url}/get").result()
+
+        with ThreadPoolExecutor() as executor:
+            executor.submit(requests.get, f"{httpbin.url}/get").result()
+
+    assert len(records) == 2
+    assert records[0].group_id == group.id
+    assert records[0].tag == "tag"
+    assert records[1].group_id != group.id
+    assert records[1].tag is None
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.records import HTTPRecords
+from httpdbg.server import httpdbg_srv
+from httpdbg.webapp.events import EventHub
+from httpdbg.webapp.events import EventSubscriber
+
+
+@pytest.mark.events
+def test_events_subscriber_merge():
+    subscriber = EventSubscriber()
+
+    subscriber.push(1, {"a"}, set(), set())
+    subscriber.push(2, set(), {"a", "b"}, set())
+    subscriber.push(3, set(), set(), {"b"})
+
+    assert subscriber.next(timeout=1) == {
+        "cursor": 3,
+        "created": ["a"],
+        "updated": ["a"],
+        "completed": ["b"],
+        "overflow": False,
+    }
+    assert subscriber.next(timeout=0.01) is None
+
+
+@pytest.mark.events
+def test_events_subscriber_overflow(monkeypatch):
+    monkeypatch.setattr(EventSubscriber, "MAX_IDS", 2)
+    subscriber = EventSubscriber()
+
+    # a slow client: the notifications are merged, only the cursor is kept
+    for i in range(10):
+        subscriber.push(i, {f"id{i}"}, set(), set())
+
+    changes = subscriber.next(timeout=1)
+    assert changes["overflow"]
+    assert changes["cursor"] == 9
+    assert changes["created"] == []
+
+
+@pytest.mark.events
+def test_events_hub():
+    records = HTTPRecords()
+    hub = EventHub(records)
+    subscriber = hub.subscribe()
+    try:
+        record = HTTP1Record("initiator", "group")
+        records.add_request(record)
+        created = subscriber.next(timeout=5)
+
+        record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+        completed = subscriber.next(timeout=5)
+    finally:
+        hub.close()
+
+    assert created["created"] == [record.id]
+    assert completed["completed"] == [record.id]
+    assert completed["cursor"] > created["cursor"]
+    assert subscriber.closed
+
+
+@pytest.mark.api
+@pytest.mark.events
+def test_events_stream(httpbin, httpdbg_host, httpdbg_port, monkeypatch):
+    monkeypatch.setattr(EventHub, "HEARTBEAT", 0.5)
+
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        url = f"http://{httpdbg_host}:{httpdbg_port}"
+        with requests.get(f"{url}/events", stream=True, timeout=10) as stream:
+            lines = stream.iter_lines(chunk_size=1, decode_unicode=True)
+            assert next(lines) == "retry: 1000"
+
+            # the other requests are served while the stream is open
+            assert requests.get(f"{url}/stats").status_code == 200
+
+            with httprecord(records):
+                requests.get(httpbin.url + "/get")
+
+            received = []
+            for line in lines:
+                received.append(line)
+                if line.startswith("data: "):
+                    changes = json.loads(line[len("data: ") :])
+                    if records[0].id in changes["completed"]:
+                        break
+
+            # nothing changes: a heartbeat
+            for line in lines:
+                if line:
+                    heartbeat = line
+                    break
+
+    assert "event: changes" in received
+    assert heartbeat == ": heartbeat"
+
+
+@pytest.mark.api
+@pytest.mark.events
+def test_events_too_many_streams(httpdbg_host, httpdbg_port, monkeypatch):
+    monkeypatch.setattr(EventHub, "MAX_SUBSCRIBERS", 1)
+
+    with httpdbg_srv(httpdbg_host, httpdbg_port):
+        url = f"http://{httpdbg_host}:{httpdbg_port}/events"
+        with requests.get(url, stream=True, timeout=10) as stream:
+            refused = requests.get(url, timeout=10)
+
+    assert stream.status_code == 200
+    # the web interface polls the changes instead
+    assert refused.status_code == 503
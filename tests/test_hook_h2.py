@@ -33,6 +33,8 @@ def test_h2(httpbin2):
     assert http_record.status_code == 200
     assert http_record.reason.upper() == "OK"
     assert http_record.protocol == "HTTP/2"
+    # the end of the stream has been recorded
+    assert http_record.complete
 
 
 @pytest.mark.initiator
@@ -313,3 +315,28 @@ def test_h2_server_response(httpbin2):
         json.loads(http_record.response.content).get("args", {}).get("azerty") == "33"
     )
     assert json.loads(http_record.response.content).get("data") == "def"
+
+
+@pytest.mark.h2
+def test_h2_streams_evicted(httpbin2):
+    with httprecord() as records:
+        with httpx.Client(http2=True, verify=False) as client:
+            for _ in range(3):
+                client.get(f"{httpbin2}/get")
+            streams = dict(records._tracerhttp2.sockets)
+
+    assert len(records) == 3
+    assert streams == {}
+    assert records[0].response.content
+
+
+@pytest.mark.h2
+def test_h2_connection_reuse(httpbin2):
+    with httprecord() as records:
+        with httpx.Client(http2=True, verify=False) as client:
+            for _ in range(3):
+                client.get(f"{httpbin2}/get")
+
+    assert len(records) == 3
+    assert len({record.connection_id for record in records}) == 1
+    assert [record.connection_sequence for record in records] == [1, 2, 3]
@@ -240,3 +240,33 @@ def test_requests_many_requests_session(httpbin_both):
     assert records[2].request.content == b"abc"
     assert records[3].url == f"{httpbin_both.url}/get"
     assert records[3].request.content == b""
+
+
+@pytest.mark.requests
+def test_requests_sockets_evicted(httpbin):
+    with httprecord() as records:
+        for _ in range(10):
+            with requests.Session() as session:
+                session.get(f"{httpbin.url}/get")
+        client_sockets = [
+            socketdata
+            for socketdata in records._tracerhttp1.sockets.values()
+            if socketdata and socketdata.record and socketdata.record.is_client
+        ]
+
+    assert len(records) == 10
+    assert client_sockets == []
+
+
+@pytest.mark.requests
+def test_requests_timing_https(httpbin_secure):
+    with httprecord() as records:
+        requests.get(f"{httpbin_secure.url}/get", verify=False)
+
+    assert len(records) == 1
+
+    timing = records[0].timing.to_json()
+    assert timing["connect"] is not None
+    assert timing["tls"] is not None
+    assert timing["ttfb"] is not None
+    assert records[0].timing.duration >= timing["connect"] + timing["tls"]
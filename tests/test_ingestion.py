@@ -0,0 +1,129 @@
+import pickle
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.ingestion import IngestionQueue
+
+
+@pytest.mark.ingestion
+def test_ingestion_disabled():
+    ingestion = IngestionQueue()
+    record = HTTP1Record("initiator", "group")
+
+    ingestion.send(record, b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+
+    assert not ingestion.enabled
+    assert record.request.uri == "/"
+    assert ingestion.processed == 0
+
+
+@pytest.mark.ingestion
+def test_ingestion_background():
+    ingestion = IngestionQueue(size=16)
+    record = HTTP1Record("initiator", "group")
+
+    ingestion.send(record, b"GET / HTTP/1.1\r\n")
+    ingestion.send(record, bytearray(b"Host: localhost\r\n\r\n"))
+    ingestion.receive(record, b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+    assert ingestion.flush(timeout=5)
+
+    assert record.request.uri == "/"
+    assert record.response.status_code == 200
+    assert record.response.content == b"ok"
+    assert record.timing.request_start <= record.timing.response_end
+    assert ingestion.processed == 3
+
+
+@pytest.mark.ingestion
+def test_ingestion_drop():
+    ingestion = IngestionQueue(size=2, policy=IngestionQueue.DROP)
+    record = HTTP1Record("initiator", "group")
+    ingestion._start_worker = lambda: None  # the queue is not processed
+
+    for _ in range(5):
+        ingestion.send(record, b"abc")
+
+    assert ingestion.dropped == 3
+    assert ingestion.dropped_bytes == 9
+    assert ingestion.to_json()["pending"] == 2
+
+
+@pytest.mark.ingestion
+def test_ingestion_drop_incomplete_record():
+    ingestion = IngestionQueue(size=2, policy=IngestionQueue.DROP)
+    record = HTTP1Record("initiator", "group", is_client=False)
+    other = HTTP1Record("initiator", "group", is_client=False)
+    ingestion._start_worker = lambda: None  # the queue is not processed
+
+    ingestion.receive(record, b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\n")
+    ingestion.receive(record, b"he")
+    ingestion.receive(record, b"l")  # the queue is full
+    del ingestion._start_worker
+    ingestion._start_worker()
+    ingestion.flush(timeout=5)
+    # the queue has been processed but the data of the record would have a gap
+    ingestion.receive(record, b"lo")
+    ingestion.receive(other, b"GET / HTTP/1.1\r\n\r\n")
+    ingestion.flush(timeout=5)
+
+    assert record.incomplete
+    assert record.request.content == b"he"
+    assert record.complete
+    assert not record.in_progress
+    assert not other.incomplete
+    assert ingestion.dropped == 2
+    assert ingestion.dropped_bytes == 3
+
+
+@pytest.mark.ingestion
+def test_ingestion_wait():
+    ingestion = IngestionQueue(size=2, policy=IngestionQueue.WAIT)
+    record = HTTP1Record("initiator", "group", is_client=False)
+
+    ingestion.receive(record, b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\n")
+    for c in b"hello":
+        ingestion.receive(record, bytes([c]))
+    ingestion.flush(timeout=5)
+
+    assert ingestion.dropped == 0
+    assert record.request.content == b"hello"
+
+
+@pytest.mark.ingestion
+def test_ingestion_unknown_policy():
+    with pytest.raises(ValueError):
+        IngestionQueue(size=1, policy="ignore")
+
+
+@pytest.mark.ingestion
+def test_ingestion_pickle():
+    ingestion = IngestionQueue(size=8, policy=IngestionQueue.WAIT)
+    ingestion.send(HTTP1Record("initiator", "group"), b"GET / HTTP/1.1\r\n\r\n")
+    ingestion.flush(timeout=5)
+
+    copy = pickle.loads(pickle.dumps(ingestion))
+
+    assert copy.to_args() == {"size": 8, "policy": "wait"}
+    assert copy.processed == 1
+    assert copy.flush(timeout=5)
+
+
+@pytest.mark.ingestion
+def test_ingestion_http1_keep_alive(httpbin):
+    with httprecord(ingestion=IngestionQueue(size=1024)) as records:
+        with requests.Session() as session:
+            for i in range(5):
+                session.post(f"{httpbin.url}/post?i={i}", data=b"x" * 1024)
+
+    assert [record.url for record in records] == [
+        f"{httpbin.url}/post?i={i}" for i in range(5)
+    ]
+    for record in records:
+        assert record.status_code == 200
+        assert record.request.content == b"x" * 1024
+        assert record.response.complete
+        assert record.timing.to_json()["total"] is not None
+    assert records.ingestion.dropped == 0
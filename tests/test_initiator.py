@@ -22,17 +22,10 @@ def test_initiator_script(httpbin):
 
     assert initiator.label == 'requests.get(f"{httpbin.url}/get")'
 
-    assert (
-        '''test_initiator.py", line 18, in test_initiator_script
+    assert """test_initiator.py", line 18, in test_initiator_script
  18.         requests.get(f"{httpbin.url}/get")
-----------
-requests.api.get(
-    url="'''
-        + f"{httpbin.url}/get"
-        + """",
-)"""
-        in initiator.short_stack
-    )
+""" in initiator.short_stack
+    assert records[0].call.text == f'requests.api.get(\n    url="{httpbin.url}/get",\n)'
 
     full_stack_ref = """test_initiator.py", line 18, 
  14. @pytest.mark.initiator
@@ -53,20 +46,54 @@ requests.api.get(
 
 
 @pytest.mark.initiator
-def test_initiator_same_line_different_initiators(httpbin):
+def test_initiator_same_line_same_initiator(httpbin):
     with httprecord() as records:
         for i in range(2):
             requests.get(f"{httpbin.url}/get")
 
     assert len(records) == 2
+    assert len(records.initiators) == 1
 
-    assert records[0].initiator_id != records[1].initiator_id
+    assert records[0].initiator_id == records[1].initiator_id
+    assert records[0].group_id != records[1].group_id
     assert (
-        records.initiators[records[0].initiator_id]
-        == records.initiators[records[1].initiator_id]
+        records.groups[records[0].group_id].full_label
+        is records.groups[records[1].group_id].full_label
     )
 
 
+@pytest.mark.initiator
+def test_initiator_same_line_different_arguments(httpbin):
+    with httprecord() as records:
+        for i in range(2):
+            requests.get(f"{httpbin.url}/get?i={i}")
+
+    assert len(records) == 2
+    assert len(records.initiators) == 1
+    assert records[0].initiator_id == records[1].initiator_id
+    # the arguments are kept by each record
+    assert "/get?i=0" in records[0].call.text
+    assert "/get?i=1" in records[1].call.text
+    assert records.initiators[records[0].initiator_id].call is None
+
+
+@pytest.mark.initiator
+def test_initiator_same_line_different_callables(httpbin):
+    with httprecord() as records:
+        for method in (requests.get, requests.head):
+            method(f"{httpbin.url}/get")
+
+    assert len(records) == 2
+    assert len(records.initiators) == 2
+
+    initiator0 = records.initiators[records[0].initiator_id]
+    initiator1 = records.initiators[records[1].initiator_id]
+    assert initiator0 != initiator1
+    assert initiator0.label == initiator1.label
+    # the frames of the stacks are shared
+    assert initiator0._frames[-1] is initiator1._frames[-1]
+
+
 @pytest.mark.initiator
 def test_initiator_redirection_same_initiator(httpbin):
     with httprecord() as records:
@@ -175,4 +202,137 @@ def test_exception_in_initiator(httpbin):
         get(br)
 
     assert records.initiators[records[0].initiator_id].label == "get(br)"
-    assert "br=-?-" in records.initiators[records[0].initiator_id].short_stack
+    assert "br=-?-" in records[0].call.text
+
+
+@pytest.mark.initiator
+def test_initiator_not_rendered_without_request(httpbin):
+    class Spy:
+        rendered = 0
+
+        def __str__(self):
+            Spy.rendered += 1
+            return "spy"
+
+    with httprecord(initiators=["tests.initiator_pck"]) as records:
+        from tests.initiator_pck.lazy import fnc_with_request
+        from tests.initiator_pck.lazy import fnc_without_request
+
+        fnc_without_request(Spy())
+
+        assert Spy.rendered == 0
+        assert records.initiators == {}
+        assert records.groups == {}
+
+        fnc_with_request(f"{httpbin.url}/get")
+
+    assert len(records) == 1
+    assert len(records.initiators) == 1
+    assert len(records.groups) == 1
+    assert (
+        records.initiators[records[0].initiator_id].label
+        == 'fnc_with_request(f"{httpbin.url}/get")'
+    )
+
+
+@pytest.mark.initiator
+def test_source_cache_invalidated(tmp_path):
+    import os
+
+    from httpdbg import initiator
+
+    filename = str(tmp_path / "mod.py")
+    with open(filename, "w") as f:
+        f.write("a = 1\nrequests.get(url)\n")
+
+    instruction, _, _ = initiator.extract_short_stack_from_file(filename, 2)
+    assert instruction == "requests.get(url)"
+
+    misses = initiator._source_cache.misses
+    initiator.extract_short_stack_from_file(filename, 2)
+    assert initiator._source_cache.misses == misses
+
+    with open(filename, "w") as f:
+        f.write("a = 1\nrequests.post(url)\n")
+    os.utime(filename, ns=(0, os.stat(filename).st_mtime_ns + 1_000_000_000))
+    initiator._source_files.pop(filename)  # as if the file was checked 1s ago
+
+    instruction, _, _ = initiator.extract_short_stack_from_file(filename, 2)
+    assert instruction == "requests.post(url)"
+
+    os.remove(filename)
+    initiator._source_files.pop(filename)
+
+    assert initiator.extract_short_stack_from_file(filename, 2) == ("", "", "")
+
+
+@pytest.mark.initiator
+def test_lru_cache_bounded():
+    from httpdbg.utils import LRUCache
+
+    cache = LRUCache(max_entries=3, max_size=10)
+
+    for i in range(4):
+        cache.set(i, str(i), 1)
+
+    assert len(cache) == 3
+    assert cache.get(0) is None
+    assert cache.get(1) == "1"
+
+    cache.set("big", "x" * 9, 9)  # the least recently used entries are evicted
+
+    assert cache.get(1) == "1"
+    assert cache.get(2) is None
+    assert cache.get(3) is None
+    assert cache.size == 10
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+@pytest.mark.initiator
+def test_initiator_key_not_rendered():
+    from httpdbg.argsrepr import ArgsRepr
+    from httpdbg.initiator import get_frames
+    from httpdbg.initiator import Initiator
+
+    frames = get_frames()
+    initiator0 = Initiator.from_call(frames, requests.get, ("a",), {}, ArgsRepr())
+    initiator1 = Initiator.from_call(frames, requests.get, ("b",), {}, ArgsRepr())
+
+    assert initiator0.key == initiator1.key
+    # neither the stack nor the arguments have been rendered
+    assert initiator0._pending is not None
+    assert initiator0.call._pending is not None
+
+
+@pytest.mark.initiator
+def test_initiator_shallow_script(httpbin, tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    # the request is sent by the first frame of the main thread: no frame to skip
+    script = tmp_path / "shallow.py"
+    script.write_text("""import sys
+import requests
+from httpdbg.hooks.all import httprecord
+
+with httprecord() as records:
+    requests.get(sys.argv[1])
+
+print(records.initiators[records[0].initiator_id].label)
+""")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    label = subprocess.run(
+        [sys.executable, str(script), f"{httpbin.url}/get"],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    ).stdout.strip()
+
+    assert label == "requests.get(sys.argv[1])"
@@ -0,0 +1,75 @@
+import logging
+import os
+import platform
+import subprocess
+import sys
+
+import pytest
+
+from httpdbg.env import HTTPDBG_LOG_LEVEL
+from httpdbg.env import HTTPDBG_LOG_PATH
+
+# the logger is configured once by process: the logs are written by a new process
+SCRIPT = """
+import os
+import sys
+
+import requests
+
+from httpdbg import httprecord
+from httpdbg.log import log_debug
+from httpdbg.log import log_info
+from httpdbg.log import logger
+
+print(log_info(), log_debug())
+
+with httprecord():
+    requests.get(sys.argv[1])
+
+if hasattr(os, "fork"):
+    pid = os.fork()
+    if pid == 0:
+        # no background thread in the child: the record is written directly
+        logger().info(f"from the child {os.getpid()}")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    print(pid)
+"""
+
+
+def _run(httpbin, log_path, log_level):
+    env = dict(os.environ)
+    env[HTTPDBG_LOG_PATH] = str(log_path)
+    env[HTTPDBG_LOG_LEVEL] = str(log_level)
+    return subprocess.run(
+        [sys.executable, "-c", SCRIPT, f"{httpbin.url}/get"],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=True,
+    ).stdout.split()
+
+
+@pytest.mark.log
+def test_log_file(httpbin, tmp_path):
+    log_path = tmp_path / "httpdbg.log"
+
+    output = _run(httpbin, log_path, logging.INFO)
+
+    assert output[:2] == ["True", "False"]
+    # written by the background thread, until it's stopped at exit
+    logs = log_path.read_text(encoding="utf-8")
+    assert "[INFO] SocketRawData" in logs
+    if platform.system().lower() != "windows":
+        assert f"({output[2]}) [INFO] from the child {output[2]}" in logs
+
+
+@pytest.mark.log
+def test_log_file_level(httpbin, tmp_path):
+    log_path = tmp_path / "httpdbg.log"
+
+    output = _run(httpbin, log_path, logging.WARNING)
+
+    assert output[:2] == ["False", "False"]
+    assert log_path.read_text(encoding="utf-8") == ""
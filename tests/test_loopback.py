@@ -0,0 +1,71 @@
+import socket
+
+import pytest
+
+from httpdbg.hooks.loopback import LoopbackGroups
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.initiator import Group
+from httpdbg.records import HTTPRecords
+
+
+@pytest.fixture()
+def connection():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    server, _ = listener.accept()
+    try:
+        yield client, server
+    finally:
+        for sock in (server, client, listener):
+            sock.close()
+
+
+@pytest.mark.server_requests
+@pytest.mark.group
+def test_loopback_group(connection):
+    client, server = connection
+    loopback = LoopbackGroups()
+    assert loopback.group(server) is None
+
+    loopback.track(client, HTTP1Record("initiator", "group1"))
+    assert loopback.group(server) == "group1"
+
+    # a new request on the same connection
+    loopback.track(client, HTTP1Record("initiator", "group2"))
+    assert loopback.group(server) == "group2"
+
+    loopback.untrack(id(client))
+    assert loopback.group(server) is None
+
+
+@pytest.mark.server_requests
+@pytest.mark.group
+def test_loopback_other_peer(connection):
+    client, server = connection
+    loopback = LoopbackGroups()
+
+    # the server side of a connection is not the peer of the client side
+    loopback.track(server, HTTP1Record("initiator", "group"))
+    assert loopback.group(server) is None
+    assert loopback.group(object()) is None
+
+
+@pytest.mark.server_requests
+@pytest.mark.group
+def test_loopback_join(connection):
+    client, server = connection
+    loopback = LoopbackGroups()
+    records = HTTPRecords()
+    group = Group("label", "full label", updatable=True)
+    records.groups[group.id] = group
+
+    loopback.track(client, HTTP1Record("initiator", "unknown group"))
+    loopback.join(records, server)
+    assert records.current_group is None
+
+    loopback.track(client, HTTP1Record("initiator", group.id))
+    loopback.join(records, server)
+    assert records.current_group == group.id
+    records.current_group = None
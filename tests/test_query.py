@@ -0,0 +1,167 @@
+import datetime
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.query import RecordQuery
+from httpdbg.records import HTTPRecords
+from httpdbg.server import httpdbg_srv
+from httpdbg.store import RecordStore
+
+
+def _record(records, host, method, status, tag=None, seconds=0, duration=0):
+    tbegin = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    record = HTTP1Record(
+        "initiator", "group", tag=tag, tbegin=tbegin + datetime.timedelta(0, seconds)
+    )
+    record.send_data(f"{method} / HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    records.add_request(record)
+    if status:
+        record.receive_data(
+            f"HTTP/1.1 {status} X\r\nContent-Length: 0\r\n\r\n".encode()
+        )
+        record.timing.request_start = 1
+        record.timing.response_end = 1 + duration * 1_000_000
+    return record
+
+
+@pytest.fixture()
+def records():
+    records = HTTPRecords()
+    _record(records, "a.com", "GET", 200, seconds=0, duration=30)
+    _record(records, "a.com", "POST", 500, tag="t", seconds=1, duration=10)
+    _record(records, "b.com", "GET", 503, seconds=2, duration=20)
+    _record(records, "b.com", "GET", 404, tag="t", seconds=3, duration=40)
+    return records
+
+
+@pytest.mark.query
+def test_query_criteria():
+    query = RecordQuery(method="get", status=404, sort="-duration")
+
+    assert query.method == "GET"
+    assert query.status == "4xx"
+    assert query.status_code == 404
+    assert query.sort == "duration"
+    assert query.descending
+
+    with pytest.raises(ValueError):
+        RecordQuery(status="bad")
+    with pytest.raises(ValueError):
+        RecordQuery(sort="unknown")
+
+
+@pytest.mark.query
+def test_query_from_query_string():
+    query = RecordQuery.from_query_string(
+        {"status": ["5xx"], "after": ["2026-01-01T00:00:00"], "limit": ["10"]}
+    )
+
+    assert query.status == "5xx"
+    assert query.since == datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    assert query.limit == 10
+
+
+@pytest.mark.query
+def test_query_indexes(records):
+    def urls(found):
+        return [
+            f"{record.method} {record.netloc} {record.status_code}" for record in found
+        ]
+
+    assert urls(records.query(status="5xx")) == [
+        "POST http://a.com 500",
+        "GET http://b.com 503",
+    ]
+    assert urls(records.query(netloc="http://b.com", method="GET", status=404)) == [
+        "GET http://b.com 404"
+    ]
+    assert urls(records.query(tag="t", sort="-duration")) == [
+        "GET http://b.com 404",
+        "POST http://a.com 500",
+    ]
+    assert len(records.query(sort="duration", offset=1, limit=2)) == 2
+    assert records.query(sort="duration", limit=1)[0].status_code == 500
+
+
+@pytest.mark.query
+def test_query_time_range(records):
+    since = records[1].tbegin
+    until = records[2].tbegin
+
+    assert [record.seq for record in records.query(since=since, until=until)] == [2, 3]
+    assert [record.seq for record in records.query(since=since, method="GET")] == [
+        3,
+        4,
+    ]
+
+
+@pytest.mark.query
+def test_query_record_in_progress(records):
+    record = _record(records, "c.com", "GET", 0, seconds=4)
+
+    # not complete: matched without the netloc index
+    assert records.query(netloc="http://c.com") == [record]
+    assert records.query(status="2xx")[0].netloc == "http://a.com"
+
+    record.receive_data(b"HTTP/1.1 201 Created\r\nContent-Length: 0\r\n\r\n")
+
+    assert records.query(status="2xx")[1] is record
+    assert records._indexes["netloc"]["http://c.com"] == {record.id}
+
+
+@pytest.mark.query
+def test_query_set_group(records):
+    record = records[1]
+    records.set_group(record, "endpoint")
+
+    assert records.query(group="endpoint") == [record]
+    assert record not in records.query(group="group")
+    assert len(records.query(group="group")) == 3
+
+
+@pytest.mark.query
+def test_query_evicted(records):
+    records.evict(records[2].tbegin)
+
+    assert [record.status_code for record in records.query(status="5xx")] == [503]
+    assert "http://a.com" not in records._indexes["netloc"]
+
+
+@pytest.mark.api
+@pytest.mark.query
+def test_query_api(httpbin, httpdbg_host, httpdbg_port):
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records):
+            requests.get(httpbin.url + "/status/200")
+            requests.get(httpbin.url + "/status/503")
+            requests.post(httpbin.url + "/status/500")
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}/requests"
+        errors = requests.get(url, params={"status": "5xx", "method": "get"}).json()
+        bad = requests.get(url, params={"sort": "size"})
+
+    assert errors["total"] == 1
+    assert list(errors["requests"]) == [records[1].id]
+    assert bad.status_code == 400
+
+
+@pytest.mark.query
+@pytest.mark.store
+def test_query_store(tmp_path):
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+    records = HTTPRecords(store=store)
+    _record(records, "a.com", "GET", 200, seconds=0, duration=30)
+    _record(records, "a.com", "POST", 500, tag="t", seconds=1, duration=10)
+    _record(records, "b.com", "GET", 503, seconds=2, duration=20)
+    assert store.flush(timeout=5)
+
+    query = RecordQuery(status="5xx", sort="-status_code")
+    found = store.list_requests(records.session.id, query)
+
+    assert [summary["status_code"] for summary in found.values()] == [503, 500]
+    assert store.count(records.session.id, query) == 2
+    assert store.count(records.session.id, RecordQuery(netloc="http://a.com")) == 2
+    assert store.count(records.session.id, RecordQuery(since=records[1].tbegin)) == 2
@@ -0,0 +1,759 @@
+import datetime
+import pickle
+import socket
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.hooks.h2 import TracerHTTP2
+from httpdbg.hooks.record import HTTPRecordTiming
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.hooks.recordhttp2 import HTTP2Record
+from httpdbg.initiator import Group
+from httpdbg.initiator import Initiator
+from httpdbg.records import HTTPRecords
+from httpdbg.retention import RetentionPolicy
+from httpdbg.utils import HTTPDBGBuffer
+
+
+@pytest.mark.records
+def test_buffer_append():
+    buffer = HTTPDBGBuffer(b"abc")
+    assert buffer.getvalue() == b"abc"
+
+    buffer.append(b"def")
+    buffer.append(memoryview(b"ghi"))
+    buffer.append(b"")
+
+    assert len(buffer) == 9
+    assert buffer.getvalue() == b"abcdefghi"
+    assert buffer.find(b"def") == 3
+    assert buffer[:3] == b"abc"
+    # a copy is not kept with the buffer
+    assert buffer.getvalue() is not buffer.getvalue()
+
+    buffer.clear()
+    assert not buffer
+    assert buffer.getvalue() == b""
+
+
+@pytest.mark.records
+def test_buffer_pickle():
+    buffer = HTTPDBGBuffer(b"abc")
+    buffer.getvalue()
+
+    copy = pickle.loads(pickle.dumps(buffer))
+    copy.append(b"def")
+
+    assert copy.getvalue() == b"abcdef"
+
+
+@pytest.mark.records
+def test_http1_record_chunked_reception():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"POST /post HTTP/1.1\r\nHost: localhost\r\nContent-Length: 6\r\n")
+    record.send_data(b"\r\nabc")
+    record.send_data(b"def")
+
+    for chunk in (b"HTTP/1.1 200 OK\r\n", b"Content-Length: 5\r\n\r\n", b"12", b"345"):
+        record.receive_data(chunk)
+
+    assert record.url == "http://localhost/post"
+    assert record.request.content == b"abcdef"
+    assert record.status_code == 200
+    assert record.response.content == b"12345"
+
+
+@pytest.mark.records
+def test_http1_record_http100():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"POST /post HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 100 Continue\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 201 Created\r\nContent-Length: 0\r\n\r\n")
+
+    assert record.http100
+    assert record.status_code == 201
+
+
+@pytest.mark.records
+def test_http1_record_headers_case_insensitive():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+    assert record.request.get_header("host", "-") == "-"  # not yet received
+
+    record.send_data(b"Cookie: a=1; b=2\r\nX-Dup: first\r\nx-dup: second\r\n\r\n")
+
+    assert record.request.get_header("HOST") == "localhost"
+    assert record.request.get_header("x-DUP") == "first"
+    assert record.request.get_header("missing", "default") == "default"
+    assert record.url == "http://localhost/"
+
+    cookies = record.request.cookies
+    assert [cookie.name for cookie in cookies] == ["a", "b"]
+    assert record.request.cookies is cookies  # parsed once
+
+
+@pytest.mark.records
+def test_http1_record_headers_reset():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"POST /post HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 100 Continue\r\n\r\n")
+    assert record.response.cookies == []
+
+    record.receive_data(
+        b"HTTP/1.1 201 Created\r\nSet-Cookie: a=1; Path=/\r\nContent-Length: 0\r\n\r\n"
+    )
+
+    assert record.response.get_header("Content-Length") == "0"
+    assert [cookie.name for cookie in record.response.cookies] == ["a"]
+
+
+@pytest.mark.records
+def test_http2_record_headers_case_insensitive():
+    record = HTTP2Record("initiator", "group")
+    assert record.response.status_code == 0
+
+    record.response.headers = [(b":status", b"200"), (b"content-type", b"text/plain")]
+
+    assert record.response.status_code == 200
+    assert record.response.get_header("Content-Type") == "text/plain"
+
+
+@pytest.mark.records
+def test_http2_record_chunked_reception():
+    record = HTTP2Record("initiator", "group")
+    for chunk in (b"ab", b"cd", b"ef"):
+        record.receive_data(chunk)
+
+    assert record.response.content == b"abcdef"
+
+
+@pytest.mark.records
+def test_http2_record_complete_at_end_of_stream():
+    tracer = TracerHTTP2()
+    record = HTTP2Record("initiator", "group")
+    tracer.link_record(1, 1, record)
+    record.response.headers = [(b":status", b"200")]
+    record.receive_data(b"ab")
+
+    # no Content-Length: the body may still grow
+    assert not record.complete
+
+    # the client ends its side of the stream: the response is still expected
+    tracer.end_stream(1, 1, received=False)
+    assert not record.complete
+
+    updated = record.updated
+    time.sleep(0.01)
+    tracer.end_stream(1, 1, received=True)
+    assert record.complete
+    assert record.updated > updated
+
+    reset = HTTP2Record("initiator", "group")
+    tracer.link_record(1, 3, reset)
+    tracer.reset_stream(1, 3)
+    assert reset.complete
+
+
+@pytest.mark.records
+def test_http1_record_content_length_in_progress():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    assert record.request.complete
+    assert not record.in_progress
+
+    record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 6\r")
+    assert not record.in_progress  # the headers are not complete
+    record.receive_data(b"\n\r\nabc")
+    assert record.in_progress
+    assert record.response.content == b"abc"
+    assert record.response.tend is None
+
+    record.receive_data(b"def")
+    assert not record.in_progress
+    assert record.response.complete
+    assert record.response.tend is not None
+    assert record.response.content == b"abcdef"
+
+
+@pytest.mark.records
+def test_http1_record_chunked_in_progress():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+
+    data = (
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+        b"5;ext=1\r\nhello\r\n"
+        b"1\r\n \r\n"
+        b"5\r\nworld\r\n"
+        b"0\r\nTrailer: value\r\n\r\n"
+    )
+    # the data are received byte by byte to check all the parser states
+    for i in range(len(data) - 1):
+        record.receive_data(data[i : i + 1])
+        if i > data.find(b"\r\n\r\n") + 3:
+            assert record.in_progress
+
+    record.receive_data(data[-1:])
+
+    assert not record.in_progress
+    assert record.response.content == b"hello world"
+
+
+@pytest.mark.records
+def test_http1_record_chunked_malformed():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\nhello\r\n"
+    )
+
+    assert not record.in_progress
+    assert record.response.content == b""
+
+
+@pytest.mark.records
+def test_http1_record_no_body():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"HEAD / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 1234\r\n\r\n")
+
+    assert record.response.complete
+    assert not record.in_progress
+    assert record.response.content == b""
+
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 304 Not Modified\r\nContent-Length: 1234\r\n\r\n")
+
+    assert record.response.complete
+    assert not record.in_progress
+
+
+@pytest.mark.records
+def test_http1_record_read_until_close():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.0 200 OK\r\n\r\nabc")
+    record.receive_data(b"def")
+
+    assert not record.response.complete
+    assert not record.in_progress
+    assert record.response.content == b"abcdef"
+
+
+@pytest.mark.records
+def test_http1_record_read_until_close_connection_closed():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.0 200 OK\r\n\r\nabc")
+
+    record.connection_closed()
+
+    assert record.response.complete
+    assert record.response.tend is not None
+    assert record.response.content == b"abc"
+
+
+@pytest.mark.records
+def test_http1_record_max_body_size():
+    record = HTTP1Record("initiator", "group", max_body_size=4)
+    record.send_data(
+        b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 3\r\n\r\nabc"
+    )
+    record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n0123")
+    record.receive_data(b"456789")
+
+    assert record.request.content == b"abc"
+    assert not record.request.truncated
+
+    assert record.response.content == b"0123"
+    assert record.response.truncated
+    assert record.response.body_length == 10
+    assert record.response.get_header("Content-Length") == "10"
+    assert record.status_code == 200
+    assert not record.in_progress
+
+
+@pytest.mark.records
+def test_http1_record_max_body_size_chunked():
+    record = HTTP1Record("initiator", "group", max_body_size=4)
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n3\r\ndef\r\n"
+    )
+    assert record.in_progress
+    record.receive_data(b"0\r\n\r\n")
+
+    assert record.response.content == b"abcd"
+    assert record.response.truncated
+    assert record.response.body_length == 6
+    assert not record.in_progress
+
+
+@pytest.mark.records
+def test_http2_record_max_body_size():
+    record = HTTP2Record("initiator", "group", max_body_size=4)
+    record.response.headers = [(b":status", b"200"), (b"content-length", b"6")]
+    for chunk in (b"ab", b"cd", b"ef"):
+        record.receive_data(chunk)
+
+    assert record.response.content == b"abcd"
+    assert record.response.truncated
+    assert record.response.body_length == 6
+    assert not record.in_progress
+
+
+@pytest.mark.records
+def test_http1_record_timing():
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 3\r\n\r\n")
+    record.receive_data(b"abc")
+
+    timing = record.timing
+    assert 0 < timing.request_start <= timing.request_end
+    assert timing.request_end <= timing.response_start < timing.response_end
+    assert timing.to_json()["connect"] is None
+    assert timing.to_json()["ttfb"] >= 0
+    assert timing.duration == timing.to_json()["total"]
+
+
+@pytest.mark.records
+def test_http_record_timing_phases():
+    timing = HTTPRecordTiming()
+    timing.connect_start = 1_000_000
+    timing.connect_end = 3_000_000
+    timing.tls_start = 3_000_000
+    timing.tls_end = 6_000_000
+    timing.request_start = 6_000_000
+    timing.request_end = 7_000_000
+    timing.response_start = 17_000_000
+    timing.response_end = 20_000_000
+
+    assert timing.to_json() == {
+        "connect": 2.0,
+        "tls": 3.0,
+        "send": 1.0,
+        "wait": 10.0,
+        "ttfb": 11.0,
+        "receive": 3.0,
+        "total": 19.0,
+    }
+
+
+@pytest.mark.records
+def test_http1_connection_reuse():
+    request = b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"
+    response = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"
+
+    with httprecord() as records:
+        client, server = socket.socketpair()
+        with client, server:
+            for _ in range(3):
+                client.sendall(request)
+                server.recv(1024)
+                server.sendall(response)
+                client.recv(1024)
+
+    assert len(records) == 3
+    assert len({record.connection_id for record in records}) == 1
+    assert [record.connection_sequence for record in records] == [1, 2, 3]
+    assert [record.new_connection for record in records] == [True, False, False]
+
+
+@pytest.mark.records
+def test_hook_stats(httpbin):
+    with httprecord() as records:
+        requests.get(httpbin.url + "/get")
+
+    assert records[0].overhead_ns > 0
+    assert records.stats.by_hook["socket_connect"][0] >= 1
+    assert records.stats.overhead_ns >= records[0].overhead_ns
+
+    records.reset()
+
+    assert records.stats.by_hook == {}
+
+
+@pytest.mark.records
+def test_hook_stats_pickle():
+    with httprecord() as records:
+        pass
+
+    records.stats.add("socket_send", 10)
+    stats = pickle.loads(pickle.dumps(records.stats))
+    stats.add("socket_send", 5)
+
+    assert stats.by_hook == {"socket_send": [2, 15]}
+
+
+@pytest.mark.records
+def test_hook_stats_threads():
+    with httprecord() as records:
+        pass
+
+    def add():
+        for _ in range(1000):
+            records.stats.add("socket_send", 1)
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records.stats.add("socket_send", 1)
+
+    assert records.stats.by_hook == {"socket_send": [4001, 4001]}
+    assert records.stats.nb_threads == 5
+    assert records.stats.to_json()["threads"] == 5
+
+    records.stats.reset()
+    records.stats.add("socket_recv", 1)
+
+    assert records.stats.by_hook == {"socket_recv": [1, 1]}
+
+
+@pytest.mark.records
+def test_records_pickle_slots(httpbin):
+    with httprecord() as records:
+        requests.get(httpbin.url + "/get")
+
+    record = records[0]
+    assert not hasattr(record, "__dict__")
+    assert not hasattr(record.request, "__dict__")
+    assert not hasattr(record.response.headers[0], "__dict__")
+
+    copy = pickle.loads(pickle.dumps(records))
+    copy_record = copy[0]
+
+    assert copy_record.url == record.url
+    assert copy_record.response.headers == record.response.headers
+    assert copy_record.last_update == record.last_update
+    assert (
+        copy.initiators[copy_record.initiator_id].label
+        == records.initiators[record.initiator_id].label
+    )
+    assert (
+        copy.groups[copy_record.group_id].label == records.groups[record.group_id].label
+    )
+
+
+@pytest.mark.records
+def test_records_ordered_by_tbegin():
+    records = HTTPRecords()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for i in (2, 0, 1):
+        records.add_request(
+            HTTP1Record(
+                "initiator", "group", tbegin=now + datetime.timedelta(seconds=i)
+            )
+        )
+
+    assert [record.tbegin for record in records] == [
+        now + datetime.timedelta(seconds=i) for i in range(3)
+    ]
+    assert [record.seq for record in records] == [2, 3, 1]
+    assert records[0].seq == 2
+    assert records[-1].seq == 1
+    assert [record.seq for record in records[1:]] == [3, 1]
+    assert len(records) == 3
+
+
+@pytest.mark.records
+def test_records_merge():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    records = HTTPRecords()
+    records.add_request(HTTP1Record("initiator", "group", tbegin=now))
+
+    subprocess_records = HTTPRecords()
+    record = HTTP1Record("initiator", "group", tbegin=now - datetime.timedelta(1))
+    subprocess_records.add_request(record)
+
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))  # updated
+
+    assert len(records) == 2
+    assert records[0].id == record.id
+    assert records[0].url == "http://localhost/"
+    assert records[1].tbegin == now
+
+
+@pytest.mark.records
+def test_records_merge_unchanged():
+    records = HTTPRecords()
+    subprocess_records = HTTPRecords()
+    record = HTTP1Record("initiator", "group")
+    subprocess_records.add_request(record)
+    subprocess_records.add_request(HTTP1Record("initiator", "group"))
+
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+    changed, cursor = records.changes()
+    assert len(changed) == 2
+
+    # the same dump is loaded again: nothing has changed
+    merged = records[0]
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+    assert records.changes(cursor) == ([], cursor)
+    assert records[0] is merged
+
+    # only the record updated in the subprocess
+    time.sleep(0.01)
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+    changed, _ = records.changes(cursor)
+    assert [record.url for record in changed] == ["http://localhost/"]
+    assert records[0].url == "http://localhost/"
+    assert len(records) == 2
+
+
+def _retained_records(retention, nb, **kwargs):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    records = HTTPRecords(retention=retention)
+    for i in range(nb):
+        initiator = Initiator(f"label {i}", f"short stack {i}")
+        group = Group(f"group {i}", "", False, initiator)
+        records.initiators[initiator.id] = initiator
+        records.groups[group.id] = group
+        record = HTTP1Record(
+            initiator.id, group.id, tbegin=now + datetime.timedelta(seconds=i)
+        )
+        record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        records.add_request(record)
+    return records
+
+
+@pytest.mark.retention
+def test_records_retention_max_records():
+    records = _retained_records(RetentionPolicy(max_records=3), 5)
+
+    assert len(records) == 3
+    assert [record.group_id for record in records] == list(records.groups)[-3:]
+    assert records.retention.evicted == 2
+
+    records.apply_retention(force=True)
+
+    # the initiators and the groups of the evicted records are removed too
+    assert len(records.initiators) == 3
+    assert len(records.groups) == 3
+
+
+@pytest.mark.retention
+def test_records_retention_max_records_batch():
+    records = _retained_records(RetentionPolicy(max_records=20), 22)
+
+    # evicted once the limit is exceeded by more than 10%
+    assert len(records) == 22
+    assert records.retention.evicted == 0
+
+    records.add_request(HTTP1Record("initiator", "group"))
+
+    assert len(records) == 20
+    assert records.retention.evicted == 3
+
+
+@pytest.mark.retention
+def test_records_retention_max_bytes():
+    size = len(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    records = _retained_records(RetentionPolicy(max_bytes=size * 2), 5)
+
+    records.apply_retention(force=True)
+
+    assert len(records) == 2
+    assert sum(record.size for record in records) == size * 2
+
+
+@pytest.mark.retention
+def test_records_retention_max_age():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    records = HTTPRecords(retention=RetentionPolicy(max_age=60))
+    records.add_request(HTTP1Record("a", "a", tbegin=now - datetime.timedelta(hours=1)))
+    records.add_request(HTTP1Record("b", "b", tbegin=now))
+
+    records.apply_retention(force=True)
+
+    assert [record.initiator_id for record in records] == ["b"]
+
+
+@pytest.mark.retention
+def test_records_retention_open_group():
+    records = HTTPRecords(retention=RetentionPolicy(max_records=1))
+    initiator = Initiator("label", "short stack")
+    group = Group("group", "", False, initiator)
+    records.add_initiator(initiator)
+    records.add_group(group)
+    records.add_request(HTTP1Record(initiator.id, group.id))
+    records.add_request(HTTP1Record("other", "other"))
+
+    records.apply_retention(force=True)
+
+    # the group is still open, a new request may be recorded in it
+    assert len(records) == 1
+    assert group.id in records.groups
+    assert initiator.id in records.initiators
+
+    records.close_group(group)
+    records.close_initiator(initiator, group)
+    records.apply_retention(force=True)
+
+    assert group.id not in records.groups
+    assert initiator.id not in records.initiators
+
+
+@pytest.mark.retention
+def test_records_evict_before():
+    records = _retained_records(RetentionPolicy(), 4)
+
+    assert records.evict(records[2].tbegin) == 2
+    assert len(records) == 2
+
+    # the evicted records are not restored by a dump from a subprocess
+    subprocess_records = HTTPRecords()
+    for label, tbegin in (
+        ("x", records[0].tbegin),
+        ("y", records[0].tbegin - datetime.timedelta(1)),
+    ):
+        initiator = Initiator(label, "")
+        group = Group(label, "", False)
+        subprocess_records.initiators[initiator.id] = initiator
+        subprocess_records.groups[group.id] = group
+        subprocess_records.add_request(
+            HTTP1Record(initiator.id, group.id, tbegin=tbegin)
+        )
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+
+    assert len(records) == 3
+    # the initiators and the groups of the evicted records are not merged
+    labels = {initiator.label for initiator in records.initiators.values()}
+    assert "x" in labels and "y" not in labels
+    labels = {group.label for group in records.groups.values()}
+    assert "x" in labels and "y" not in labels
+
+    assert records.evict() == 3
+    assert len(records) == 0
+    assert len(records.groups) == 0
+
+
+@pytest.mark.records
+def test_records_changes():
+    records = HTTPRecords()
+    first = HTTP1Record("initiator", "group")
+    first.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    records.add_request(first)
+    records.add_request(HTTP1Record("initiator", "group"))
+
+    changed, cursor = records.changes()
+    assert len(changed) == 2
+    assert records.changes(cursor) == ([], cursor)
+
+    # only the record updated after the cursor
+    time.sleep(0.01)
+    first.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+    changed, new_cursor = records.changes(cursor)
+    assert changed == [first]
+    assert new_cursor > cursor
+
+    # the complete records are not checked anymore
+    assert first.id not in records._unsettled
+
+
+@pytest.mark.records
+def test_records_changes_http2_stream():
+    records = HTTPRecords()
+    tracer = TracerHTTP2()
+    record = HTTP2Record("initiator", "group")
+    tracer.link_record(1, 1, record)
+    record.response.headers = [(b":status", b"200")]
+    records.add_request(record)
+    _, cursor = records.changes()
+
+    # the body is still received after the status: the record is not settled
+    for chunk in (b"ab", b"cd"):
+        time.sleep(0.01)
+        record.receive_data(chunk)
+        changed, cursor = records.changes(cursor)
+        assert changed == [record]
+
+    # the end of the stream is the last change
+    time.sleep(0.01)
+    tracer.end_stream(1, 1, received=True)
+    changed, cursor = records.changes(cursor)
+    assert changed == [record]
+    assert record.id not in records._unsettled
+    assert records._indexes["status"]["2xx"] == {record.id}
+
+
+@pytest.mark.records
+def test_records_unread():
+    records = HTTPRecords()
+    assert not records.unread
+
+    records.add_request(HTTP1Record("initiator", "group"))
+    _, cursor = records.changes()
+    assert records.unread
+
+    records.mark_loaded("tab1", 0)
+    records.mark_loaded("tab2", cursor)
+    assert not records.unread
+
+    # the cursors of the clients that do not poll anymore are not kept
+    for i in range(HTTPRecords.MAX_CLIENTS):
+        records.mark_loaded(f"other{i}", 0)
+    assert len(records._loaded) == HTTPRecords.MAX_CLIENTS
+    assert "tab2" not in records._loaded
+    assert not records.unread
+
+
+@pytest.mark.records
+def test_records_changes_version(monkeypatch):
+    records = HTTPRecords()
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    records.add_request(record)
+    _, cursor = records.changes()
+
+    # updated in the same clock tick: the timestamp does not change
+    monkeypatch.setattr(time, "time", lambda: record.updated)
+    record.incomplete = True
+    record.touch()
+    changed, _ = records.changes(cursor)
+
+    assert changed == [record]
+
+
+@pytest.mark.records
+def test_records_connections_summary_while_recording():
+    def new_record():
+        record = HTTP1Record("initiator", "group")
+        record.url = "http://localhost/"
+        record.connection_id = "connection"
+        return record
+
+    records = HTTPRecords()
+    for _ in range(1000):
+        records.add_request(new_record())
+
+    running = True
+
+    def record_requests():
+        while running:
+            records.add_request(new_record())
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # many thread switches during the iteration
+    thread = threading.Thread(target=record_requests)
+    thread.start()
+    try:
+        for _ in range(20):
+            summary = records.connections_summary()
+    finally:
+        running = False
+        thread.join()
+        sys.setswitchinterval(interval)
+
+    assert summary["http://localhost"]["connections"] == 1
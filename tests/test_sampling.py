@@ -0,0 +1,142 @@
+import http.client
+import pickle
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.records import HTTPRecords
+from httpdbg.sampling import SamplingPolicy
+
+
+@pytest.mark.sampling
+def test_sampling_disabled():
+    sampling = SamplingPolicy()
+
+    assert all(sampling.keep("netloc", "initiator") for _ in range(10))
+    assert sampling.sampled_out == 0
+
+
+@pytest.mark.sampling
+def test_sampling_every():
+    sampling = SamplingPolicy(every=3)
+
+    kept = [sampling.keep("netloc", "initiator") for _ in range(7)]
+
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampling.seen == 7
+    assert sampling.sampled_out == 4
+    assert sampling.sampled_out_by_netloc == {"netloc": 4}
+
+
+@pytest.mark.sampling
+def test_sampling_rate():
+    sampling = SamplingPolicy(rate=2)
+
+    kept = [sampling.keep("netloc1", "initiator") for _ in range(5)]
+    kept_other_netloc = sampling.keep("netloc2", "initiator")
+
+    assert kept == [True, True, False, False, False]
+    assert kept_other_netloc
+    assert sampling.sampled_out == 3
+
+
+@pytest.mark.sampling
+def test_sampling_first():
+    sampling = SamplingPolicy(first=2)
+
+    kept = [sampling.keep("netloc", "initiator1") for _ in range(4)]
+    kept_other_initiator = sampling.keep("netloc", "initiator2")
+
+    assert kept == [True, True, False, False]
+    assert kept_other_initiator
+
+
+@pytest.mark.sampling
+def test_sampling_pickle():
+    sampling = SamplingPolicy(every=2)
+    sampling.keep("netloc", "initiator")
+
+    copy = pickle.loads(pickle.dumps(sampling))
+
+    assert copy.seen == 1
+    assert copy.keep("netloc", "initiator") is False
+
+
+@pytest.mark.sampling
+def test_sampling_http1_keep_alive(httpbin):
+    with httprecord(sampling=SamplingPolicy(every=2)) as records:
+        with requests.Session() as session:
+            for i in range(5):
+                session.get(f"{httpbin.url}/get?i={i}")
+
+    assert len(records) == 3
+    assert [record.url for record in records] == [
+        f"{httpbin.url}/get?i=0",
+        f"{httpbin.url}/get?i=2",
+        f"{httpbin.url}/get?i=4",
+    ]
+    for record in records:
+        assert record.status_code == 200
+    assert records.sampling.seen == 5
+    assert records.sampling.sampled_out == 2
+
+
+@pytest.mark.sampling
+def test_sampling_http1_first_per_initiator(httpbin):
+    with httprecord(sampling=SamplingPolicy(first=1)) as records:
+        for i in range(3):
+            requests.get(f"{httpbin.url}/get?i={i}")
+        requests.get(f"{httpbin.url}/get?other")
+
+    assert [record.url for record in records] == [
+        f"{httpbin.url}/get?i=0",
+        f"{httpbin.url}/get?other",
+    ]
+
+
+@pytest.mark.sampling
+def test_sampling_http1_first_per_call_site(httpbin):
+    # no initiator exists yet when the socket hook samples the request
+    def get(path):
+        conn = http.client.HTTPConnection(httpbin.host, httpbin.port)
+        try:
+            conn.request("GET", path)
+            conn.getresponse().read()
+        finally:
+            conn.close()
+
+    with httprecord(sampling=SamplingPolicy(first=1)) as records:
+        for i in range(2):
+            get(f"/get?site1={i}")
+        for i in range(2):
+            get(f"/get?site2={i}")
+
+    assert [record.url for record in records] == [
+        f"{httpbin.url}/get?site1=0",
+        f"{httpbin.url}/get?site2=0",
+    ]
+    assert records.sampling.sampled_out == 2
+
+
+@pytest.mark.sampling
+def test_sampling_merge_subprocess():
+    records = HTTPRecords(sampling=SamplingPolicy(every=2))
+    for _ in range(3):
+        records.sampling.keep("a", "initiator")
+
+    subprocess_records = HTTPRecords(sampling=SamplingPolicy(every=2))
+    for _ in range(2):
+        subprocess_records.sampling.keep("b", "initiator")
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+
+    # the next dump of the same subprocess: its counters are not added twice
+    for _ in range(2):
+        subprocess_records.sampling.keep("b", "initiator")
+    records.merge(pickle.loads(pickle.dumps(subprocess_records)))
+
+    sampling = records.sampling.to_json()
+    assert sampling["seen"] == 7
+    assert sampling["sampled_out"] == 3
+    assert sampling["sampled_out_by_netloc"] == {"a": 1, "b": 2}
+    assert records.sampling.seen == 3  # this process only
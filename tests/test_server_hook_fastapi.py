@@ -49,6 +49,8 @@ def test_fastapi_endpoint(httpdbg_port):
             assert record.response.content == b'"Hello, World!"'
             assert group.label == '@app.get("/")'
             assert "hello_world()" in group.full_label
+            # the record has been moved to the group of the endpoint (indexes)
+            assert records.query(group=group.id) == [record]
 
             records.reset()
 
@@ -0,0 +1,169 @@
+import pickle
+import sqlite3
+import threading
+import time
+
+import pytest
+import requests
+
+from httpdbg.hooks.all import httprecord
+from httpdbg.hooks.recordhttp1 import HTTP1Record
+from httpdbg.query import RecordQuery
+from httpdbg.records import HTTPRecords
+from httpdbg.retention import RetentionPolicy
+from httpdbg.server import httpdbg_srv
+from httpdbg.store import RecordStore
+
+
+@pytest.mark.store
+def test_store_disabled():
+    records = HTTPRecords()
+    records.add_request(HTTP1Record("initiator", "group"))
+
+    assert not records.store.enabled
+    assert records.store.written == 0
+
+
+@pytest.mark.store
+def test_store_requests(httpbin, tmp_path):
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+
+    with httprecord(store=store) as records:
+        requests.get(httpbin.url + "/get")
+        requests.post(httpbin.url + "/post", data=b"abc")
+
+    assert store.flush(timeout=5)
+
+    session_id = records.session.id
+    assert store.count(session_id) == 2
+    summaries = list(store.list_requests(session_id).values())
+    assert [summary["verb"] for summary in summaries] == ["GET", "POST"]
+    page = store.list_requests(session_id, RecordQuery(offset=1, limit=1))
+    assert list(page) == [records[1].id]
+
+    details = store.get_request(records[1].id)
+    assert details["url"] == httpbin.url + "/post"
+    assert store.get_content(records[1].id, False)[0] == b"abc"
+    content, content_type = store.get_content(records[1].id, True)
+    assert content == records[1].response.content
+    assert content_type == "application/json"
+
+    assert list(store.get_initiators([records[0].initiator_id])) == [
+        records[0].initiator_id
+    ]
+    assert list(store.get_groups([records[0].group_id])) == [records[0].group_id]
+
+
+@pytest.mark.store
+def test_store_reader(tmp_path):
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+    records = HTTPRecords(store=store)
+    assert store.count(records.session.id) == 0
+    reader = store._reader()
+
+    records.add_request(HTTP1Record("initiator", "group"))
+    assert store.flush(timeout=5)
+
+    # the connection is reused and reads the records written since
+    assert store._reader() is reader
+    assert store.count(records.session.id) == 1
+
+    # each thread has its own connection
+    readers = []
+    thread = threading.Thread(target=lambda: readers.append(store._reader()))
+    thread.start()
+    thread.join()
+    assert readers[0] is not reader
+
+
+@pytest.mark.store
+def test_store_updated_record(tmp_path):
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+    records = HTTPRecords(store=store)
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    records.add_request(record)
+    assert store.flush(timeout=5)
+
+    # the response is received after the request has been saved
+    record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+    assert store.flush(timeout=5)
+
+    assert store.get_request(record.id)["status_code"] == 200
+    assert store.get_content(record.id, True)[0] == b"ok"
+
+
+@pytest.mark.store
+def test_store_bodies_written_once_complete(tmp_path, monkeypatch):
+    monkeypatch.setattr(RecordStore, "FLUSH_DELAY", 0.01)
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+    records = HTTPRecords(store=store)
+    record = HTTP1Record("initiator", "group")
+    record.send_data(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    record.receive_data(b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\nab")
+    records.add_request(record)
+
+    # in progress: the summary is written, not the bodies
+    for _ in range(500):
+        if store.batches:
+            break
+        time.sleep(0.01)
+    assert store.get_request(record.id)["status_code"] == 200
+    assert store.get_content(record.id, True)[0] == b""
+
+    record.receive_data(b"cd")
+    assert store.flush(timeout=5)
+
+    assert store.get_content(record.id, True)[0] == b"abcd"
+
+
+@pytest.mark.store
+def test_store_wal(tmp_path):
+    path = tmp_path / "httpdbg.db"
+    store = RecordStore(str(path))
+    store.save(HTTPRecords(), HTTP1Record("initiator", "group"))
+    assert store.flush(timeout=5)
+
+    # the committed records can be read by another connection
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert connection.execute("SELECT COUNT(*) FROM requests").fetchone() == (1,)
+
+
+@pytest.mark.store
+def test_store_pickle(tmp_path):
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+    store.save(HTTPRecords(), HTTP1Record("initiator", "group"))
+    assert store.flush(timeout=5)
+
+    copy = pickle.loads(pickle.dumps(store))
+
+    assert copy.path == store.path
+    assert copy.written == 1
+    assert copy.to_json()["pending"] == 0
+
+
+@pytest.mark.api
+@pytest.mark.store
+def test_store_api_evicted_request(httpbin, httpdbg_host, httpdbg_port, tmp_path):
+    store = RecordStore(str(tmp_path / "httpdbg.db"))
+
+    with httpdbg_srv(httpdbg_host, httpdbg_port) as records:
+        with httprecord(records, store=store, retention=RetentionPolicy(max_records=1)):
+            requests.get(httpbin.url + "/get?first")
+            requests.get(httpbin.url + "/get?second")
+        assert store.flush(timeout=5)
+
+        url = f"http://{httpdbg_host}:{httpdbg_port}"
+        page = requests.get(f"{url}/requests", params={"offset": 0, "limit": 1})
+        first = next(iter(page.json()["requests"].values()))
+        details = requests.get(f"{url}/request/{first['id']}")
+        stats = requests.get(f"{url}/stats").json()
+
+    assert len(records) == 1
+    assert page.json()["total"] == 2
+    assert first["url"] == httpbin.url + "/get?first"
+    assert first["initiator_id"] in page.json()["initiators"]
+    assert details.status_code == 200
+    assert details.json()["url"] == httpbin.url + "/get?first"
+    assert stats["store"]["written"] >= 2